@@ -1,4 +1,12 @@
 from django.contrib import admin
-from .models import AIReportSummary
+from .models import AIReportSummary, AIResponse
 
 admin.site.register(AIReportSummary)
+
+
+@admin.register(AIResponse)
+class AIResponseAdmin(admin.ModelAdmin):
+    list_display = ("key", "template", "model_name", "created_at", "last_used_at")
+    list_filter = ("template", "model_name")
+    search_fields = ("key", "response")
+    readonly_fields = ("key", "model_name", "template", "response", "created_at", "last_used_at")
@@ -0,0 +1,196 @@
+# apps/ai_service/backfill.py
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.db import close_old_connections
+from django.db.models.functions import Trim
+
+from apps.gso_requests.models import ServiceRequest
+from apps.gso_reports.models import WorkAccomplishmentReport
+from apps.gso_reports.search import index_object
+from apps.gso_reports.rollup import refresh_war, refresh_wars
+from .utils import (
+    war_description_prompt, report_description_prompt, query_local_ai_batch, is_ai_error, AI_BATCH_SIZE,
+)
+
+# -------------------------------
+# Config
+# -------------------------------
+BACKFILL_WORKERS = 1  # background threads per web worker
+BACKFILL_DELAY = 60   # seconds a queued row is left to the page's stream before the queue fills it
+WAR = "WorkAccomplishmentReport"
+REQUEST = "ServiceRequest"
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=BACKFILL_WORKERS, thread_name_prefix="ai-backfill")
+# Only de-duplicates this worker's queue; whether a row still needs a
+# description is read from the database (see is_pending())
+_queued = set()
+_lock = threading.Lock()
+
+
+# -------------------------------
+# Find rows that still need a description
+# -------------------------------
+def _missing(qs):
+    return qs.annotate(desc_trim=Trim("description")).filter(desc_trim="")
+
+
+def find_missing_descriptions(limit=None):
+    """
+    Return [(type, id), ...] for WARs and completed requests (without a WAR)
+    whose description is empty.
+    """
+    wars = _missing(WorkAccomplishmentReport.objects.all()).order_by("-date_started").values_list("id", flat=True)
+    requests_qs = _missing(
+        ServiceRequest.objects.filter(status="Completed", war__isnull=True)
+    ).order_by("-created_at").values_list("id", flat=True)
+
+    if limit:
+        wars, requests_qs = wars[:limit], requests_qs[:limit]
+
+    items = [(WAR, pk) for pk in wars] + [(REQUEST, pk) for pk in requests_qs]
+    return items[:limit] if limit else items
+
+
+# -------------------------------
+# Generate + save one description
+# -------------------------------
+def description_queryset(kind):
+    if kind == WAR:
+        return WorkAccomplishmentReport.objects.select_related("request", "unit")
+    return ServiceRequest.objects.select_related("unit")
+
+
+def description_prompt(kind, obj):
+    """(prompt, template) used to generate the description of a WAR or ServiceRequest."""
+    if kind == WAR:
+        return report_description_prompt(obj), "report_description"
+    return war_description_prompt(obj), "war_description"
+
+
+def save_description(kind, obj_id, text, refresh=True):
+    """
+    Store generated text if the row is still empty (manual edits are never
+    overwritten). Returns the text, or None if nothing was written.
+    refresh=False leaves the WAR rollup to the caller (see refresh_wars()).
+    """
+    # Leave the row empty on failure so the next backfill retries it
+    if is_ai_error(text):
+        return None
+
+    updated = _missing(description_queryset(kind).model.objects.filter(id=obj_id)).update(description=text)
+    if not updated:
+        return None
+    # update() skips post_save, so refresh the search document (and WAR rollup) explicitly
+    index_object(kind, obj_id)
+    if kind == WAR and refresh:
+        refresh_war(obj_id)
+    return text
+
+
+def generate_descriptions(items):
+    """
+    Generate and store descriptions for a batch of (type, id) pairs with one
+    query_local_ai_batch() call. Returns the number of descriptions saved.
+    """
+    close_old_connections()
+    try:
+        saved, saved_wars = 0, []
+        for kind, template in ((WAR, "report_description"), (REQUEST, "war_description")):
+            prompts, targets = [], []
+            # Rows filled since they were queued (by the page's stream or by hand) are skipped
+            pending = _missing(description_queryset(kind)).filter(id__in=[pk for k, pk in items if k == kind])
+            for obj_id, obj in pending.in_bulk().items():
+                try:
+                    prompts.append(description_prompt(kind, obj)[0])
+                except Exception:
+                    logger.exception("AI backfill: prompt for %s #%s failed", kind, obj_id)
+                    continue
+                targets.append(obj_id)
+
+            for obj_id, text in zip(targets, query_local_ai_batch(prompts, template=template)):
+                if save_description(kind, obj_id, text, refresh=False):
+                    saved += 1
+                    if kind == WAR:
+                        saved_wars.append(obj_id)
+
+        # One rollup refresh per (unit, month) instead of one per WAR
+        if saved_wars:
+            refresh_wars(saved_wars)
+        return saved
+    finally:
+        close_old_connections()
+
+
+# -------------------------------
+# Background queue (used by views)
+# -------------------------------
+def _run_queued(items, due):
+    try:
+        time.sleep(max(0, due - time.monotonic()))
+        return generate_descriptions(items)
+    except Exception:
+        logger.exception("AI backfill: queued batch of %d failed", len(items))
+        return 0
+    finally:
+        with _lock:
+            _queued.difference_update(items)
+
+
+def enqueue(items, delay=BACKFILL_DELAY):
+    """
+    Fill the descriptions of (type, id) pairs in the background, in one batch
+    AI call, after `delay` seconds. The page streams the same rows meanwhile;
+    whatever it saved first is skipped. Rows already queued by this worker
+    are left out. Returns the number of newly queued rows.
+    """
+    with _lock:
+        items = [item for item in dict.fromkeys(items) if item not in _queued]
+        _queued.update(items)
+    if items:
+        _executor.submit(_run_queued, items, time.monotonic() + delay)
+    return len(items)
+
+
+def is_pending(kind, obj_id):
+    """
+    True while the row's description is still empty. Read from the database so
+    every web worker agrees, whichever one queued the row.
+    """
+    return _missing(description_queryset(kind).model.objects.filter(id=obj_id)).exists()
+
+
+# -------------------------------
+# Bulk backfill (used by management command)
+# -------------------------------
+def _run_batch(batch):
+    try:
+        return generate_descriptions(batch)
+    except Exception:
+        logger.exception("AI backfill: batch of %d failed", len(batch))
+        return 0
+
+
+def run_backfill(concurrency=4, limit=None, progress=None, batch_size=AI_BATCH_SIZE):
+    """
+    Generate every missing description, `batch_size` prompts per AI call with
+    `concurrency` batches in flight. Returns (filled, failed).
+    """
+    items = find_missing_descriptions(limit)
+    batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+    filled = failed = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="ai-backfill-bulk") as pool:
+        futures = {pool.submit(_run_batch, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            saved = future.result()
+            filled += saved
+            failed += len(futures[future]) - saved
+            if progress:
+                progress(filled + failed, len(items))
+
+    return filled, failed
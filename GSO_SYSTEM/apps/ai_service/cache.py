@@ -0,0 +1,151 @@
+# apps/ai_service/cache.py
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import AIResponse
+
+# -------------------------------
+# Config
+# -------------------------------
+AI_CACHE_ENABLED = getattr(settings, "AI_CACHE_ENABLED", True)
+AI_CACHE_TTL = getattr(settings, "AI_CACHE_TTL", 60 * 60 * 24 * 30)       # seconds since last use
+AI_CACHE_MAX_ENTRIES = getattr(settings, "AI_CACHE_MAX_ENTRIES", 20000)
+TOUCH_INTERVAL = timedelta(hours=1)  # last_used_at is refreshed at most this often (LRU granularity)
+PRUNE_EVERY = 200                    # writes between evictions
+
+logger = logging.getLogger(__name__)
+
+_inflight = {}        # key -> Future of the one call currently computing it
+_lock = threading.Lock()
+_writes = 0
+
+
+def response_key(model_name, template, version, prompt):
+    raw = "\x1f".join([model_name, template, str(version), prompt])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _is_error(text):
+    return not text or text.startswith("[AI Error]")
+
+
+# -------------------------------
+# Storage
+# -------------------------------
+def _fresh_after():
+    return timezone.now() - timedelta(seconds=AI_CACHE_TTL)
+
+
+def lookup(keys):
+    """{key: response} of the unexpired entries among `keys`, in one query."""
+    now = timezone.now()
+    rows = list(
+        AIResponse.objects.filter(key__in=keys, last_used_at__gte=_fresh_after())
+        .values_list("id", "key", "response", "last_used_at")
+    )
+    stale = [pk for pk, _, _, used in rows if now - used > TOUCH_INTERVAL]
+    if stale:
+        AIResponse.objects.filter(id__in=stale).update(last_used_at=now)
+    return {key: response for _, key, response, _ in rows}
+
+
+def store(entries, model_name, template):
+    """Save {key: response}; error texts are skipped so they are retried next time."""
+    global _writes
+    rows = [
+        AIResponse(key=key, model_name=model_name, template=template, response=text)
+        for key, text in entries.items() if not _is_error(text)
+    ]
+    if not rows:
+        return
+    AIResponse.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["key"],
+        update_fields=["response", "last_used_at"],
+    )
+    with _lock:
+        _writes += len(rows)
+        due = _writes >= PRUNE_EVERY
+        if due:
+            _writes = 0
+    if due:
+        prune()
+
+
+def prune():
+    """Drop entries unused for AI_CACHE_TTL, then the least recently used beyond AI_CACHE_MAX_ENTRIES."""
+    removed, _ = AIResponse.objects.filter(last_used_at__lt=_fresh_after()).delete()
+    overflow = AIResponse.objects.count() - AI_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        oldest = list(AIResponse.objects.order_by("last_used_at").values_list("id", flat=True)[:overflow])
+        removed += AIResponse.objects.filter(id__in=oldest).delete()[0]
+    return removed
+
+
+# -------------------------------
+# Single-flight Lookup
+# -------------------------------
+def cached_batch(prompts, model_name, template, version, compute):
+    """
+    Responses for `prompts`, in order. Cached entries come from one query;
+    prompts another thread is already generating are waited for; only the
+    rest reach compute(list of prompts) -> list of texts, once per distinct prompt.
+    """
+    if not prompts:
+        return []
+    if not AI_CACHE_ENABLED:
+        return compute(list(prompts))
+
+    keys = [response_key(model_name, template, version, p) for p in prompts]
+    found = lookup(set(keys))
+
+    # Claim every missing key no other thread is computing yet
+    waiting, owned = {}, {}
+    with _lock:
+        for key, prompt in zip(keys, prompts):
+            if key in found or key in owned or key in waiting:
+                continue
+            if key in _inflight:
+                waiting[key] = _inflight[key]
+            else:
+                owned[key] = prompt
+                _inflight[key] = Future()
+
+    if owned:
+        generated, missing = {}, []
+        try:
+            # Another thread may have stored some of them since the first lookup
+            generated.update(lookup(set(owned)))
+            missing = [key for key in owned if key not in generated]
+            if missing:
+                texts = compute([owned[key] for key in missing])
+                generated.update(zip(missing, texts))
+        except Exception as e:
+            generated.update({key: f"[AI Error] {e}" for key in owned if key not in generated})
+        finally:
+            with _lock:
+                futures = {key: _inflight.pop(key) for key in owned}
+            for key, future in futures.items():
+                future.set_result(generated.get(key, "[AI Error] No response"))
+        found.update(generated)
+        try:
+            store({key: generated.get(key, "") for key in missing}, model_name, template)
+        except Exception:
+            logger.exception("AI cache: could not store %d responses", len(missing))
+
+    for key, future in waiting.items():
+        found[key] = future.result()
+
+    return [found.get(key, "[AI Error] No response") for key in keys]
+
+
+def cached_call(prompt, model_name, template, version, compute):
+    """Single-prompt form of cached_batch(); compute(prompt) -> text."""
+    return cached_batch([prompt], model_name, template, version, lambda ps: [compute(ps[0])])[0]
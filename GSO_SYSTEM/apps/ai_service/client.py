@@ -0,0 +1,211 @@
+# apps/ai_service/client.py
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# -------------------------------
+# Config
+# -------------------------------
+AI_API_KEY = os.getenv("AI_API_KEY", "mysecretkey")
+AI_CONNECT_TIMEOUT = float(os.getenv("AI_CONNECT_TIMEOUT", "3"))   # seconds to reach the AI server
+AI_READ_TIMEOUT = float(os.getenv("AI_READ_TIMEOUT", "120"))       # seconds to wait for a generation
+AI_RETRIES = int(os.getenv("AI_RETRIES", "2"))                     # extra attempts after a retryable failure
+AI_BACKOFF = 0.5          # first retry delay (seconds), doubled per attempt, full jitter
+AI_MAX_BACKOFF = 10
+AI_POOL_SIZE = 10         # keep-alive connections kept open to the AI server
+
+BREAKER_THRESHOLD = 5     # consecutive failures that open the circuit
+BREAKER_RESET = 30        # seconds the circuit stays open before one trial call
+
+# Answered by a proxy or a busy server: the prompt was not generated, so sending it again is safe
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class AIUnavailable(Exception):
+    """Raised without calling the server while the circuit is open."""
+
+
+# -------------------------------
+# Circuit Breaker
+# -------------------------------
+class CircuitBreaker:
+    """
+    Closed: calls go through. After `threshold` consecutive failures it opens
+    and calls fail at once; after `reset_after` seconds one trial call is let
+    through (half-open), which closes it again on success.
+    """
+
+    def __init__(self, threshold, reset_after):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self._trial and time.monotonic() - self.opened_at >= self.reset_after:
+                self._trial = True
+                return True
+            return False
+
+    def retry_in(self):
+        if self.opened_at is None:
+            return 0
+        return max(0, self.reset_after - (time.monotonic() - self.opened_at))
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+    def abandon(self):
+        """A call ended without an answer either way; the next call may try again."""
+        with self._lock:
+            self._trial = False
+
+    def record(self, status_code):
+        """Any answer below 500 means the server is up (a 429 is busy, not down)."""
+        if status_code >= 500:
+            self.failure()
+        else:
+            self.success()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self._trial else "open"
+
+
+breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_RESET)
+
+
+# -------------------------------
+# Pooled Session
+# -------------------------------
+_session = None
+_session_lock = threading.Lock()
+
+
+def session():
+    """One shared keep-alive session per process (requests sessions are safe across threads for plain POSTs)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=AI_POOL_SIZE, max_retries=0)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+            _session.headers["x-api-key"] = AI_API_KEY
+        return _session
+
+
+def _backoff(attempt, retry_after=None):
+    if retry_after:
+        try:
+            return min(float(retry_after), AI_MAX_BACKOFF)
+        except ValueError:
+            pass
+    return random.uniform(0, min(AI_MAX_BACKOFF, AI_BACKOFF * 2 ** attempt))
+
+
+def post_json(url, payload, read_timeout=AI_READ_TIMEOUT):
+    """
+    POST `payload` to the AI server and return the decoded JSON.
+    Connection failures and 429/502/503/504 are retried with jittered backoff;
+    a read timeout is not (the model is slow, not down). Raises AIUnavailable
+    at once while the circuit is open.
+    """
+    if not breaker.allow():
+        raise AIUnavailable(f"AI server unavailable, retrying in {breaker.retry_in():.0f}s")
+
+    settled = False
+    try:
+        for attempt in range(AI_RETRIES + 1):
+            retry_after = None
+            try:
+                response = session().post(url, json=payload, timeout=(AI_CONNECT_TIMEOUT, read_timeout))
+            except requests.ConnectionError as e:  # includes connect timeouts
+                error = e
+            except requests.Timeout:
+                settled = True
+                breaker.failure()
+                raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    settled = True
+                    breaker.record(response.status_code)
+                    response.raise_for_status()
+                    return response.json()
+                error = requests.HTTPError(f"{response.status_code} from AI server", response=response)
+                retry_after = response.headers.get("Retry-After")
+
+            if attempt < AI_RETRIES:
+                time.sleep(_backoff(attempt, retry_after))
+
+        settled = True
+        if isinstance(error, requests.HTTPError):
+            breaker.record(error.response.status_code)
+        else:
+            breaker.failure()
+        raise error
+    finally:
+        # An unexpected exception must not leave a half-open trial pending forever
+        if not settled:
+            breaker.abandon()
+
+
+def stream_events(url, payload, read_timeout=AI_READ_TIMEOUT):
+    """
+    POST `payload` to a server-sent-events endpoint and yield (event, data)
+    pairs as they arrive, `data` decoded from JSON. Not retried: the caller is
+    relaying to a user who can ask again. Closing the generator closes the
+    connection, which cancels the generation on the server.
+    """
+    if not breaker.allow():
+        raise AIUnavailable(f"AI server unavailable, retrying in {breaker.retry_in():.0f}s")
+
+    settled = False
+    try:
+        try:
+            response = session().post(url, json=payload, stream=True, timeout=(AI_CONNECT_TIMEOUT, read_timeout))
+        except requests.RequestException:
+            settled = True
+            breaker.failure()
+            raise
+        with response:
+            settled = True
+            breaker.record(response.status_code)
+            response.raise_for_status()
+
+            event, data = "message", []
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    field, _, value = line.partition(":")
+                    if field == "event":
+                        event = value.strip()
+                    elif field == "data":
+                        data.append(value[1:] if value.startswith(" ") else value)
+                elif data:
+                    yield event, json.loads("\n".join(data))
+                    event, data = "message", []
+    finally:
+        if not settled:
+            breaker.abandon()
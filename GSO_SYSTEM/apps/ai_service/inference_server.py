@@ -1,7 +1,11 @@
 # apps/ai_service/inference_server.py
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
 from fastapi import FastAPI, HTTPException, Header
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-import subprocess, os
+import asyncio, json, math, subprocess, os, queue, shutil, threading, time
+import requests
 from dotenv import load_dotenv
 
 # === LOAD ENV ===
@@ -9,18 +13,400 @@ load_dotenv()  # <-- this will load AI_API_URL and AI_API_KEY from your .env
 
 # === CONFIG ===
 API_KEY = os.environ.get("AI_API_KEY", "changeme")
-MODEL_NAME = "phi3"  # Ollama model name
-OLLAMA_PATH = r"C:\Users\CLIENT\AppData\Local\Programs\Ollama\ollama.exe"  # full path
+MODEL_NAME = os.environ.get("AI_MODEL_NAME", "phi3")  # Ollama model name
+BACKEND = os.environ.get("AI_BACKEND", "ollama")      # "ollama" (resident server over HTTP) or "cli" (one process per call)
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+OLLAMA_PATH = os.environ.get("OLLAMA_PATH") or shutil.which("ollama") or "ollama"  # binary, for "cli" and autostart
+AUTOSTART = os.environ.get("AI_AUTOSTART", "1") == "1"  # run `ollama serve` when nothing answers at OLLAMA_HOST
+WORKERS = int(os.environ.get("AI_WORKERS", "2"))       # model sessions (keep-alive connections)
+KEEP_ALIVE = os.environ.get("AI_KEEP_ALIVE", "-1")    # how long Ollama keeps the model loaded (-1 = forever)
+QUEUE_DEPTH = int(os.environ.get("AI_QUEUE_DEPTH", "16"))     # requests allowed to wait for a free session
+QUEUE_TIMEOUT = float(os.environ.get("AI_QUEUE_TIMEOUT", "60"))  # longest wait before giving up with 429
+MAX_BATCH = int(os.environ.get("AI_MAX_BATCH", "100"))          # prompts accepted per /v1/generate_batch call
+MAX_PROMPT_LENGTH = 1000
+
+CONNECT_TIMEOUT = 5
+GENERATE_TIMEOUT = 120
+WARMUP_RETRY = 10      # seconds between warm-up attempts while the backend is down
+
+if "://" not in OLLAMA_HOST:
+    OLLAMA_HOST = f"http://{OLLAMA_HOST}"  # Ollama's own OLLAMA_HOST is often "host:port"
+
+
+class BackendTimeout(Exception):
+    pass
+
+
+# === MODEL SESSIONS ===
+def _keep_alive():
+    try:
+        return int(KEEP_ALIVE)
+    except ValueError:
+        return KEEP_ALIVE  # duration string such as "30m"
+
+
+def _error_text(response):
+    try:
+        error = response.json().get("error")
+    except ValueError:
+        error = response.text.strip()
+    return error or f"HTTP {response.status_code}"
+
+
+class OllamaSession:
+    """One keep-alive HTTP connection to the resident Ollama server; the model stays loaded there."""
+
+    def __init__(self):
+        self.http = requests.Session()
+
+    def _post(self, payload):
+        try:
+            response = self.http.post(
+                f"{OLLAMA_HOST}/api/generate",
+                json={"model": MODEL_NAME, "keep_alive": _keep_alive(), "stream": False, **payload},
+                timeout=(CONNECT_TIMEOUT, GENERATE_TIMEOUT),
+            )
+        except requests.Timeout:
+            raise BackendTimeout()
+        if response.status_code != 200:
+            raise Exception(_error_text(response))
+        return response.json()
+
+    def generate(self, prompt):
+        return self._post({"prompt": prompt}).get("response", "")
+
+    def stream(self, prompt, cancelled):
+        """
+        Yield the output piece by piece as Ollama produces it. Stops as soon as
+        `cancelled` is set; closing the connection makes Ollama stop generating.
+        """
+        try:
+            response = self.http.post(
+                f"{OLLAMA_HOST}/api/generate",
+                json={"model": MODEL_NAME, "keep_alive": _keep_alive(), "stream": True, "prompt": prompt},
+                timeout=(CONNECT_TIMEOUT, GENERATE_TIMEOUT),  # read timeout applies between pieces
+                stream=True,
+            )
+        except requests.Timeout:
+            raise BackendTimeout()
+        with response:
+            if response.status_code != 200:
+                raise Exception(_error_text(response))
+            for line in response.iter_lines():
+                if cancelled.is_set():
+                    return
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise Exception(data["error"])
+                if data.get("response"):
+                    yield data["response"]
+                if data.get("done"):
+                    return
+
+    def warm(self):
+        # A request without a prompt only loads the model into memory
+        self._post({})
+
+    def close(self):
+        self.http.close()
+
+
+class CliSession:
+    """Legacy backend: one `ollama run` process per call (pays model load every time)."""
+
+    def generate(self, prompt):
+        try:
+            result = subprocess.run(
+                [OLLAMA_PATH, "run", MODEL_NAME, prompt],
+                capture_output=True,
+                text=True,
+                encoding="utf-8",  # ⚡ Windows encoding fix
+                timeout=GENERATE_TIMEOUT,
+            )
+        except subprocess.TimeoutExpired:
+            raise BackendTimeout()
+        if result.returncode != 0:
+            raise Exception(result.stderr.strip() or "Unknown subprocess error")
+        return result.stdout
+
+    def stream(self, prompt, cancelled):
+        yield self.generate(prompt)  # no partial output from a one-shot process
+
+    def warm(self):
+        pass
+
+    def close(self):
+        pass
+
+
+BACKENDS = {"ollama": OllamaSession, "cli": CliSession}
+
+
+class ModelPool:
+    """Fixed set of long-lived sessions; a call borrows one and returns it."""
+
+    def __init__(self, factory, size):
+        self.sessions = [factory() for _ in range(max(size, 1))]
+        self._idle = queue.Queue()
+        for session in self.sessions:
+            self._idle.put(session)
+        self.ready = False
+        self.error = None
+
+    @contextmanager
+    def session(self):
+        session = self._idle.get()
+        try:
+            yield session
+        finally:
+            self._idle.put(session)
+
+    def generate(self, prompt):
+        with self.session() as session:
+            return session.generate(prompt)
+
+    def warm_up(self):
+        """Load the model and open every session's connection."""
+        for session in self.sessions:
+            session.warm()
+        self.ready, self.error = True, None
+
+    def close(self):
+        for session in self.sessions:
+            session.close()
+
+
+# === ADMISSION CONTROL ===
+class QueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Server busy")
+        self.retry_after = retry_after
+
+
+class Admission:
+    """
+    At most `limit` generations run at once (one per pooled session) and at
+    most `depth` more wait for a turn; anything beyond that is refused at once.
+    Only touched from the event loop, so the counters need no lock.
+    """
+
+    def __init__(self, limit, depth, timeout):
+        self.limit = limit
+        self.depth = depth
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.average = 10.0  # seconds per generation, smoothed
+        self._slots = None
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained."""
+        backlog = (self.active + self.waiting) / self.limit
+        return max(1, math.ceil(backlog * self.average))
+
+    def full(self):
+        # Counts requests still waiting in this tick, so a burst cannot all slip in
+        return self.active + self.waiting >= self.limit + self.depth
+
+    async def acquire(self, bounded=True):
+        """
+        Wait for a free session and take it; returns the start time to hand
+        to release(). Raises QueueFull when the queue is full or the wait
+        times out. bounded=False (items of an admitted batch) skips both checks.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.limit)  # created inside the running loop
+        if bounded and self.full():
+            raise QueueFull(self.retry_after())
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout if bounded else None)
+        except asyncio.TimeoutError:
+            raise QueueFull(self.retry_after())
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        return time.monotonic()
+
+    def release(self, started=None):
+        """Hand a session back; `started` (from acquire()) updates the average duration."""
+        self.active -= 1
+        if started is not None:
+            self.average = 0.8 * self.average + 0.2 * (time.monotonic() - started)
+        self._slots.release()
+
+    @asynccontextmanager
+    async def slot(self, bounded=True):
+        started = await self.acquire(bounded)
+        try:
+            yield
+        finally:
+            self.release(started)
+
+    def stats(self):
+        return {"active": self.active, "waiting": self.waiting, "limit": self.limit, "queue_depth": self.depth}
+
+
+pool = ModelPool(BACKENDS[BACKEND], WORKERS)
+admission = Admission(len(pool.sessions), QUEUE_DEPTH, QUEUE_TIMEOUT)
+# Blocking model calls run here, never on the event loop
+_executor = ThreadPoolExecutor(max_workers=len(pool.sessions), thread_name_prefix="ai-generate")
+_server_process = None
+_stopping = threading.Event()
+
+
+# === BACKEND STARTUP ===
+def _ollama_running():
+    try:
+        return requests.get(f"{OLLAMA_HOST}/api/version", timeout=CONNECT_TIMEOUT).ok
+    except requests.RequestException:
+        return False
+
+
+def _start_ollama():
+    """Start a resident `ollama serve` when none is listening (and AUTOSTART is on)."""
+    global _server_process
+    if BACKEND != "ollama" or not AUTOSTART or _server_process or _ollama_running():
+        return
+    env = dict(os.environ)
+    env.setdefault("OLLAMA_NUM_PARALLEL", str(WORKERS))  # let every session generate at once
+    try:
+        _server_process = subprocess.Popen([OLLAMA_PATH, "serve"], env=env)
+    except OSError as e:
+        raise Exception(f"Could not start {OLLAMA_PATH}: {e}")
+    for _ in range(30):
+        if _ollama_running():
+            return
+        time.sleep(1)
+
+
+def _warm_up():
+    """Runs in the background so the server accepts (and reports not-ready) while the model loads."""
+    while not _stopping.is_set():
+        try:
+            _start_ollama()
+            started = time.perf_counter()
+            pool.warm_up()
+            print(f"[AI] {MODEL_NAME} ready via {BACKEND} ({len(pool.sessions)} sessions, {time.perf_counter() - started:.1f}s)")
+            return
+        except Exception as e:
+            pool.error = str(e)
+            print(f"[AI Error] Warm-up failed, retrying in {WARMUP_RETRY}s: {e}")
+            _stopping.wait(WARMUP_RETRY)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    threading.Thread(target=_warm_up, name="ai-warmup", daemon=True).start()
+    yield
+    _stopping.set()
+    _executor.shutdown(wait=False, cancel_futures=True)
+    pool.close()
+    if _server_process:
+        _server_process.terminate()
+
 
 # === APP INIT ===
-app = FastAPI(title="GSO Private AI Service (Phi-3 via Ollama)")
+app = FastAPI(title="GSO Private AI Service (Phi-3 via Ollama)", lifespan=lifespan)
 
 # === DATA SCHEMA ===
 class RequestData(BaseModel):
     prompt: str
     max_length: int = 150  # optional, not used by Ollama directly
 
-# === API ROUTE ===
+
+class BatchRequestData(BaseModel):
+    prompts: list[str]
+    max_length: int = 150  # optional, not used by Ollama directly
+
+async def _generate(prompt):
+    """One blocking generation on the executor, for a caller already holding a slot."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, pool.generate, prompt)
+
+
+async def run_generation(prompt, bounded=True):
+    """Generate through the pool once admitted, without blocking the event loop."""
+    async with admission.slot(bounded):
+        return await _generate(prompt)
+
+
+def stream_generation(prompt):
+    """
+    Start one generation on the executor right away and return (pieces, done):
+    an async iterator over its output pieces, and the producer's future, which
+    resolves once the session is back in the pool. Closing `pieces` early
+    (client gone) tells the session to cancel.
+    """
+    loop = asyncio.get_running_loop()
+    queued = asyncio.Queue()
+    cancelled = threading.Event()
+    finished = object()
+
+    def produce():
+        try:
+            with pool.session() as session:
+                for piece in session.stream(prompt, cancelled):
+                    loop.call_soon_threadsafe(queued.put_nowait, piece)
+        except Exception as e:
+            loop.call_soon_threadsafe(queued.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queued.put_nowait, finished)
+
+    done = loop.run_in_executor(_executor, produce)
+
+    async def pieces():
+        try:
+            while True:
+                piece = await queued.get()
+                if piece is finished:
+                    return
+                if isinstance(piece, Exception):
+                    raise piece
+                yield piece
+        finally:
+            # No await here: on disconnect this runs inside a cancelled task.
+            # The thread notices at its next piece and hands the session back.
+            cancelled.set()
+
+    return pieces(), done
+
+
+def sse(data, event=None):
+    """One server-sent event carrying `data` as JSON."""
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data)}\n\n"
+
+
+def busy_response(e):
+    return JSONResponse(
+        {"detail": "Server busy, retry later"},
+        status_code=429,
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+# === API ROUTES ===
+@app.get("/v1/health")
+async def health():
+    """Liveness probe: answers even while every session is busy."""
+    return {"status": "ok", **admission.stats()}
+
+
+@app.get("/v1/ready")
+async def ready():
+    """Readiness probe: 200 once the model is loaded, 503 before that."""
+    body = {"ready": pool.ready, "model": MODEL_NAME, "backend": BACKEND, "workers": len(pool.sessions)}
+    if not pool.ready:
+        body["error"] = pool.error
+        return JSONResponse(body, status_code=503)
+    return body
+
+
 @app.post("/v1/generate")
 async def generate(data: RequestData, x_api_key: str = Header(None)):
     # --- Authorization ---
@@ -28,33 +414,120 @@ async def generate(data: RequestData, x_api_key: str = Header(None)):
         raise HTTPException(status_code=401, detail="Unauthorized")
 
     # --- Input validation ---
-    if len(data.prompt) > 1000:
+    if len(data.prompt) > MAX_PROMPT_LENGTH:
         raise HTTPException(status_code=400, detail="Prompt too long")
 
     try:
-        # --- Call Ollama ---
-        result = subprocess.run(
-            [OLLAMA_PATH, "run", MODEL_NAME, data.prompt],
-            capture_output=True,
-            text=True,
-            encoding="utf-8",  # ⚡ Windows encoding fix
-            timeout=120
-        )
-
-        # --- Handle subprocess errors ---
-        if result.returncode != 0:
-            err_msg = result.stderr.strip() or "Unknown subprocess error"
-            raise Exception(err_msg)
-
-        output = result.stdout.strip()
+        # --- Call the model through a pooled session ---
+        output = (await run_generation(data.prompt)).strip()
         if not output:
             output = "[AI Error] Model returned empty output."
 
         return {"result": output}
 
-    except subprocess.TimeoutExpired:
+    except QueueFull as e:
+        return busy_response(e)
+    except BackendTimeout:
         raise HTTPException(status_code=504, detail="Model request timed out")
     except Exception as e:
         # Log full exception for debugging
         print(f"[AI Error] {e}")
         raise HTTPException(status_code=500, detail=f"Model error: {str(e)}")
+
+
+async def _stream_events(pieces):
+    """SSE body of /v1/generate_stream: token events, then one done or error event."""
+    try:
+        parts = []
+        async for piece in pieces:
+            parts.append(piece)
+            yield sse({"token": piece})
+        output = "".join(parts).strip() or "[AI Error] Model returned empty output."
+        yield sse({"result": output}, "done")
+    except BackendTimeout:
+        yield sse({"error": "Model request timed out"}, "error")
+    except Exception as e:
+        print(f"[AI Error] {e}")
+        yield sse({"error": f"Model error: {str(e)}"}, "error")
+
+
+@app.post("/v1/generate_stream")
+async def generate_stream(data: RequestData, x_api_key: str = Header(None)):
+    """
+    /v1/generate as server-sent events: `data: {"token": ...}` for each piece
+    of output as it is produced, then `event: done` with the whole text (or
+    `event: error`). Closing the connection cancels the generation.
+    """
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if len(data.prompt) > MAX_PROMPT_LENGTH:
+        raise HTTPException(status_code=400, detail="Prompt too long")
+
+    # Admitted (or refused with 429) before the 200 starts streaming
+    try:
+        started = await admission.acquire()
+    except QueueFull as e:
+        return busy_response(e)
+
+    # The generation starts now and the slot goes back when it ends: the
+    # response body may never be iterated if the client leaves early
+    pieces, done = stream_generation(data.prompt)
+    done.add_done_callback(lambda _: admission.release(started))
+
+    return StreamingResponse(
+        _stream_events(pieces),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _batch_item(prompt, held=False):
+    """
+    One batch entry as {"status": "ok", "result": ...} or {"status": "error"/"timeout", "error": ...}.
+    held=True runs on the slot the batch was admitted with.
+    """
+    if len(prompt) > MAX_PROMPT_LENGTH:
+        return {"status": "error", "error": "Prompt too long"}
+    try:
+        output = (await (_generate(prompt) if held else run_generation(prompt, bounded=False))).strip()
+        return {"status": "ok", "result": output or "[AI Error] Model returned empty output."}
+    except BackendTimeout:
+        return {"status": "timeout", "error": "Model request timed out"}
+    except Exception as e:
+        print(f"[AI Error] {e}")
+        return {"status": "error", "error": f"Model error: {str(e)}"}
+
+
+@app.post("/v1/generate_batch")
+async def generate_batch(data: BatchRequestData, x_api_key: str = Header(None)):
+    """
+    Generate every prompt and return the results in order, one status per item.
+    The batch is admitted like a single request and keeps that slot; its other
+    items then take turns on the sessions with at most one item per session
+    queued, so single requests are not starved.
+    """
+    if x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if len(data.prompts) > MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH} prompts per batch")
+    if not data.prompts:
+        return {"results": []}
+
+    try:
+        await admission.acquire()
+    except QueueFull as e:
+        return busy_response(e)
+
+    results = [None] * len(data.prompts)
+    indexes = iter(range(len(data.prompts)))
+
+    async def worker(held):
+        for i in indexes:  # shared by all workers: each index is taken once
+            results[i] = await _batch_item(data.prompts[i], held)
+
+    try:
+        workers = min(admission.limit, len(data.prompts))
+        await asyncio.gather(*(worker(held=(n == 0)) for n in range(workers)))
+    finally:
+        admission.release()  # held for the whole batch, so not a per-generation time
+    return {"results": results}
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from apps.ai_service.backfill import find_missing_descriptions, run_backfill
+from apps.ai_service.utils import AI_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Generate AI descriptions for WARs and completed requests that have none"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4, help="Number of batch AI calls in flight")
+        parser.add_argument("--batch-size", type=int, default=AI_BATCH_SIZE,
+                            help=f"Prompts per batch AI call (default {AI_BATCH_SIZE})")
+        parser.add_argument("--limit", type=int, default=None, help="Maximum number of rows to process")
+        parser.add_argument("--dry-run", action="store_true", help="Only count rows that need a description")
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            items = find_missing_descriptions(options["limit"])
+            self.stdout.write(self.style.WARNING(f"{len(items)} rows need a description."))
+            return
+
+        def progress(done, total):
+            # Called once per finished batch
+            self.stdout.write(f"  {done}/{total} processed")
+
+        filled, failed = run_backfill(
+            concurrency=options["concurrency"],
+            limit=options["limit"],
+            progress=progress,
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Backfill completed: {filled} filled, {failed} failed."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from apps.ai_service.cache import prune
+from apps.ai_service.models import AIResponse
+
+
+class Command(BaseCommand):
+    help = "Evict expired and least recently used cached AI responses"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clear", action="store_true", help="Delete every cached response")
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            removed, _ = AIResponse.objects.all().delete()
+        else:
+            removed = prune()
+        self.stdout.write(self.style.SUCCESS(f"{removed} cached AI responses removed."))
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from apps.gso_reports.models import WorkAccomplishmentReport
 
 
@@ -25,3 +26,19 @@ class AIReportSummary(models.Model):
 
     def __str__(self):
         return f"AI Summary for WAR #{self.report.id} (by {self.generated_by or 'System'})"
+
+
+class AIResponse(models.Model):
+    """
+    Cached model output, addressed by a hash of (model, prompt template
+    version, prompt). See cache.py; errors are never stored.
+    """
+    key = models.CharField(max_length=64, unique=True)  # sha256 hex digest
+    model_name = models.CharField(max_length=100)
+    template = models.CharField(max_length=50)
+    response = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.template} ({self.model_name}) {self.key[:12]}"
@@ -1,3 +1,479 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+from datetime import date
+from unittest import IsolatedAsyncioTestCase, mock
 
-# Create your tests here.
+import requests
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from apps.gso_accounts.models import Unit, User
+from apps.gso_reports import rollup
+from apps.gso_reports.models import WorkAccomplishmentReport, IPMTRollup
+from . import backfill, cache, client, inference_server, utils
+from .inference_server import Admission, QueueFull
+
+
+# -------------------------------
+# Description Backfill
+# -------------------------------
+class BackfillTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.unit = Unit.objects.create(name="Carpentry")
+        cls.user = User.objects.create_user("worker", password="x", role="personnel", unit=cls.unit)
+
+    def _war(self, description="", day=1):
+        war = WorkAccomplishmentReport.objects.create(
+            unit=self.unit, date_started=date(2025, 9, day), activity_name="Repair", description=description,
+        )
+        war.assigned_personnel.add(self.user)
+        return war
+
+    def test_save_description_skips_errors_and_manual_edits(self):
+        empty, edited = self._war(), self._war("Fixed by hand")
+        self.assertIsNone(backfill.save_description(backfill.WAR, empty.id, "[AI Error] timeout"))
+        self.assertIsNone(backfill.save_description(backfill.WAR, edited.id, "Generated"))
+        empty.refresh_from_db()
+        edited.refresh_from_db()
+        self.assertEqual(empty.description, "")
+        self.assertEqual(edited.description, "Fixed by hand")
+        # The failed row is left for the next backfill to retry
+        self.assertIn((backfill.WAR, empty.id), backfill.find_missing_descriptions())
+
+    def test_generate_descriptions_refreshes_rollup(self):
+        wars = [self._war(day=1), self._war(day=2)]
+        texts = ["Replaced door hinge.", "Repaired cabinet."]
+        with mock.patch.object(backfill, "query_local_ai_batch", side_effect=lambda prompts, template: texts), \
+                mock.patch.object(rollup, "refresh_rollup", wraps=rollup.refresh_rollup) as refresh:
+            saved = backfill.generate_descriptions([(backfill.WAR, war.id) for war in wars])
+
+        self.assertEqual(saved, 2)
+        # Both WARs fall in the same unit-month, which is recomputed once
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual(backfill.find_missing_descriptions(), [])
+        cell = IPMTRollup.objects.get(unit=self.unit, personnel=self.user, activity_name="Repair")
+        self.assertEqual(sorted(cell.war_ids), sorted(war.id for war in wars))
+        self.assertEqual(cell.description, " ".join(texts))
+
+
+    def test_queue_skips_rows_filled_meanwhile(self):
+        filled, empty = self._war(day=1), self._war(day=2)
+        items = [(backfill.WAR, filled.id), (backfill.WAR, empty.id)]
+        with mock.patch.object(backfill, "_executor") as executor:
+            self.assertEqual(backfill.enqueue(items + items[:1], delay=0), 2)
+            self.assertEqual(backfill.enqueue(items, delay=0), 0)  # already queued
+        run, queued, due = executor.submit.call_args.args
+
+        # The page's stream saved one of them before the queue got to it
+        backfill.save_description(backfill.WAR, filled.id, "Streamed text.")
+        generate = lambda prompts, template: [f"Generated {n}." for n in range(len(prompts))]
+        with mock.patch.object(backfill, "query_local_ai_batch", side_effect=generate) as batch:
+            self.assertEqual(run(queued, due), 1)
+        self.assertEqual(len(batch.call_args_list[0].args[0]), 1)  # the WAR batch
+        filled.refresh_from_db()
+        empty.refresh_from_db()
+        self.assertEqual((filled.description, empty.description), ("Streamed text.", "Generated 0."))
+        self.assertEqual(backfill._queued, set())
+
+    def test_failed_batch_is_logged(self):
+        with mock.patch.object(backfill, "generate_descriptions", side_effect=RuntimeError("db down")), \
+                self.assertLogs(backfill.logger, "ERROR") as logs:
+            self.assertEqual(backfill._run_batch([(backfill.WAR, 1)]), 0)
+        self.assertIn("db down", logs.output[0])
+
+    def test_report_page_queues_missing_descriptions(self):
+        war, done = self._war(), self._war("Done", day=2)
+        self.client.force_login(User.objects.create_user("gso", password="x", role="gso"))
+        with mock.patch.object(backfill, "_executor") as executor, \
+                mock.patch.dict(backfill.__dict__, {"_queued": set()}):
+            response = self.client.get(reverse("gso_reports:accomplishment_report"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(executor.submit.call_args.args[1], [(backfill.WAR, war.id)])
+
+        status = self.client.get(reverse("gso_reports:get_war_description", args=[war.id])).json()
+        self.assertEqual(status, {"description": "", "pending": True})
+        status = self.client.get(reverse("gso_reports:get_war_description", args=[done.id])).json()
+        self.assertEqual(status, {"description": "Done", "pending": False})
+
+# -------------------------------
+# Inference Server Admission
+# -------------------------------
+class AdmissionTests(IsolatedAsyncioTestCase):
+    async def _hold(self, admission, release):
+        async with admission.slot():
+            await release.wait()
+
+    async def test_same_tick_burst_is_bounded(self):
+        admission = Admission(limit=1, depth=1, timeout=5)
+        release = asyncio.Event()
+        tasks = [asyncio.create_task(self._hold(admission, release)) for _ in range(4)]
+        await asyncio.sleep(0)
+        # One running plus one queued, whether or not the first has its session yet
+        self.assertEqual(admission.active + admission.waiting, 2)
+        release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        self.assertEqual(sum(isinstance(r, QueueFull) for r in results), 2)
+        self.assertEqual((admission.active, admission.waiting), (0, 0))
+
+    async def test_wait_times_out(self):
+        admission = Admission(limit=1, depth=4, timeout=0.05)
+        started = await admission.acquire()
+        with self.assertRaises(QueueFull) as raised:
+            await admission.acquire()
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        admission.release(started)
+        admission.release(await admission.acquire())
+        self.assertEqual((admission.active, admission.waiting), (0, 0))
+
+    async def test_unbounded_items_skip_the_queue_check(self):
+        admission = Admission(limit=1, depth=0, timeout=5)
+        started = await admission.acquire()
+        self.assertTrue(admission.full())
+        waiter = asyncio.create_task(admission.acquire(bounded=False))
+        await asyncio.sleep(0)
+        admission.release(started)
+        admission.release(await waiter)
+        self.assertEqual(admission.active, 0)
+
+
+class FakeSession:
+    def __init__(self, gate=None):
+        self.gate = gate
+
+    def generate(self, prompt):
+        return f"done: {prompt}"
+
+    def stream(self, prompt, cancelled):
+        for piece in ("one ", "two"):
+            if self.gate:
+                self.gate.wait(5)
+            if cancelled.is_set():
+                return
+            yield piece
+
+
+class StreamAndBatchTests(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.gate = threading.Event()
+        self.pool = inference_server.ModelPool(lambda: FakeSession(self.gate), 1)
+        self.admission = Admission(limit=1, depth=0, timeout=0.05)
+        for name, value in (("pool", self.pool), ("admission", self.admission)):
+            patcher = mock.patch.object(inference_server, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _request(self, prompt="hi"):
+        return inference_server.RequestData(prompt=prompt)
+
+    async def _body(self, response):
+        return "".join([chunk async for chunk in response.body_iterator])
+
+    async def test_stream_holds_its_slot_until_generation_ends(self):
+        response = await inference_server.generate_stream(self._request(), x_api_key=inference_server.API_KEY)
+        self.assertEqual(self.admission.active, 1)
+        busy = await inference_server.generate_stream(self._request(), x_api_key=inference_server.API_KEY)
+        self.assertEqual(busy.status_code, 429)
+
+        self.gate.set()
+        body = await self._body(response)
+        self.assertIn('"result": "one two"', body)
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.admission.active, 0)
+
+    async def test_unread_stream_still_releases_its_slot(self):
+        await inference_server.generate_stream(self._request(), x_api_key=inference_server.API_KEY)
+        self.gate.set()  # the body is never iterated (client left before it started)
+        for _ in range(100):
+            if not self.admission.active:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(self.admission.active, 0)
+
+    async def test_batch_is_admitted_once_and_releases(self):
+        data = inference_server.BatchRequestData(prompts=["a", "b", "c"])
+        result = await inference_server.generate_batch(data, x_api_key=inference_server.API_KEY)
+        self.assertEqual([r["result"] for r in result["results"]], ["done: a", "done: b", "done: c"])
+        self.assertEqual((self.admission.active, self.admission.waiting), (0, 0))
+
+        started = await self.admission.acquire()
+        busy = await inference_server.generate_batch(data, x_api_key=inference_server.API_KEY)
+        self.assertEqual(busy.status_code, 429)
+        self.admission.release(started)
+
+
+# -------------------------------
+# Response Cache
+# -------------------------------
+class CachedBatchTests(SimpleTestCase):
+    def setUp(self):
+        self.stored = {}
+        for name, patch in (("lookup", lambda keys: {}), ("store", lambda entries, *a: self.stored.update(entries))):
+            patcher = mock.patch.object(cache, name, side_effect=patch)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _in_thread(self, prompts, compute, results):
+        thread = threading.Thread(
+            target=lambda: results.append(cache.cached_batch(prompts, "m", "raw", 1, compute))
+        )
+        thread.start()
+        return thread
+
+    def _wait_inflight(self, count):
+        for _ in range(500):
+            if len(cache._inflight) >= count:
+                return
+            threading.Event().wait(0.01)
+        self.fail("prompts never went in flight")
+
+    def test_concurrent_callers_share_one_call(self):
+        gate, calls = threading.Event(), []
+
+        def compute(prompts):
+            calls.append(list(prompts))
+            gate.wait(5)
+            return [f"answer {p}" for p in prompts]
+
+        first, second = [], []
+        threads = [self._in_thread(["a", "b"], compute, first)]
+        self._wait_inflight(2)
+        threads.append(self._in_thread(["b", "c", "c"], compute, second))
+        self._wait_inflight(3)
+        gate.set()
+        for thread in threads:
+            thread.join(5)
+
+        # "b" is generated once and waited for by the second caller; "c" once despite the duplicate
+        self.assertEqual(sorted(calls), [["a", "b"], ["c"]])
+        self.assertEqual(first, [["answer a", "answer b"]])
+        self.assertEqual(second, [["answer b", "answer c", "answer c"]])
+        self.assertEqual(len(self.stored), 3)
+        self.assertEqual(cache._inflight, {})
+
+    def test_store_failure_is_logged(self):
+        with mock.patch.object(cache, "store", side_effect=RuntimeError("disk full")), \
+                self.assertLogs(cache.logger, "ERROR") as logs:
+            texts = cache.cached_batch(["a"], "m", "raw", 1, lambda prompts: ["answer"])
+        self.assertEqual(texts, ["answer"])
+        self.assertIn("disk full", logs.output[0])
+
+    def test_waiters_share_the_error(self):
+        gate = threading.Event()
+
+        def failing(prompts):
+            gate.wait(5)
+            raise ConnectionError("down")
+
+        first, second = [], []
+        threads = [self._in_thread(["a"], failing, first)]
+        self._wait_inflight(1)
+        threads.append(self._in_thread(["a"], lambda prompts: self.fail("computed twice"), second))
+        threading.Event().wait(0.05)
+        gate.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(first, [["[AI Error] down"]])
+        self.assertEqual(second, first)
+        self.assertEqual(cache._inflight, {})
+
+
+# -------------------------------
+# Circuit Breaker
+# -------------------------------
+def fake_response(status, lines=()):
+    """A requests response for client.session().post(); `lines` are the SSE lines."""
+    response = mock.MagicMock(status_code=status, headers={})
+    response.__enter__.return_value = response
+    response.iter_lines.return_value = list(lines)
+    response.json.return_value = {"result": "ok"}
+    if status >= 400:
+        response.raise_for_status.side_effect = requests.HTTPError(str(status), response=response)
+    return response
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.breaker = client.CircuitBreaker(threshold=2, reset_after=30)
+        patches = (
+            mock.patch.object(client.time, "monotonic", side_effect=lambda: self.now),
+            mock.patch.object(client.time, "sleep"),
+            mock.patch.object(client, "breaker", self.breaker),
+            mock.patch.object(client, "session"),
+        )
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.post = client.session.return_value.post
+
+    def _open(self):
+        """Open the circuit and let the reset period pass, so the next call is the trial."""
+        self.breaker.failure()
+        self.breaker.failure()
+        self.now += 30
+
+    def test_transitions(self):
+        self.breaker.failure()
+        self.assertEqual(self.breaker.state, "closed")
+        self.breaker.failure()
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow())
+
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())  # one trial at a time
+        self.breaker.failure()
+        self.assertEqual(self.breaker.state, "open")
+        self.assertEqual(self.breaker.retry_in(), 30)
+
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.success()
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertEqual(self.breaker.failures, 0)
+
+    def test_open_circuit_fails_fast(self):
+        self.breaker.failure()
+        self.breaker.failure()
+        with self.assertRaises(client.AIUnavailable):
+            client.post_json("http://ai/v1/generate", {"prompt": "x"})
+        self.post.assert_not_called()
+
+    def test_post_trial_closes_on_client_error(self):
+        self._open()
+        self.post.return_value = fake_response(422)
+        with self.assertRaises(requests.HTTPError):
+            client.post_json("http://ai/v1/generate", {"prompt": "x"})
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_post_trial_reopens_on_server_error(self):
+        self._open()
+        self.post.return_value = fake_response(503)
+        with self.assertRaises(requests.HTTPError):
+            client.post_json("http://ai/v1/generate", {"prompt": "x"})
+        self.assertEqual(self.breaker.state, "open")
+
+    def test_post_unexpected_error_ends_the_trial(self):
+        self._open()
+        self.post.return_value = fake_response(200)
+        self.post.return_value.json.side_effect = ValueError("not json")
+        with self.assertRaises(ValueError):
+            client.post_json("http://ai/v1/generate", {"prompt": "x"})
+        self.assertNotEqual(self.breaker.state, "half-open")
+        self.assertTrue(self.breaker.allow())
+
+    def test_stream_trial_closes_on_client_error(self):
+        self._open()
+        self.post.return_value = fake_response(400)
+        with self.assertRaises(requests.HTTPError):
+            list(client.stream_events("http://ai/v1/generate_stream", {"prompt": "x"}))
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_stream_unexpected_error_ends_the_trial(self):
+        self._open()
+        self.post.side_effect = RuntimeError("bad adapter")
+        with self.assertRaises(RuntimeError):
+            list(client.stream_events("http://ai/v1/generate_stream", {"prompt": "x"}))
+        self.assertNotEqual(self.breaker.state, "half-open")
+        self.assertTrue(self.breaker.allow())
+
+    def test_stream_yields_events(self):
+        self.post.return_value = fake_response(200, ["data: {\"token\": \"a\"}", "", "event: done", "data: {}", ""])
+        events = list(client.stream_events("http://ai/v1/generate_stream", {"prompt": "x"}))
+        self.assertEqual(events, [("message", {"token": "a"}), ("done", {})])
+
+
+# -------------------------------
+# Streamed Generation (server-sent events)
+# -------------------------------
+class StreamGenerationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.gso = User.objects.create_user("gso", password="x", role="gso")
+        cls.unit = Unit.objects.create(name="Carpentry")
+
+    def setUp(self):
+        self.breaker = client.CircuitBreaker(threshold=2, reset_after=30)
+        for patcher in (
+            mock.patch.object(client, "breaker", self.breaker),
+            mock.patch.object(client, "session"),
+            mock.patch.object(utils, "AI_CACHE_ENABLED", False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.post = client.session.return_value.post
+        self.client.force_login(self.gso)
+
+    def _war(self, description=""):
+        return WorkAccomplishmentReport.objects.create(
+            unit=self.unit, date_started=date(2025, 9, 1), activity_name="Repair", description=description,
+        )
+
+    def _stream(self, **data):
+        """POST to the stream view and parse the reply into (event, data) pairs."""
+        response = self.client.post(reverse("ai_service:stream_generation"), data)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = []
+        for block in b"".join(response.streaming_content).decode().split("\n\n"):
+            if block:
+                fields = dict(line.split(": ", 1) for line in block.split("\n"))
+                events.append((fields.get("event", "message"), json.loads(fields["data"])))
+        return events
+
+    def test_tokens_are_relayed_and_saved(self):
+        war = self._war()
+        self.post.return_value = fake_response(200, [
+            'data: {"token": "Fixed "}', "",
+            'data: {"token": "the door."}', "",
+            "event: done", 'data: {"result": "Fixed the door."}', "",
+        ])
+        events = self._stream(kind="description", type=backfill.WAR, id=war.id)
+
+        self.assertEqual(events, [
+            ("message", {"token": "Fixed "}),
+            ("message", {"token": "the door."}),
+            ("done", {"result": "Fixed the door."}),
+        ])
+        war.refresh_from_db()
+        self.assertEqual(war.description, "Fixed the door.")
+
+    def test_filled_row_is_sent_without_generating(self):
+        war = self._war("Fixed by hand")
+        events = self._stream(kind="description", type=backfill.WAR, id=war.id)
+        self.assertEqual(events, [("done", {"result": "Fixed by hand"})])
+        self.post.assert_not_called()
+
+    def test_open_circuit_sends_error_event(self):
+        war = self._war()
+        self.breaker.failure()
+        self.breaker.failure()
+        (event, data), = self._stream(kind="description", type=backfill.WAR, id=war.id)
+
+        self.assertEqual(event, "error")
+        self.assertTrue(data["error"].startswith("[AI Error] AI server unavailable"))
+        self.post.assert_not_called()
+        war.refresh_from_db()
+        self.assertEqual(war.description, "")
+
+    def test_busy_server_sends_fallback(self):
+        wars = [self._war("Replaced hinge"), self._war("Oiled lock.")]
+        self.post.return_value = fake_response(429)
+        (event, data), = self._stream(
+            kind="ipmt_summary", indicator="CF1", war_ids=",".join(str(war.id) for war in wars),
+        )
+
+        self.assertEqual(event, "error")
+        self.assertIn("429", data["error"])
+        self.assertEqual(data["fallback"], "Replaced hinge. Oiled lock.")
+        # Busy is not down: the circuit stays closed
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_bad_requests_are_rejected(self):
+        url = reverse("ai_service:stream_generation")
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.post(url, {"kind": "poem"}).status_code, 400)
+        self.assertEqual(self.client.post(url, {"kind": "description", "type": "Other", "id": "1"}).status_code, 400)
+        self.assertEqual(self.client.post(url, {"kind": "description", "type": backfill.WAR, "id": "999"}).status_code, 404)
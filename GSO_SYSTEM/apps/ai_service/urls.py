@@ -11,4 +11,7 @@ urlpatterns = [
 
     # IPMT AI Summaries
     path("ipmt/<int:ipmt_id>/generate/", views.generate_ipmt_ai_summary, name="generate_ipmt_ai_summary"),
+
+    # Streamed generation (server-sent events) for the report pages
+    path("stream/", views.stream_generation, name="stream_generation"),
 ]
@@ -1,41 +1,151 @@
 # apps/ai_service/utils.py
 import os
-import requests
+from contextlib import closing
 from apps.gso_requests.models import ServiceRequest, TaskReport  # ✅ Import models for richer prompts
+from .cache import cached_call, cached_batch, lookup, store, response_key, AI_CACHE_ENABLED
+from .client import post_json, stream_events
 
 # -------------------------------
 # Local AI Model Config
 # -------------------------------
 AI_API_URL = os.getenv("AI_API_URL", "http://127.0.0.1:8001/v1/generate")
-AI_API_KEY = os.getenv("AI_API_KEY", "mysecretkey")
+AI_BATCH_URL = os.getenv("AI_BATCH_URL", AI_API_URL.rstrip("/") + "_batch")
+AI_STREAM_URL = os.getenv("AI_STREAM_URL", AI_API_URL.rstrip("/") + "_stream")
+AI_BATCH_SIZE = 50       # prompts per /v1/generate_batch call
+AI_BATCH_TIMEOUT = 600  # read timeout of one batch call
+AI_MODEL_NAME = os.getenv("AI_MODEL_NAME", "phi3")  # part of the response cache key
+
+# Bump a template's version when its instructions change, so answers cached
+# for the old wording are not served again
+PROMPT_VERSIONS = {
+    "raw": 1,
+    "war_description": 1,
+    "report_description": 1,
+    "ipmt_summary": 1,
+}
 
 # -------------------------------
 # Query Local Private Model
 # -------------------------------
-def query_local_ai(prompt: str) -> str:
+def is_ai_error(text):
+    return not text or text.startswith("[AI Error]")
+
+
+def query_local_ai(prompt: str, template: str = "raw", fallback: str = None) -> str:
     """
     Send a prompt to the local private AI server (Flan-T5 model)
-    and return the generated text.
+    and return the generated text. Answers are cached (see cache.py), and
+    identical prompts already in flight wait for that call instead.
+    On failure returns `fallback` if given, else "[AI Error] ...".
     """
+    text = cached_call(prompt, AI_MODEL_NAME, template, PROMPT_VERSIONS[template], _post_prompt)
+    return fallback if fallback is not None and is_ai_error(text) else text
+
+
+def _post_prompt(prompt):
     try:
-        response = requests.post(
-            AI_API_URL,
-            headers={
-                "Content-Type": "application/json",
-                "x-api-key": AI_API_KEY,
-            },
-            json={"prompt": prompt},
-            timeout=120,
-        )
-        response.raise_for_status()
-        data = response.json()
+        data = post_json(AI_API_URL, {"prompt": prompt})
         return data.get("result", "").strip()
     except Exception as e:
         return f"[AI Error] {e}"
 
+
+def query_local_ai_batch(prompts, batch_size=AI_BATCH_SIZE, template: str = "raw", fallbacks=None) -> list:
+    """
+    Batch counterpart of query_local_ai(): one /v1/generate_batch call per
+    `batch_size` uncached prompts. Returns one string per prompt, in order; failed
+    items (or a failed call) come back as their entry in `fallbacks`, else
+    "[AI Error] ..." like query_local_ai().
+    """
+    texts = cached_batch(
+        prompts, AI_MODEL_NAME, template, PROMPT_VERSIONS[template],
+        lambda missing: _post_batch(missing, batch_size),
+    )
+    if fallbacks is None:
+        return texts
+    return [fallback if is_ai_error(text) else text for text, fallback in zip(texts, fallbacks)]
+
+
+def _post_batch(prompts, batch_size):
+    results = []
+    for start in range(0, len(prompts), batch_size):
+        chunk = list(prompts[start:start + batch_size])
+        try:
+            data = post_json(AI_BATCH_URL, {"prompts": chunk}, read_timeout=AI_BATCH_TIMEOUT)
+            items = data.get("results", [])
+            if len(items) != len(chunk):
+                raise ValueError(f"expected {len(chunk)} results, got {len(items)}")
+            results += [
+                (item.get("result") or "").strip() if item.get("status") == "ok"
+                else f"[AI Error] {item.get('error') or item.get('status')}"
+                for item in items
+            ]
+        except Exception as e:
+            results += [f"[AI Error] {e}"] * len(chunk)
+    return results
+
+
+def stream_local_ai(prompt: str, template: str = "raw"):
+    """
+    Streaming form of query_local_ai(): yields ("token", text) for each piece
+    as the model produces it, then ("done", full_text) or ("error", message).
+    A cached answer comes back as a single "done". Closing the generator
+    closes the connection, which stops the generation on the AI server.
+    """
+    key = response_key(AI_MODEL_NAME, template, PROMPT_VERSIONS[template], prompt)
+    if AI_CACHE_ENABLED:
+        cached = lookup({key}).get(key)
+        if cached:
+            yield "done", cached
+            return
+
+    try:
+        with closing(stream_events(AI_STREAM_URL, {"prompt": prompt})) as events:
+            for event, data in events:
+                if event == "done":
+                    text = (data.get("result") or "").strip()
+                    if AI_CACHE_ENABLED:
+                        try:
+                            store({key: text}, AI_MODEL_NAME, template)
+                        except Exception as e:
+                            print(f"[AI Cache] Could not store response: {e}")
+                    yield ("error", text) if is_ai_error(text) else ("done", text)
+                    return
+                if event == "error":
+                    yield "error", f"[AI Error] {data.get('error')}"
+                    return
+                yield "token", data.get("token", "")
+    except Exception as e:
+        yield "error", f"[AI Error] {e}"
+        return
+    yield "error", "[AI Error] Stream ended early"
+
 # -------------------------------
 # Enhanced WAR Description Generator
 # -------------------------------
+def war_description_prompt(request_obj: ServiceRequest) -> str:
+    """Prompt used by generate_war_description()."""
+    # --- Gather base info ---
+    requestor_description = (
+        request_obj.description.strip() if request_obj.description else "No description provided."
+    )
+
+    # --- Gather task reports ---
+    task_reports = TaskReport.objects.filter(request=request_obj)
+    report_texts = [r.report_text.strip() for r in task_reports if r.report_text.strip()]
+    reports_str = "\n".join([f"- {txt}" for txt in report_texts]) or "No personnel reports available."
+
+    # --- Build detailed prompt ---
+    return (
+        "You are an AI that generates short, professional government work logs.\n\n"
+        f"Requestor description:\n{requestor_description}\n\n"
+        f"Personnel task reports:\n{reports_str}\n\n"
+        "Write ONE concise sentence that summarizes the accomplishment clearly and factually. "
+        "Do not include names or personnel, focus only on the task performed. "
+        "Keep it formal, brief, and specific."
+    )
+
+
 def generate_war_description(request_obj: ServiceRequest) -> str:
     """
     Generate a professional, two-sentence Work Accomplishment Report (WAR) description
@@ -43,41 +153,58 @@ def generate_war_description(request_obj: ServiceRequest) -> str:
     and the second adds brief supporting detail if available.
     """
     try:
-        # --- Gather base info ---
-        activity_name = getattr(request_obj, "activity_name", "Service Request")
-        unit = request_obj.unit.name if request_obj.unit else "General Services"
-        requestor_description = (
-            request_obj.description.strip() if request_obj.description else "No description provided."
-        )
-
-        # --- Gather personnel info ---
-        personnel_names = [p.get_full_name() or p.username for p in request_obj.assigned_personnel.all()]
-        personnel_str = ", ".join(personnel_names) if personnel_names else "N/A"
-
-        # --- Gather task reports ---
-        task_reports = TaskReport.objects.filter(request=request_obj)
-        report_texts = [r.report_text.strip() for r in task_reports if r.report_text.strip()]
-        reports_str = "\n".join([f"- {txt}" for txt in report_texts]) or "No personnel reports available."
-
-        # --- Build detailed prompt ---
-        prompt = (
-                    "You are an AI that generates short, professional government work logs.\n\n"
-                    f"Requestor description:\n{requestor_description}\n\n"
-                    f"Personnel task reports:\n{reports_str}\n\n"
-                    "Write ONE concise sentence that summarizes the accomplishment clearly and factually. "
-                    "Do not include names or personnel, focus only on the task performed. "
-                    "Keep it formal, brief, and specific."
-                )
-
-        # --- Query AI model ---
-        return query_local_ai(prompt)
-
+        return query_local_ai(war_description_prompt(request_obj), "war_description")
     except Exception as e:
         return f"[AI Error] Failed to generate WAR: {e}"
 
+# -------------------------------
+# Migrated WAR Description Generator
+# -------------------------------
+def report_description_prompt(war) -> str:
+    """Prompt used by generate_report_description()."""
+    if war.request_id:
+        return war_description_prompt(war.request)
+
+    activity_name = war.activity_name or "Miscellaneous"
+    unit = war.unit.name if war.unit_id else "General Services"
+    return (
+        "You are an AI that generates short, professional government work logs.\n\n"
+        f"Activity: {activity_name}\n"
+        f"Unit: {unit}\n"
+        f"Date: {war.date_started}\n\n"
+        "Write ONE concise sentence that summarizes the accomplishment clearly and factually. "
+        "Do not include names or personnel, focus only on the task performed. "
+        "Keep it formal, brief, and specific."
+    )
+
+
+def generate_report_description(war) -> str:
+    """
+    Generate a one-sentence description for a WAR that has no linked ServiceRequest
+    (e.g. migrated records), using only the fields stored on the WAR itself.
+    """
+    if war.request_id:
+        return generate_war_description(war.request)
+    return query_local_ai(report_description_prompt(war), "report_description")
+
 # -------------------------------
 # IPMT Summary Generator
 # -------------------------------
+def ipmt_summary_prompt(success_indicator: str, war_descriptions: list) -> str:
+    """Prompt used by generate_ipmt_summary()."""
+    activities_text = "\n".join([f"- {desc}" for desc in war_descriptions])
+    return (
+        f"Summarize the following accomplishments for the success indicator '{success_indicator}':\n\n"
+        f"{activities_text}\n\n"
+        "Write in a concise, factual way about what was achieved."
+    )
+
+
+def ipmt_summary_fallback(war_descriptions: list) -> str:
+    """Plain summary used while the AI server is unavailable: the WAR descriptions, one sentence each."""
+    return " ".join(desc.strip().rstrip(".") + "." for desc in war_descriptions if desc.strip())
+
+
 def generate_ipmt_summary(success_indicator: str, war_descriptions: list) -> str:
     """
     Generate a summary statement for a given Success Indicator
@@ -85,12 +212,27 @@ def generate_ipmt_summary(success_indicator: str, war_descriptions: list) -> str
     """
     if not war_descriptions:
         return f"No accomplishments recorded for indicator: {success_indicator}."
-
-    activities_text = "\n".join([f"- {desc}" for desc in war_descriptions])
-    prompt = (
-        f"Summarize the following accomplishments for the success indicator '{success_indicator}':\n\n"
-        f"{activities_text}\n\n"
-        "Write in a concise, factual way about what was achieved."
+    return query_local_ai(
+        ipmt_summary_prompt(success_indicator, war_descriptions), "ipmt_summary",
+        fallback=ipmt_summary_fallback(war_descriptions),
     )
 
-    return query_local_ai(prompt)
+
+def generate_ipmt_summaries(items: list) -> list:
+    """
+    Batch form of generate_ipmt_summary(): items are (success_indicator,
+    war_descriptions) pairs; every prompt goes out through query_local_ai_batch().
+    """
+    summaries = [
+        None if descriptions else f"No accomplishments recorded for indicator: {indicator}."
+        for indicator, descriptions in items
+    ]
+    pending = [i for i, summary in enumerate(summaries) if summary is None]
+    generated = query_local_ai_batch(
+        [ipmt_summary_prompt(*items[i]) for i in pending],
+        template="ipmt_summary",
+        fallbacks=[ipmt_summary_fallback(items[i][1]) for i in pending],
+    )
+    for i, text in zip(pending, generated):
+        summaries[i] = text
+    return summaries
@@ -1,10 +1,16 @@
+import json
+
 from django.shortcuts import render, get_object_or_404, redirect
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
+from django.http import JsonResponse, StreamingHttpResponse
 
 from .models import AIReportSummary
 from apps.gso_reports.models import WorkAccomplishmentReport
+from apps.gso_reports.views import is_gso_or_director
 from .tasks import generate_war_description, generate_ipmt_summary
+from .backfill import WAR, REQUEST, description_queryset, description_prompt, save_description
+from .utils import stream_local_ai, ipmt_summary_prompt, ipmt_summary_fallback
 
 
 @login_required
@@ -69,3 +75,82 @@ def generate_ipmt_ai_summary(request, unit_name, month_filter):
         "month_filter": month_filter,
         "reports": reports,
     })
+
+
+# -------------------------------
+# Streamed Generation (server-sent events)
+# -------------------------------
+def _sse(data, event=None):
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data)}\n\n"
+
+
+def _event_stream(events):
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx: pass each event through at once
+    return response
+
+
+def _relay(prompt, template, finish, fallback=None):
+    """Turn stream_local_ai() into SSE; finish(text) gives the text sent with "done"."""
+    for event, text in stream_local_ai(prompt, template):
+        if event == "token":
+            yield _sse({"token": text})
+        elif event == "done":
+            yield _sse({"result": finish(text)}, "done")
+        else:
+            yield _sse({"error": text, "fallback": fallback}, "error")
+
+
+@login_required
+@user_passes_test(is_gso_or_director)
+def stream_generation(request):
+    """
+    Generate one text and relay it to the browser as server-sent events:
+    `data: {"token": ...}` while the model writes, then `event: done` with the
+    whole text or `event: error` (with a fallback when there is one).
+    Aborting the request cancels the generation on the AI server.
+
+    POST kind=description, type, id: the description of a WAR or ServiceRequest,
+    saved if the row is still empty.
+    POST kind=ipmt_summary, indicator, war_ids: an IPMT accomplishment summary,
+    left for the user to edit and save.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=400)
+
+    kind = request.POST.get("kind")
+    if kind == "description":
+        obj_type, obj_id = request.POST.get("type"), request.POST.get("id", "")
+        if obj_type not in (WAR, REQUEST) or not obj_id.isdigit():
+            return JsonResponse({"error": "Invalid report"}, status=400)
+        obj = description_queryset(obj_type).filter(id=obj_id).first()
+        if obj is None:
+            return JsonResponse({"error": "Report not found"}, status=404)
+        if (obj.description or "").strip():
+            return _event_stream([_sse({"result": obj.description}, "done")])
+
+        def finish(text):
+            # Someone else may have filled the row meanwhile; theirs is kept
+            if save_description(obj_type, obj.id, text):
+                return text
+            return obj.__class__.objects.filter(id=obj.id).values_list("description", flat=True).first() or text
+
+        prompt, template = description_prompt(obj_type, obj)
+        return _event_stream(_relay(prompt, template, finish))
+
+    if kind == "ipmt_summary":
+        indicator = request.POST.get("indicator", "")
+        war_ids = [int(w) for w in request.POST.get("war_ids", "").split(",") if w.strip().isdigit()]
+        found = dict(WorkAccomplishmentReport.objects.filter(id__in=war_ids).values_list("id", "description"))
+        descriptions = [found[w] for w in war_ids if found.get(w)]  # same input as collect_ipmt_reports()
+        if not descriptions:
+            return _event_stream([_sse({"result": f"No accomplishments recorded for indicator: {indicator}."}, "done")])
+
+        return _event_stream(_relay(
+            ipmt_summary_prompt(indicator, descriptions), "ipmt_summary",
+            lambda text: text, fallback=ipmt_summary_fallback(descriptions),
+        ))
+
+    return JsonResponse({"error": "Unknown generation type"}, status=400)
@@ -0,0 +1,140 @@
+# apps/gso_reports/activity_classifier.py
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter, namedtuple
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .activity_matcher import activity_matcher, ranked_activities, MISCELLANEOUS
+from .reclassify import war_chunks
+from .text_classifier import TfidfCentroidClassifier
+
+# -------------------------------
+# Config
+# -------------------------------
+CLASSIFIER_PATH = getattr(
+    settings, "ACTIVITY_CLASSIFIER_PATH",
+    os.path.join(settings.MEDIA_ROOT, "classifiers", "activity_classifier.npz"),
+)
+MIN_CONFIDENCE = getattr(settings, "ACTIVITY_CLASSIFIER_MIN_CONFIDENCE", 0.2)
+MIN_SAMPLES = 5   # activities with fewer labelled WARs are left out of training
+
+logger = logging.getLogger(__name__)
+
+# source is "keyword", "model" or "fallback"
+ActivityMatch = namedtuple("ActivityMatch", ["activity", "confidence", "source"])
+
+
+# -------------------------------
+# Process-wide Model
+# -------------------------------
+_model = None
+_model_mtime = None
+_lock = threading.Lock()
+
+
+def activity_classifier():
+    """
+    The trained model, or None before the first training. Reloaded when the
+    file on disk changes, so a retrain is picked up by every process.
+    """
+    global _model, _model_mtime
+    try:
+        mtime = os.stat(CLASSIFIER_PATH).st_mtime_ns
+    except OSError:
+        return None
+    with _lock:
+        if mtime != _model_mtime:
+            try:
+                with open(CLASSIFIER_PATH, "rb") as f:
+                    _model = TfidfCentroidClassifier.load(f)
+            except Exception:
+                logger.exception("Could not load activity classifier %s", CLASSIFIER_PATH)
+                _model = None
+            _model_mtime = mtime
+        return _model
+
+
+def classify_activity(*texts):
+    """
+    Keyword match across `texts` first (confidence 1.0); when no keyword
+    occurs, the trained model's guess if it is confident enough; otherwise
+    "Miscellaneous" with confidence 0.
+    """
+    matcher = activity_matcher()
+    for text in texts:
+        activity = matcher.match(text)
+        if activity is not None:
+            return ActivityMatch(activity, 1.0, "keyword")
+
+    model = activity_classifier()
+    if model is not None:
+        label, confidence = model.predict_one(" ".join(t for t in texts if t))
+        if label is not None and confidence >= MIN_CONFIDENCE:
+            # Only activities that are still active are returned
+            activity = next((a for a in matcher.values if a.name == label), None)
+            if activity is not None:
+                return ActivityMatch(activity, confidence, "model")
+
+    return ActivityMatch(matcher.fallback, 0.0, "fallback")
+
+
+# -------------------------------
+# Training
+# -------------------------------
+def training_samples():
+    """(text, activity) of every WAR labelled with an active activity other than Miscellaneous."""
+    labels = {a.name for a in ranked_activities()} - {MISCELLANEOUS}
+    texts, targets = [], []
+    for rows, _ in war_chunks(5000):
+        for _, activity, parts in rows:
+            if activity in labels:
+                text = " ".join(p for p in parts if p)
+                if text.strip():
+                    texts.append(text)
+                    targets.append(activity)
+    return texts, targets
+
+
+def train_classifier(holdout=0.2, min_samples=MIN_SAMPLES, path=CLASSIFIER_PATH, seed=0):
+    """
+    Fit the model on labelled WARs and save it to `path`. A `holdout` share
+    of the samples is first used to measure accuracy; the saved model is then
+    fitted on all of them. Returns (model, report).
+    """
+    texts, targets = training_samples()
+    counts = Counter(targets)
+    keep = {name for name, n in counts.items() if n >= min_samples}
+    if len(keep) < 2:
+        raise ValueError(f"Need at least 2 activities with {min_samples}+ labelled WARs; found {len(keep)}.")
+    samples = [(t, label) for t, label in zip(texts, targets) if label in keep]
+
+    report = {"counts": {name: counts[name] for name in sorted(keep)}, "accuracy": None, "tested": 0}
+    if holdout:
+        order = np.random.default_rng(seed).permutation(len(samples))
+        cut = int(len(samples) * holdout)
+        test = [samples[i] for i in order[:cut]]
+        train = [samples[i] for i in order[cut:]]
+        if test and train:
+            model = TfidfCentroidClassifier.fit([t for t, _ in train], [label for _, label in train])
+            predicted = model.predict([t for t, _ in test])
+            hits = sum(1 for (label, _), (_, expected) in zip(predicted, test) if label == expected)
+            report["accuracy"], report["tested"] = hits / len(test), len(test)
+
+    model = TfidfCentroidClassifier.fit(
+        [t for t, _ in samples], [label for _, label in samples],
+        meta={"trained_at": timezone.now().isoformat(), "accuracy": report["accuracy"]},
+    )
+
+    # Write next to the target and rename, so no process ever loads a half-written file
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, suffix=".npz", delete=False) as f:
+        model.save(f)
+    os.chmod(f.name, 0o644)  # mkstemp creates it owner-only
+    os.replace(f.name, path)
+    return model, report
@@ -0,0 +1,46 @@
+# apps/gso_reports/activity_matcher.py
+from django.conf import settings
+
+from .models import ActivityName
+from .keyword_matcher import KeywordMatcher
+from . import versions
+
+MISCELLANEOUS = "Miscellaneous"
+VERSION_NAME = "activity_matcher"
+
+KEYWORD_BOUNDARY = getattr(settings, "ACTIVITY_KEYWORD_BOUNDARY", "prefix")  # see keyword_matcher.BOUNDARIES
+# Seconds between checks of the shared version; classifying in between runs no query
+MATCHER_CHECK_EVERY = getattr(settings, "ACTIVITY_MATCHER_CHECK_EVERY", 5)
+
+
+# -------------------------------
+# Process-wide Instance
+# -------------------------------
+def ranked_activities():
+    """Active ActivityNames, best-ranked first: highest priority, then lowest id."""
+    return list(ActivityName.objects.filter(is_active=True).order_by("-priority", "id"))
+
+
+def _build():
+    activities = ranked_activities()
+    fallback = next((a for a in activities if a.name == MISCELLANEOUS), None)
+    if fallback is None:
+        fallback = ActivityName.objects.filter(name=MISCELLANEOUS).first()
+    return KeywordMatcher([(a, a.keyword_list()) for a in activities], fallback, KEYWORD_BOUNDARY)
+
+
+_matcher = versions.VersionedValue(VERSION_NAME, _build, check_every=MATCHER_CHECK_EVERY)
+
+
+def activity_matcher():
+    """
+    The compiled matcher for this process. Rebuilt only after an ActivityName
+    change: at once in the process that made it, within MATCHER_CHECK_EVERY
+    seconds in the others (the version is shared through the database).
+    """
+    return _matcher.get()
+
+
+def invalidate_matcher():
+    versions.bump(VERSION_NAME)
+    _matcher.expire()
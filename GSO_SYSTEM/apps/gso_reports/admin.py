@@ -1,10 +1,10 @@
 from django.contrib import admin
-from .models import WorkAccomplishmentReport, SuccessIndicator, ActivityName
+from .models import WorkAccomplishmentReport, SuccessIndicator, ActivityName, ReportJob
 
 
 @admin.register(ActivityName)
 class ActivityNameAdmin(admin.ModelAdmin):
-    list_display = ("name", "is_active")
+    list_display = ("name", "priority", "is_active")
     search_fields = ("name", "keywords")
     list_filter = ("is_active",)
 
@@ -21,3 +21,10 @@ class WorkAccomplishmentReportAdmin(admin.ModelAdmin):
     list_display = ("activity_name", "unit", "date_started", "status", "total_cost")
     list_filter = ("unit", "status", "date_started")
     search_fields = ("activity_name", "description")
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "rows_done", "rows_total", "created_by", "created_at", "finished_at")
+    list_filter = ("kind", "status")
+    readonly_fields = ("started_at", "finished_at")
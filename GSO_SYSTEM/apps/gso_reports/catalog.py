@@ -0,0 +1,84 @@
+# apps/gso_reports/catalog.py
+import threading
+from collections import defaultdict, namedtuple
+from functools import partial
+
+from .models import SuccessIndicator
+from . import versions
+
+VERSION_NAME = "indicator_catalog:{}"
+
+
+def activity_key(name):
+    """Case-insensitive key WAR activities and indicators are matched on."""
+    return (name or "").casefold()
+
+
+CatalogIndicator = namedtuple("CatalogIndicator", ["id", "code", "description", "activity", "is_active"])
+
+
+# -------------------------------
+# Indicator Catalog
+# -------------------------------
+class IndicatorCatalog:
+    """
+    A unit's SuccessIndicators held in memory, keyed by id, code and activity.
+    Built from one query; every lookup afterwards is a dictionary access.
+    """
+
+    def __init__(self, indicators):
+        self.by_id = {i.id: i for i in indicators}
+        self.active = [i for i in indicators if i.is_active]
+        self._by_code = {}
+        for i in indicators:
+            # Prefer active indicators when a code was reused
+            if i.is_active or i.code.lower() not in self._by_code:
+                self._by_code[i.code.lower()] = i
+        activity_map = defaultdict(list)
+        for i in self.active:
+            # Matches on its ActivityName, or on its code when none is linked
+            activity_map[activity_key(i.activity or i.code)].append(i.id)
+        self.activity_map = dict(activity_map)
+
+    def by_code(self, value):
+        """Look up 'CF1' or a 'CF1 - description' label (case-insensitive)."""
+        code = (value or "").split(" - ")[0].strip().lower()
+        return self._by_code.get(code)
+
+    def get(self, indicator_id):
+        return self.by_id.get(indicator_id)
+
+    @staticmethod
+    def label(indicator):
+        return f"{indicator.code} - {indicator.description}"
+
+
+def _load_catalog(unit_id):
+    rows = SuccessIndicator.objects.filter(unit_id=unit_id).order_by("id").values_list(
+        "id", "code", "description", "activity_name__name", "is_active"
+    )
+    return IndicatorCatalog([CatalogIndicator(*row) for row in rows])
+
+
+_catalogs = {}  # unit_id -> VersionedValue
+_catalogs_lock = threading.Lock()
+
+
+def indicator_catalog(unit_id):
+    """
+    A unit's catalog, built once per process and rebuilt after its indicators
+    change. The version is read on every call (one indexed query), so rollups
+    persisted from the catalog never see a stale copy.
+    """
+    with _catalogs_lock:
+        value = _catalogs.get(unit_id)
+        if value is None:
+            value = _catalogs[unit_id] = versions.VersionedValue(
+                VERSION_NAME.format(unit_id), partial(_load_catalog, unit_id)
+            )
+    return value.get()
+
+
+def invalidate_catalog(*unit_ids):
+    """Mark the catalogs of `unit_ids` as changed, for every worker process."""
+    versions.bump(*(VERSION_NAME.format(unit_id) for unit_id in {u for u in unit_ids if u}))
@@ -0,0 +1,73 @@
+# apps/gso_reports/ipmt_sheet.py
+"""
+Filling the IPMT template sheet.
+
+Only openpyxl is used here (no models) so the functions can run in
+spawned worker processes without setting up Django.
+"""
+import io
+import pickle
+
+from openpyxl.worksheet.cell_range import CellRange
+
+IPMT_FIRST_ROW = 13   # first "Success Indicators" row of the template
+IPMT_LAST_ROW = 26    # last row before the template footer
+
+_snapshot = None
+
+
+# -------------------------------
+# Sheet Filling
+# -------------------------------
+def fill_ipmt_sheet(ws, personnel, month_label, rows):
+    """
+    Write the personnel name (B8), month (B11) and the indicator rows into the
+    template sheet. Rows beyond the template's table push the footer down
+    instead of overwriting it.
+    """
+    ws["B8"] = personnel or "No personnel found"
+    ws["B11"] = month_label
+
+    # Merged cells inside the table cannot take values
+    for merged in list(ws.merged_cells.ranges):
+        if merged.min_row <= IPMT_LAST_ROW and merged.max_row >= IPMT_FIRST_ROW:
+            ws.unmerge_cells(merged.coord)
+
+    extra = len(rows) - (IPMT_LAST_ROW - IPMT_FIRST_ROW + 1)
+    if extra > 0:
+        # insert_rows() does not move merged ranges, so re-merge the footer's ranges
+        footer = [m.coord for m in ws.merged_cells.ranges if m.min_row > IPMT_LAST_ROW]
+        for coord in footer:
+            ws.unmerge_cells(coord)
+        ws.insert_rows(IPMT_LAST_ROW + 1, amount=extra)
+        for coord in footer:
+            moved = CellRange(coord)
+            moved.shift(row_shift=extra)
+            ws.merge_cells(moved.coord)
+
+    for i, r in enumerate(rows, start=IPMT_FIRST_ROW):
+        ws.cell(row=i, column=1).value = r.get("indicator", "")
+        ws.cell(row=i, column=2).value = r.get("description", "")
+        ws.cell(row=i, column=3).value = r.get("remarks", "")
+
+
+# -------------------------------
+# Worker Process Entry Points
+# -------------------------------
+def init_render_worker(snapshot):
+    """Pool initializer: keep the pickled template workbook for this process."""
+    global _snapshot
+    _snapshot = snapshot
+
+
+def render_ipmt_workbook(task):
+    """
+    Render one personnel workbook from the template snapshot.
+    `task` is (filename, personnel, month_label, rows); returns (filename, xlsx bytes).
+    """
+    filename, personnel, month_label, rows = task
+    wb = pickle.loads(_snapshot)
+    fill_ipmt_sheet(wb.active, personnel, month_label, rows)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return filename, buffer.getvalue()
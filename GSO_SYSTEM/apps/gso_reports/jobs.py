@@ -0,0 +1,152 @@
+# apps/gso_reports/jobs.py
+import io
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files import File
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from apps.ai_service.backfill import run_backfill
+from .models import ReportJob
+from .rollup import parse_month
+from .utils import (
+    write_accomplishment_csv, write_accomplishment_xlsx, generate_ipmt_excel,
+    ipmt_export_tasks, iter_ipmt_zip,
+)
+
+# -------------------------------
+# Config
+# -------------------------------
+JOB_WORKERS = 2                # background threads used by web workers
+PROGRESS_INTERVAL = 1.0        # seconds between progress writes
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="report-job")
+
+
+class JobProgress:
+    """progress(done, total) callback that writes to the job at most once per interval."""
+
+    def __init__(self, job_id, interval=PROGRESS_INTERVAL):
+        self.job_id = job_id
+        self.interval = interval
+        self._last = 0.0
+
+    def __call__(self, done, total):
+        now = time.monotonic()
+        if done < total and now - self._last < self.interval:
+            return
+        self._last = now
+        ReportJob.objects.filter(id=self.job_id).update(rows_done=done, rows_total=total)
+
+
+# -------------------------------
+# Job Runners
+# Each takes (job, binary file, progress) and returns the download filename,
+# or None when the job produces no file.
+# -------------------------------
+def _stamp():
+    return timezone.localtime().strftime("%Y%m%d")
+
+
+def _accomplishment_csv(job, out, progress):
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    write_accomplishment_csv(text, job.params.get("q"), job.params.get("unit"), progress)
+    text.flush()
+    text.detach()
+    return f"Accomplishment_Report_{_stamp()}.csv"
+
+
+def _accomplishment_xlsx(job, out, progress):
+    write_accomplishment_xlsx(out, job.params.get("q"), job.params.get("unit"), progress)
+    return f"Accomplishment_Report_{_stamp()}.xlsx"
+
+
+def _ipmt_excel(job, out, progress):
+    month = job.params.get("month")
+    unit = job.params.get("unit") or "all"
+    generate_ipmt_excel(month, unit, job.params.get("personnel") or None, output=out, progress=progress)
+    return f"IPMT_{unit}_{month}.xlsx"
+
+
+def _ipmt_zip(job, out, progress):
+    period = parse_month(job.params.get("month"))
+    unit = job.params.get("unit") or "all"
+    tasks = ipmt_export_tasks(period, unit)
+    if not tasks:
+        raise ValueError("No personnel found for this unit.")
+    for chunk in iter_ipmt_zip(tasks, progress=progress):
+        out.write(chunk)
+    return f"IPMT_{unit.title().replace(' ', '_')}_{period:%Y-%m}.zip"
+
+
+def _ai_descriptions(job, out, progress):
+    filled, failed = run_backfill(
+        concurrency=int(job.params.get("concurrency", 4)),
+        limit=job.params.get("limit"),
+        progress=progress,
+    )
+    job.message = f"{filled} descriptions generated, {failed} failed."
+    return None
+
+
+RUNNERS = {
+    "accomplishment_csv": _accomplishment_csv,
+    "accomplishment_xlsx": _accomplishment_xlsx,
+    "ipmt_excel": _ipmt_excel,
+    "ipmt_zip": _ipmt_zip,
+    "ai_descriptions": _ai_descriptions,
+}
+
+
+# -------------------------------
+# Run / Submit
+# -------------------------------
+def run_job(job_id):
+    """Run one queued job to completion, recording status, progress and the result file."""
+    close_old_connections()
+    try:
+        updated = ReportJob.objects.filter(id=job_id, status="Queued").update(
+            status="Running", started_at=timezone.now()
+        )
+        if not updated:
+            return  # already picked up elsewhere
+        job = ReportJob.objects.get(id=job_id)
+
+        try:
+            with tempfile.TemporaryFile() as out:
+                filename = RUNNERS[job.kind](job, out, JobProgress(job.id))
+                if filename:
+                    out.seek(0)
+                    job.result.save(filename, File(out), save=False)
+            job.status = "Done"
+        except Exception as e:
+            logger.exception("Report job #%s (%s) failed", job.id, job.kind)
+            job.status = "Failed"
+            job.error = str(e)
+
+        # rows_done/rows_total were written by JobProgress; keep them
+        job.refresh_from_db(fields=["rows_done", "rows_total"])
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "message", "result", "finished_at"])
+    finally:
+        close_old_connections()
+
+
+def submit_job(kind, params=None, user=None):
+    """Create a ReportJob and run it on a background thread once the transaction commits."""
+    if kind not in RUNNERS:
+        raise ValueError(f"Unknown report job: {kind}")
+    job = ReportJob.objects.create(kind=kind, params=params or {}, created_by=user)
+    transaction.on_commit(lambda: _executor.submit(run_job, job.id))
+    return job
+
+
+def result_filename(job):
+    """Download name of a job's result, without the storage directory."""
+    return os.path.basename(job.result.name) if job.result else ""
@@ -0,0 +1,100 @@
+# apps/gso_reports/keyword_matcher.py
+"""
+Keyword -> activity matching compiled into one regular expression.
+
+No Django imports, so worker processes (see reclassify.py) can build a
+matcher from plain (name, keywords) pairs without setting up Django.
+"""
+import re
+
+# How a keyword must sit in the text:
+#   "substring" - anywhere ("wir" matches "rewiring")
+#   "prefix"    - at the start of a word ("paint" matches "painted", not "repaint")
+#   "word"      - as a whole word
+BOUNDARIES = {
+    "substring": ("", ""),
+    "prefix": (r"\b", ""),
+    "word": (r"\b", r"\b"),
+}
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+
+class KeywordMatcher:
+    """
+    All keywords of `entries` ([(value, [keyword, ...]), ...], best-ranked first)
+    compiled into one regular expression. When several entries match a text the
+    best-ranked one wins, whatever the keyword's position.
+    """
+
+    def __init__(self, entries, fallback=None, boundary="prefix"):
+        self.values = [value for value, _ in entries]
+        self.fallback = fallback
+        self._rank = {}  # normalized keyword -> index of its best-ranked entry
+        for index, (_, keywords) in enumerate(entries):
+            for keyword in keywords:
+                if keyword.strip():
+                    self._rank.setdefault(_normalize(keyword), index)
+
+        self.pattern = None
+        if self._rank:
+            start, end = BOUNDARIES[boundary]
+            # The regex reports one keyword per position: the first alternative that
+            # matches there. Best-ranked first, then longest ("wall paint" before "wall")
+            alternation = "|".join(
+                r"\s+".join(re.escape(part) for part in keyword.split())
+                for keyword in sorted(self._rank, key=lambda k: (self._rank[k], -len(k)))
+            )
+            # Lookahead: report a match at every position, including overlapping ones
+            self.pattern = re.compile(rf"(?=({start}(?:{alternation}){end}))", re.IGNORECASE)
+
+    def match(self, text):
+        """Best-ranked value whose keyword occurs in `text`, or None."""
+        if not text or not self.pattern:
+            return None
+        best = None
+        for found in self.pattern.finditer(text):
+            rank = self._rank[_normalize(found.group(1))]
+            if best is None or rank < best:
+                best = rank
+                if best == 0:
+                    break
+        return self.values[best] if best is not None else None
+
+    def classify(self, *texts):
+        """First match across `texts` (in order), else the fallback."""
+        for text in texts:
+            value = self.match(text)
+            if value is not None:
+                return value
+        return self.fallback
+
+
+# -------------------------------
+# Worker Process Entry Points (reclassification)
+# -------------------------------
+_worker_matcher = None
+
+
+def init_classify_worker(entries, fallback, boundary):
+    """Pool initializer: compile the matcher once per worker process."""
+    global _worker_matcher
+    _worker_matcher = KeywordMatcher(entries, fallback, boundary)
+
+
+def classify_rows(rows):
+    """
+    rows: [(id, current activity, (text, ...)), ...]
+    Returns ([(id, current, new), ...] for the rows whose activity changes,
+    [(id, current, texts), ...] for the rows nothing matched).
+    """
+    changed, unmatched = [], []
+    for row_id, current, texts in rows:
+        new = _worker_matcher.classify(*texts)
+        if new is None:
+            unmatched.append((row_id, current, texts))
+        elif new != current:
+            changed.append((row_id, current, new))
+    return changed, unmatched
@@ -0,0 +1,65 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from apps.gso_reports.catalog import activity_key
+from apps.gso_reports.rollup import build_war_index, cells_from_index
+
+
+class Command(BaseCommand):
+    help = "Benchmark IPMT cell grouping: legacy nested loops vs. the (personnel, activity) index"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--personnel", type=int, default=50)
+        parser.add_argument("--indicators", type=int, default=40)
+        parser.add_argument("--wars", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        personnel = list(range(1, options["personnel"] + 1))
+        # indicator id -> activity name (a few activities have no indicator)
+        indicators = {i: f"Activity {i}" for i in range(1, options["indicators"] + 1)}
+        activities = list(indicators.values()) + ["Unmapped A", "Unmapped B"]
+
+        wars = [
+            {
+                "id": war_id,
+                "activity": rng.choice(activities),
+                "description": f"Work item {war_id}",
+                "personnel": rng.sample(personnel, rng.randint(1, 3)),
+            }
+            for war_id in range(1, options["wars"] + 1)
+        ]
+
+        # --- Legacy: users x indicators x WARs with an M2M membership test ---
+        start = time.perf_counter()
+        legacy = {}
+        for user in personnel:
+            for indicator_id, activity in indicators.items():
+                matched = [w for w in wars if user in w["personnel"] and w["activity"] == activity]
+                legacy[(user, indicator_id)] = [w["id"] for w in matched]
+        legacy_time = time.perf_counter() - start
+
+        # --- Index: one pass to build, then one lookup per cell ---
+        start = time.perf_counter()
+        rows = [(p, w["id"], w["activity"], w["description"]) for w in wars for p in w["personnel"]]
+        indicator_lookup = {activity_key(activity): [indicator_id] for indicator_id, activity in indicators.items()}
+        cells = cells_from_index(build_war_index(rows), indicator_lookup)
+        indexed = {
+            (user, indicator_id): list(cells.get((user, indicator_id, ""), ([], ""))[0])
+            for user in personnel
+            for indicator_id in indicators
+        }
+        index_time = time.perf_counter() - start
+
+        if indexed != legacy:
+            self.stderr.write(self.style.ERROR("Results differ between legacy and indexed grouping!"))
+            return
+
+        self.stdout.write(
+            f"{len(personnel)} personnel x {len(indicators)} indicators x {len(wars)} WARs"
+        )
+        self.stdout.write(f"  Legacy nested loops : {legacy_time * 1000:10.1f} ms")
+        self.stdout.write(f"  Prebuilt index      : {index_time * 1000:10.1f} ms")
+        self.stdout.write(self.style.SUCCESS(f"  Speedup             : {legacy_time / index_time:10.1f}x"))
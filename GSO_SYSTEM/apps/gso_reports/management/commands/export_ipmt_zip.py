@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from apps.gso_reports.rollup import parse_month
+from apps.gso_reports.utils import ipmt_export_tasks, iter_ipmt_zip, IPMT_EXPORT_WORKERS
+
+
+class Command(BaseCommand):
+    help = "Build one IPMT workbook per personnel for a unit (or all units) into a zip file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("month", help="Month in YYYY-MM format")
+        parser.add_argument("--unit", default="all", help="Unit name, or 'all' (default)")
+        parser.add_argument("--workers", type=int, default=IPMT_EXPORT_WORKERS,
+                            help=f"Worker processes (default {IPMT_EXPORT_WORKERS})")
+        parser.add_argument("--output", help="Zip file to write (default IPMT_<unit>_<month>.zip)")
+
+    def handle(self, *args, **options):
+        period = parse_month(options["month"])
+        if not period:
+            raise CommandError("Month must be in YYYY-MM format.")
+
+        started = time.perf_counter()
+        tasks = ipmt_export_tasks(period, options["unit"])
+        if not tasks:
+            raise CommandError("No personnel found for this unit.")
+
+        output = options["output"] or f"IPMT_{options['unit'].title().replace(' ', '_')}_{period:%Y-%m}.zip"
+        with open(output, "wb") as f:
+            for chunk in iter_ipmt_zip(tasks, workers=options["workers"]):
+                f.write(chunk)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"{len(tasks)} IPMT workbooks written to {output} in {elapsed:.1f}s."))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from apps.gso_reports.rollup import rebuild_all
+
+
+class Command(BaseCommand):
+    help = "Rebuild the monthly IPMT rollup table from all WARs"
+
+    def handle(self, *args, **kwargs):
+        total = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f"IPMT rollup rebuilt for {total} unit-months."))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from apps.gso_reports.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search documents for WARs and service requests"
+
+    def handle(self, *args, **kwargs):
+        total = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt: {total} documents."))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from apps.gso_reports.reclassify import reclassify_activities, RECLASSIFY_CHUNK
+
+
+class Command(BaseCommand):
+    help = "Re-run the activity keyword matcher (and trained classifier) over all WARs and service requests"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Worker processes (default 4)")
+        parser.add_argument("--chunk-size", type=int, default=RECLASSIFY_CHUNK,
+                            help=f"Rows read per chunk (default {RECLASSIFY_CHUNK})")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(model, scanned, changed):
+            self.stdout.write(f"  {model}: {scanned} scanned, {changed} changed", ending="\r")
+            self.stdout.flush()
+
+        result = reclassify_activities(
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+            dry_run=options["dry_run"],
+            progress=progress,
+        )
+        self.stdout.write("")
+
+        moves = result["moves"]
+        if moves:
+            self.stdout.write("Moved between activities:")
+            width = max(len(f"{old} -> {new}") for _, old, new in moves)
+            for (model, old, new), count in sorted(moves.items(), key=lambda item: (item[0][0], -item[1])):
+                self.stdout.write(f"  {model:<25} {f'{old} -> {new}':<{width}}  {count}")
+
+        for model, scanned in result["scanned"].items():
+            self.stdout.write(f"{model}: {scanned} scanned, {result['changed'][model]} changed")
+
+        elapsed = time.perf_counter() - started
+        verb = "would be reclassified (dry run)" if options["dry_run"] else "reclassified"
+        total = sum(result["changed"].values())
+        self.stdout.write(self.style.SUCCESS(f"{total} rows {verb} in {elapsed:.1f}s."))
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.gso_reports.models import ReportJob
+from apps.gso_reports.jobs import run_job
+
+
+class Command(BaseCommand):
+    help = "Run queued report jobs in this process (e.g. jobs left behind by a restarted web worker)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stale", type=int, default=0,
+                            help="Re-queue jobs stuck in 'Running' for more than this many minutes")
+
+    def handle(self, *args, **options):
+        if options["stale"]:
+            cutoff = timezone.now() - timedelta(minutes=options["stale"])
+            requeued = ReportJob.objects.filter(status="Running", started_at__lt=cutoff).update(
+                status="Queued", rows_done=0
+            )
+            if requeued:
+                self.stdout.write(f"Re-queued {requeued} stale job(s).")
+
+        job_ids = list(ReportJob.objects.filter(status="Queued").order_by("created_at").values_list("id", flat=True))
+        for job_id in job_ids:
+            run_job(job_id)
+            job = ReportJob.objects.get(id=job_id)
+            self.stdout.write(f"{job} {job.message or job.error}".rstrip())
+
+        self.stdout.write(self.style.SUCCESS(f"{len(job_ids)} report job(s) processed."))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from apps.gso_reports.activity_classifier import train_classifier, CLASSIFIER_PATH, MIN_SAMPLES
+
+
+class Command(BaseCommand):
+    help = "Train the fallback activity classifier from labelled WARs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--holdout", type=float, default=0.2,
+                            help="Share of samples held out to measure accuracy (default 0.2, 0 to skip)")
+        parser.add_argument("--min-samples", type=int, default=MIN_SAMPLES,
+                            help=f"Minimum labelled WARs per activity (default {MIN_SAMPLES})")
+        parser.add_argument("--output", default=CLASSIFIER_PATH, help="Model file (default: ACTIVITY_CLASSIFIER_PATH)")
+
+    def handle(self, *args, **options):
+        if not 0 <= options["holdout"] < 1:
+            raise CommandError("--holdout must be between 0 and 1.")
+
+        started = time.perf_counter()
+        try:
+            model, report = train_classifier(options["holdout"], options["min_samples"], options["output"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        for name, count in report["counts"].items():
+            self.stdout.write(f"  {name:<30} {count}")
+        if report["accuracy"] is not None:
+            self.stdout.write(f"Holdout accuracy: {report['accuracy']:.1%} on {report['tested']} WARs")
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained on {model.meta['samples']} WARs ({model.meta['features']} features) "
+            f"in {elapsed:.1f}s -> {options['output']}"
+        ))
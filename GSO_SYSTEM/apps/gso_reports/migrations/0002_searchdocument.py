@@ -0,0 +1,81 @@
+from django.db import migrations, models
+
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE gso_reports_searchdocument
+    ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(body, ''))) STORED
+    """,
+    "CREATE INDEX gso_reports_searchdocument_vector_gin ON gso_reports_searchdocument USING GIN (search_vector)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS gso_reports_searchdocument_vector_gin",
+    "ALTER TABLE gso_reports_searchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE gso_reports_searchdocument_fts USING fts5(
+        body, content='gso_reports_searchdocument', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER gso_reports_searchdocument_ai AFTER INSERT ON gso_reports_searchdocument BEGIN
+        INSERT INTO gso_reports_searchdocument_fts(rowid, body) VALUES (new.id, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER gso_reports_searchdocument_ad AFTER DELETE ON gso_reports_searchdocument BEGIN
+        INSERT INTO gso_reports_searchdocument_fts(gso_reports_searchdocument_fts, rowid, body)
+        VALUES ('delete', old.id, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER gso_reports_searchdocument_au AFTER UPDATE ON gso_reports_searchdocument BEGIN
+        INSERT INTO gso_reports_searchdocument_fts(gso_reports_searchdocument_fts, rowid, body)
+        VALUES ('delete', old.id, old.body);
+        INSERT INTO gso_reports_searchdocument_fts(rowid, body) VALUES (new.id, new.body);
+    END
+    """,
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS gso_reports_searchdocument_ai",
+    "DROP TRIGGER IF EXISTS gso_reports_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS gso_reports_searchdocument_au",
+    "DROP TABLE IF EXISTS gso_reports_searchdocument_fts",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for sql in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gso_reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(max_length=30)),
+                ('object_id', models.BigIntegerField()),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('doc_type', 'object_id'), name='unique_search_document')],
+            },
+        ),
+        migrations.RunPython(
+            _run({"postgresql": POSTGRES_FORWARD, "sqlite": SQLITE_FORWARD}),
+            _run({"postgresql": POSTGRES_BACKWARD, "sqlite": SQLITE_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,34 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gso_accounts', '0001_initial'),
+        ('gso_reports', '0002_searchdocument'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IPMTRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('activity_name', models.CharField(blank=True, max_length=255)),
+                ('war_ids', models.JSONField(default=list)),
+                ('war_count', models.PositiveIntegerField(default=0)),
+                ('description', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('indicator', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='gso_reports.successindicator')),
+                ('personnel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ipmt_rollups', to=settings.AUTH_USER_MODEL)),
+                ('unit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gso_accounts.unit')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['unit', 'period', 'personnel'], name='ipmt_rollup_lookup_idx')],
+                'constraints': [models.UniqueConstraint(fields=('personnel', 'unit', 'period', 'indicator', 'activity_name'), name='unique_ipmt_rollup_cell')],
+            },
+        ),
+    ]
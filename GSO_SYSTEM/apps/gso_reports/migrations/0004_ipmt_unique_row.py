@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+def remove_duplicate_ipmt_rows(apps, schema_editor):
+    """Keep the most recently updated row for each (personnel, unit, month, indicator)."""
+    IPMT = apps.get_model("gso_reports", "IPMT")
+    seen = set()
+    duplicates = []
+    rows = IPMT.objects.order_by("-updated_at", "-id").values_list(
+        "id", "personnel_id", "unit_id", "month", "indicator_id"
+    )
+    for pk, *key in rows.iterator():
+        key = tuple(key)
+        if key in seen:
+            duplicates.append(pk)
+        else:
+            seen.add(key)
+    IPMT.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gso_reports', '0003_ipmtrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_ipmt_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ipmt',
+            constraint=models.UniqueConstraint(fields=('personnel', 'unit', 'month', 'indicator'), name='unique_ipmt_row'),
+        ),
+    ]
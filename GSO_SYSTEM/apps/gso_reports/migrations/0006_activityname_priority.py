@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gso_reports', '0005_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activityname',
+            name='priority',
+            field=models.IntegerField(default=0, help_text='When a description matches several activities, the highest priority wins'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    # Existing WARs and requests were saved before the index existed; without
+    # this, search returns nothing until rebuild_search_index is run by hand.
+    # A fresh database has nothing to index, so the current models are only
+    # touched when there are rows.
+    War = apps.get_model("gso_reports", "WorkAccomplishmentReport")
+    ServiceRequest = apps.get_model("gso_requests", "ServiceRequest")
+    if not (War.objects.exists() or ServiceRequest.objects.exists()):
+        return
+
+    from apps.gso_reports.search import rebuild_index
+    rebuild_index()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gso_reports', '0007_dataversion'),
+        ('gso_requests', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
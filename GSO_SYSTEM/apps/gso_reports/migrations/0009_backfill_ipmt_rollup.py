@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    # Existing WARs predate the rollup table; without this, previews and
+    # exports read no cells until rebuild_ipmt_rollup is run by hand.
+    # A fresh database has nothing to roll up, so the current models are
+    # only touched when there are WARs.
+    War = apps.get_model("gso_reports", "WorkAccomplishmentReport")
+    if not War.objects.exists():
+        return
+
+    from apps.gso_reports.rollup import rebuild_all
+    rebuild_all()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gso_reports', '0008_backfill_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+import calendar
+from datetime import datetime
+
+from django.db import migrations
+
+MONTHS = {name.lower(): n for n, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): n for n, name in enumerate(calendar.month_abbr) if name})
+
+
+def month_label(value):
+    """'2025-09', '2025-09-01', 'sep 2025' ... -> 'September 2025' (None if unparseable)."""
+    value = (value or "").strip()
+    for fmt in ("%Y-%m", "%Y-%m-%d"):
+        try:
+            parsed = datetime.strptime(value, fmt)
+            return f"{calendar.month_name[parsed.month]} {parsed.year}"
+        except ValueError:
+            pass
+    parts = value.replace(",", " ").split()
+    if len(parts) == 2 and parts[0].lower() in MONTHS and parts[1].isdigit():
+        return f"{calendar.month_name[MONTHS[parts[0].lower()]]} {int(parts[1])}"
+    return None
+
+
+def normalize_months(apps, schema_editor):
+    """
+    Store every IPMT.month as 'September 2025', the label bulk_save_ipmt() looks
+    rows up by. Rows saved earlier under another spelling of the same month are
+    merged into the most recently updated one, which keeps the union of their WAR links.
+    """
+    IPMT = apps.get_model("gso_reports", "IPMT")
+    Links = IPMT.reports.through
+
+    groups = {}
+    rows = IPMT.objects.order_by("-updated_at", "-id").values_list(
+        "id", "personnel_id", "unit_id", "month", "indicator_id"
+    )
+    for pk, personnel_id, unit_id, month, indicator_id in rows.iterator():
+        label = month_label(month) or month
+        groups.setdefault((personnel_id, unit_id, label, indicator_id), []).append((pk, month))
+
+    for (_, _, label, _), members in groups.items():
+        (keep, month), duplicates = members[0], [pk for pk, _ in members[1:]]
+        if duplicates:
+            linked = set(Links.objects.filter(ipmt_id=keep).values_list("workaccomplishmentreport_id", flat=True))
+            moved = set(
+                Links.objects.filter(ipmt_id__in=duplicates).values_list("workaccomplishmentreport_id", flat=True)
+            ) - linked
+            Links.objects.bulk_create([Links(ipmt_id=keep, workaccomplishmentreport_id=w) for w in moved])
+            IPMT.objects.filter(id__in=duplicates).delete()
+        if month != label:
+            IPMT.objects.filter(id=keep).update(month=label)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gso_reports', '0009_backfill_ipmt_rollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_months, migrations.RunPython.noop),
+    ]
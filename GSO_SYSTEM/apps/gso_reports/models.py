@@ -18,6 +18,10 @@ class ActivityName(models.Model):
         blank=True
     )
     is_active = models.BooleanField(default=True)
+    priority = models.IntegerField(
+        default=0,
+        help_text="When a description matches several activities, the highest priority wins"
+    )
 
     def keyword_list(self):
         return [kw.strip().lower() for kw in self.keywords.split(",") if kw.strip()]
@@ -120,12 +124,137 @@ class IPMT(models.Model):
 
     reports = models.ManyToManyField(WorkAccomplishmentReport, blank=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["personnel", "unit", "month", "indicator"],
+                name="unique_ipmt_row",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.personnel} - {self.month} - {self.indicator.code}"
 
 
 
 
+class IPMTRollup(models.Model):
+    """
+    Pre-aggregated IPMT cell: all WARs of one personnel, unit and month that map to
+    one success indicator. Maintained incrementally by signals (see rollup.py).
+    Rows with no indicator hold WARs whose activity matches no active indicator.
+    """
+    personnel = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="ipmt_rollups")
+    unit = models.ForeignKey(Unit, on_delete=models.CASCADE)
+    period = models.DateField()  # first day of the month
+    indicator = models.ForeignKey(SuccessIndicator, on_delete=models.CASCADE, null=True, blank=True)
+    activity_name = models.CharField(max_length=255, blank=True)
+    war_ids = models.JSONField(default=list)
+    war_count = models.PositiveIntegerField(default=0)
+    description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["personnel", "unit", "period", "indicator", "activity_name"],
+                name="unique_ipmt_rollup_cell",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["unit", "period", "personnel"], name="ipmt_rollup_lookup_idx"),
+        ]
+
+    def __str__(self):
+        code = self.indicator.code if self.indicator_id else self.activity_name
+        return f"{self.personnel} - {self.period:%B %Y} - {code} ({self.war_count})"
+
+
+class SearchDocument(models.Model):
+    """
+    Denormalized full-text search row for one WAR or ServiceRequest.
+    Kept up to date by signals; the engine-specific index (tsvector + GIN on
+    PostgreSQL, FTS5 on SQLite) is created in migration 0002.
+    """
+    doc_type = models.CharField(max_length=30)  # "WorkAccomplishmentReport" / "ServiceRequest"
+    object_id = models.BigIntegerField()
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["doc_type", "object_id"], name="unique_search_document"),
+        ]
+
+    def __str__(self):
+        return f"{self.doc_type} #{self.object_id}"
+
+
+
+class ReportJob(models.Model):
+    """
+    A report export or AI job run off the request thread (see jobs.py).
+    The browser polls its progress and downloads `result` once it is done.
+    """
+    KIND_CHOICES = [
+        ("accomplishment_csv", "Accomplishment Report (CSV)"),
+        ("accomplishment_xlsx", "Accomplishment Report (Excel)"),
+        ("ipmt_excel", "IPMT Report (Excel)"),
+        ("ipmt_zip", "IPMT Workbooks (ZIP)"),
+        ("ai_descriptions", "AI Descriptions"),
+    ]
+    STATUS_CHOICES = [
+        ("Queued", "Queued"),
+        ("Running", "Running"),
+        ("Done", "Done"),
+        ("Failed", "Failed"),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="Queued")
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="report_jobs"
+    )
+
+    # Progress
+    rows_done = models.PositiveIntegerField(default=0)
+    rows_total = models.PositiveIntegerField(default=0)
+    message = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+
+    # Output (stored under MEDIA_ROOT/report_jobs/)
+    result = models.FileField(upload_to="report_jobs/%Y/%m/", blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.id} ({self.status})"
+
+    @property
+    def percent(self):
+        if self.status == "Done":
+            return 100
+        return int(self.rows_done * 100 / self.rows_total) if self.rows_total else 0
+
+
+class DataVersion(models.Model):
+    """
+    Counter bumped whenever the data behind an in-memory structure changes
+    (see versions.py). Kept in the database so every worker process sees it.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
 class DataMigration(models.Model):
     date_started = models.DateField()
     date_completed = models.DateField(null=True, blank=True)
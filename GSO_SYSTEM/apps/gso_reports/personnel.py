@@ -0,0 +1,107 @@
+# apps/gso_reports/personnel.py
+import re
+from collections import defaultdict, namedtuple
+
+from apps.gso_accounts.models import User
+from . import versions
+
+NAME_INDEX_VERSION = "personnel_name_index"
+
+Resolution = namedtuple("Resolution", ["users", "matches", "unresolved", "ambiguous"])
+
+
+# -------------------------------
+# Name Index
+# -------------------------------
+def normalize_name(value):
+    """Lowercase and collapse whitespace: '  Juan   DELA Cruz ' -> 'juan dela cruz'."""
+    return re.sub(r"\s+", " ", (value or "").strip()).lower()
+
+
+def _build_name_index():
+    """
+    {"username": {name: [ids]}, "full": {...}, "last": {...}} over every user,
+    built from one query.
+    """
+    index = {"username": defaultdict(list), "full": defaultdict(list), "last": defaultdict(list)}
+    for user_id, username, first, last in User.objects.values_list(
+        "id", "username", "first_name", "last_name"
+    ).order_by("id"):
+        index["username"][normalize_name(username)].append(user_id)
+        full = normalize_name(f"{first} {last}")
+        if full:
+            index["full"][full].append(user_id)
+        if normalize_name(last):
+            index["last"][normalize_name(last)].append(user_id)
+    return {kind: dict(names) for kind, names in index.items()}
+
+
+_name_index = versions.VersionedValue(NAME_INDEX_VERSION, _build_name_index)
+
+
+def name_index():
+    """The name index, rebuilt in this process whenever any worker saves a user."""
+    return _name_index.get()
+
+
+def invalidate_name_index():
+    versions.bump(NAME_INDEX_VERSION)
+
+
+# -------------------------------
+# Resolver
+# -------------------------------
+def _candidates(index, name):
+    """Username first, then "first last", then last name; first non-empty tier wins."""
+    for kind in ("username", "full", "last"):
+        ids = index[kind].get(name)
+        if ids:
+            return ids
+    return []
+
+
+def resolve_personnel(identifiers):
+    """
+    Resolve usernames / full names / last names to users in one pass.
+
+    Returns a Resolution of:
+      users      - resolved User objects, in input order, without duplicates
+      matches    - {identifier: User}
+      unresolved - identifiers that matched nobody
+      ambiguous  - {identifier: [User, ...]} for names shared by several users
+    """
+    index = name_index()
+    wanted, seen = [], set()
+    for identifier in identifiers or []:
+        identifier = (identifier or "").strip()
+        if identifier and identifier not in seen:
+            seen.add(identifier)
+            wanted.append((identifier, _candidates(index, normalize_name(identifier))))
+
+    user_ids = {user_id for _, ids in wanted for user_id in ids}
+    by_id = User.objects.in_bulk(user_ids) if user_ids else {}
+
+    users, matches, unresolved, ambiguous = [], {}, [], {}
+    for identifier, ids in wanted:
+        found = [by_id[i] for i in ids if i in by_id]
+        if not found:
+            unresolved.append(identifier)
+        elif len(found) > 1:
+            ambiguous[identifier] = found
+        else:
+            matches[identifier] = found[0]
+            if found[0] not in users:
+                users.append(found[0])
+    return Resolution(users, matches, unresolved, ambiguous)
+
+
+def display_name(user):
+    return (user.get_full_name() or "").strip() or user.username
+
+
+def ambiguous_names(resolution):
+    """{identifier: [display names]} for reporting ambiguous identifiers."""
+    return {
+        name: [display_name(u) for u in candidates]
+        for name, candidates in resolution.ambiguous.items()
+    }
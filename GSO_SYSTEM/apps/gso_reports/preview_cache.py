@@ -0,0 +1,79 @@
+# apps/gso_reports/preview_cache.py
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import versions
+
+# -------------------------------
+# Config
+# -------------------------------
+PREVIEW_CACHE_SIZE = 200         # most recently used previews kept per worker process
+PREVIEW_CACHE_TIMEOUT = 60 * 10  # backstop: entries expire on their own even if never evicted
+
+VERSION_NAME = "ipmt_preview:{}"
+ENTRY_KEY = "gso_reports:ipmt_preview:{}"
+
+
+# Recency of the entries this process stored or read. Kept in the process so
+# workers never race on a shared list: each one evicts its own least recently
+# used entries, so a shared (file) backend holds at most workers x SIZE previews.
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def _cache():
+    # Any backend works (local-memory, file, ...); settings.IPMT_PREVIEW_CACHE picks the alias
+    return caches[getattr(settings, "IPMT_PREVIEW_CACHE", "default")]
+
+
+# -------------------------------
+# Per-unit Data Version
+# -------------------------------
+def data_version(unit_id):
+    """Current data version of a unit, shared by every worker (see versions.py)."""
+    return versions.current(VERSION_NAME.format(unit_id))
+
+
+def bump_version(*unit_ids):
+    """Invalidate every cached preview of the given units (called on WAR/IPMT/indicator writes)."""
+    versions.bump(*(VERSION_NAME.format(unit_id) for unit_id in {u for u in unit_ids if u}))
+
+
+# -------------------------------
+# Preview Entries (LRU-bounded)
+# -------------------------------
+def _entry_key(unit_id, period, personnel_ids, version):
+    # The same selection in any order is the same preview
+    personnel = ",".join(map(str, sorted(set(personnel_ids))))
+    raw = f"{unit_id}|{period:%Y-%m}|{personnel}|{version}"
+    return ENTRY_KEY.format(hashlib.sha1(raw.encode()).hexdigest())
+
+
+def _touch(key):
+    """Mark `key` most recently used and delete whatever falls beyond PREVIEW_CACHE_SIZE."""
+    with _lru_lock:
+        _lru[key] = None
+        _lru.move_to_end(key)
+        evicted = [_lru.popitem(last=False)[0] for _ in range(len(_lru) - PREVIEW_CACHE_SIZE)]
+    if evicted:
+        _cache().delete_many(evicted)
+
+
+def cached_preview(unit_id, period, personnel_ids, build):
+    """
+    Return the preview rows for (unit, period, personnel) at the unit's current
+    data version, calling build() only on a miss.
+    """
+    cache = _cache()
+    # Read the version before building, so a write made meanwhile makes this entry unreachable
+    key = _entry_key(unit_id, period, personnel_ids, data_version(unit_id))
+    rows = cache.get(key)
+    if rows is None:
+        rows = build()
+        cache.set(key, rows, PREVIEW_CACHE_TIMEOUT)
+    _touch(key)
+    return rows
@@ -0,0 +1,189 @@
+# apps/gso_reports/reclassify.py
+import multiprocessing
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.db import transaction
+
+from apps.gso_requests.models import ServiceRequest, TaskReport
+from .models import WorkAccomplishmentReport
+from .activity_matcher import ranked_activities, MISCELLANEOUS, KEYWORD_BOUNDARY
+from .keyword_matcher import init_classify_worker, classify_rows
+from . import rollup, search
+
+RECLASSIFY_CHUNK = 5000
+UPDATE_BATCH = 900  # stays under SQLite's bound-parameter limit
+
+
+# -------------------------------
+# Chunk Readers (keyset pagination on id)
+# -------------------------------
+def _report_texts(request_ids):
+    """{request_id: all task report text} for one chunk, in one query."""
+    texts = {}
+    rows = TaskReport.objects.filter(request_id__in=request_ids).order_by("id").values_list("request_id", "report_text")
+    for request_id, text in rows:
+        texts[request_id] = f"{texts[request_id]} {text}" if request_id in texts else text
+    return texts
+
+
+def war_chunks(chunk_size):
+    """Yield [(id, activity, texts), ...] and {id: (unit_id, date_started)} per chunk of WARs."""
+    last_id = 0
+    while True:
+        rows = list(
+            WorkAccomplishmentReport.objects.filter(id__gt=last_id).order_by("id").values_list(
+                "id", "activity_name", "description", "request_id", "request__description", "unit_id", "date_started"
+            )[:chunk_size]
+        )
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        reports = _report_texts({r[3] for r in rows if r[3]})
+        # Same order as create_war_from_request: task reports, request description, then the WAR's own text
+        yield (
+            [(pk, activity, (reports.get(req_id, ""), req_desc or "", desc)) for pk, activity, desc, req_id, req_desc, _, _ in rows],
+            {pk: (unit_id, started) for pk, _, _, _, _, unit_id, started in rows},
+        )
+
+
+def request_chunks(chunk_size):
+    """Yield [(id, activity, texts), ...] per chunk of ServiceRequests."""
+    last_id = 0
+    while True:
+        rows = list(
+            ServiceRequest.objects.filter(id__gt=last_id).order_by("id").values_list(
+                "id", "activity_name", "description"
+            )[:chunk_size]
+        )
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        reports = _report_texts([r[0] for r in rows])
+        yield [(pk, activity, (reports.get(pk, ""), desc)) for pk, activity, desc in rows], {}
+
+
+# -------------------------------
+# Reclassification
+# -------------------------------
+def _classified(chunks, pool, in_flight):
+    """Yield (rows, meta, (changed, unmatched)) per chunk, keeping at most `in_flight` chunks queued."""
+    if pool is None:
+        for rows, meta in chunks:
+            yield rows, meta, classify_rows(rows)
+        return
+    pending = deque()
+    for rows, meta in chunks:
+        pending.append((rows, meta, pool.submit(classify_rows, rows)))
+        if len(pending) >= in_flight:
+            rows, meta, future = pending.popleft()
+            yield rows, meta, future.result()
+    while pending:
+        rows, meta, future = pending.popleft()
+        yield rows, meta, future.result()
+
+
+def _model_guesses(unmatched, classifier, labels, min_confidence):
+    """
+    [(id, current, new), ...] from the trained classifier for unmatched rows that
+    have no real activity yet (empty or Miscellaneous), as classify_activity()
+    would label them. Every other unmatched row keeps its activity.
+    """
+    if classifier is None:
+        return []
+    rows = [
+        (pk, current, " ".join(t for t in texts if t))
+        for pk, current, texts in unmatched
+        if not current or current == MISCELLANEOUS
+    ]
+    rows = [row for row in rows if row[2].strip()]
+    guesses = classifier.predict([text for _, _, text in rows]) if rows else []
+    return [
+        (pk, current, label)
+        for (pk, current, _), (label, confidence) in zip(rows, guesses)
+        if label in labels and confidence >= min_confidence and label != current
+    ]
+
+
+def _reclassify_model(model, chunks, pool, workers, dry_run, moves, progress, guess):
+    scanned = changed_total = 0
+    rollup_keys, changed_ids = set(), []
+
+    for rows, meta, (changed, unmatched) in _classified(chunks, pool, workers * 2):
+        changed += guess(unmatched)
+        scanned += len(rows)
+        changed_total += len(changed)
+        for pk, old, new in changed:
+            moves[(model.__name__, old or "(none)", new)] += 1
+        if changed and not dry_run:
+            # Few distinct targets per chunk: one UPDATE ... WHERE id IN (...) per activity
+            # is far cheaper than bulk_update()'s per-row CASE expression
+            by_activity = defaultdict(list)
+            for pk, _, new in changed:
+                by_activity[new].append(pk)
+            with transaction.atomic():
+                for new, ids in by_activity.items():
+                    for start in range(0, len(ids), UPDATE_BATCH):
+                        model.objects.filter(id__in=ids[start:start + UPDATE_BATCH]).update(activity_name=new)
+            changed_ids += [pk for pk, _, _ in changed]
+            rollup_keys |= {(meta[pk][0], rollup.month_period(meta[pk][1])) for pk, _, _ in changed if pk in meta}
+        if progress:
+            progress(model.__name__, scanned, changed_total)
+
+    return scanned, changed_total, rollup_keys, changed_ids
+
+
+def reclassify_activities(workers=1, chunk_size=RECLASSIFY_CHUNK, dry_run=False, progress=None):
+    """
+    Re-run the keyword matcher over every WAR and ServiceRequest and write back
+    the activities that changed, grouped into one UPDATE per target activity.
+    Rows no keyword matches keep their activity, except empty/Miscellaneous
+    ones the trained classifier can label (see activity_classifier.py).
+    Returns {"scanned": {model: n}, "changed": {model: n}, "moves": Counter((model, old, new))}.
+    """
+    # activity_classifier imports this module for its training data
+    from .activity_classifier import activity_classifier, MIN_CONFIDENCE
+
+    entries = [(a.name, a.keyword_list()) for a in ranked_activities()]
+    # No fallback: rows no keyword matches are left to guess()
+    init_args = (entries, None, KEYWORD_BOUNDARY)
+    guess = partial(
+        _model_guesses, classifier=activity_classifier(), labels={name for name, _ in entries},
+        min_confidence=MIN_CONFIDENCE,
+    )
+    moves = Counter()
+    result = {"scanned": {}, "changed": {}, "moves": moves}
+
+    pool = None
+    if workers > 1:
+        # spawn: workers only run the regex, never touch Django or the database
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_classify_worker,
+            initargs=init_args,
+        )
+    else:
+        init_classify_worker(*init_args)
+
+    try:
+        for model, chunks in (
+            (WorkAccomplishmentReport, war_chunks(chunk_size)),
+            (ServiceRequest, request_chunks(chunk_size)),
+        ):
+            scanned, changed, rollup_keys, changed_ids = _reclassify_model(
+                model, chunks, pool, max(workers, 1), dry_run, moves, progress, guess
+            )
+            result["scanned"][model.__name__] = scanned
+            result["changed"][model.__name__] = changed
+
+            # QuerySet.update() skips signals: refresh the IPMT rollup and search documents
+            for unit_id, period in rollup_keys:
+                rollup.refresh_rollup(unit_id, period)
+            search.index_many(model.__name__, changed_ids)
+    finally:
+        if pool:
+            pool.shutdown()
+
+    return result
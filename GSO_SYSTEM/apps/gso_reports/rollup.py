@@ -0,0 +1,249 @@
+# apps/gso_reports/rollup.py
+import calendar
+from collections import defaultdict
+from functools import partial
+from datetime import date
+
+from django.db import connection, transaction
+from django.db.models import Q, Min, Value
+from django.db.models.functions import Coalesce, Lower, TruncMonth
+
+from .models import WorkAccomplishmentReport, IPMTRollup
+from .catalog import indicator_catalog, activity_key
+from .preview_cache import bump_version
+
+
+# -------------------------------
+# Helpers
+# -------------------------------
+def month_period(value):
+    """First day of the month for a date (the rollup `period` key)."""
+    return date(value.year, value.month, 1)
+
+
+def parse_month(month_filter):
+    """'YYYY-MM' or 'September 2025' -> first day of that month (or None)."""
+    if not month_filter:
+        return None
+    month_filter = month_filter.strip()
+    try:
+        year, month_num = map(int, month_filter.split("-"))
+        return date(year, month_num, 1)
+    except ValueError:
+        pass
+    try:
+        month_name, year = month_filter.rsplit(" ", 1)
+        return date(int(year), list(calendar.month_name).index(month_name.capitalize()), 1)
+    except ValueError:
+        return None
+
+
+def _month_range(period):
+    last_day = calendar.monthrange(period.year, period.month)[1]
+    return period, date(period.year, period.month, last_day)
+
+
+def indicator_map(unit_id):
+    """
+    Map activity_key(WAR activity_name) -> list of active SuccessIndicator ids for
+    the unit. An indicator matches on its ActivityName, or on its code when none is linked.
+    """
+    return indicator_catalog(unit_id).activity_map
+
+
+# -------------------------------
+# WAR Index (personnel, activity) -> WARs
+# -------------------------------
+def build_war_index(rows):
+    """
+    Group (personnel_id, war_id, activity_name, description) rows in one pass into
+    {(personnel_id, activity_name): (war_ids, joined_description)}.
+    Activities differing only in case form one group, named by their lowest spelling.
+    """
+    grouped = defaultdict(lambda: ([], []))
+    spellings = {}
+    for personnel_id, war_id, activity, description in rows:
+        key = activity_key(activity)
+        spellings[key] = min(spellings.get(key, activity or ""), activity or "")
+        war_ids, descriptions = grouped[(personnel_id, key)]
+        war_ids.append(war_id)
+        if description:
+            descriptions.append(description)
+    return {
+        (personnel_id, spellings[key]): (war_ids, " ".join(descriptions))
+        for (personnel_id, key), (war_ids, descriptions) in grouped.items()
+    }
+
+
+def grouped_war_index(links):
+    """
+    Same result as build_war_index() for a queryset of WAR-personnel links.
+    PostgreSQL: one GROUP BY (personnel, activity) query using ArrayAgg/StringAgg.
+    Other databases: one flat query grouped in Python.
+    """
+    order = ("workaccomplishmentreport__date_started", "workaccomplishmentreport_id")
+
+    if connection.vendor == "postgresql":
+        from django.contrib.postgres.aggregates import ArrayAgg, StringAgg
+
+        # NULL and "" are one group, as in build_war_index()
+        activity = Coalesce("workaccomplishmentreport__activity_name", Value(""))
+        rows = links.values("user_id", key=Lower(activity)).annotate(
+            activity=Min(activity),
+            war_ids=ArrayAgg("workaccomplishmentreport_id", order_by=order),
+            text=StringAgg(
+                "workaccomplishmentreport__description",
+                delimiter=" ",
+                order_by=order,
+                filter=~Q(workaccomplishmentreport__description=""),
+            ),
+        ).order_by()
+        return {
+            (r["user_id"], r["activity"]): (r["war_ids"], r["text"] or "")
+            for r in rows
+        }
+
+    rows = links.order_by(*order).values_list(
+        "user_id",
+        "workaccomplishmentreport_id",
+        "workaccomplishmentreport__activity_name",
+        "workaccomplishmentreport__description",
+    )
+    return build_war_index(rows)
+
+
+def cells_from_index(war_index, indicators):
+    """
+    Resolve a (personnel, activity) index against indicator_map() output.
+    Returns {(personnel_id, indicator_id, activity): (war_ids, description)};
+    indicator_id is None (and activity kept) for WARs with no matching indicator.
+    Each (personnel, activity) bucket is a single dictionary lookup.
+    """
+    cells = {}
+    for (personnel_id, activity), group in war_index.items():
+        matched = indicators.get(activity_key(activity))
+        if matched:
+            for indicator_id in matched:
+                cells[(personnel_id, indicator_id, "")] = group
+        else:
+            cells[(personnel_id, None, activity)] = group
+    return cells
+
+
+# -------------------------------
+# Recompute
+# -------------------------------
+def refresh_rollup(unit_id, period, personnel_ids=None, indicators=None):
+    """
+    Recompute the rollup cells for one unit and month, for the given personnel
+    (or everybody with WARs in that month when personnel_ids is None).
+    `indicators` is indicator_map(unit_id), read fresh when not given.
+    """
+    through = WorkAccomplishmentReport.assigned_personnel.through
+    start, end = _month_range(period)
+
+    links = through.objects.filter(
+        workaccomplishmentreport__unit_id=unit_id,
+        workaccomplishmentreport__date_started__range=(start, end),
+    )
+    if personnel_ids is not None:
+        personnel_ids = set(personnel_ids)
+        if not personnel_ids:
+            return
+        links = links.filter(user_id__in=personnel_ids)
+
+    if indicators is None:
+        indicators = indicator_map(unit_id)
+    cells = cells_from_index(grouped_war_index(links), indicators)
+
+    new_rows = [
+        IPMTRollup(
+            personnel_id=user_id,
+            unit_id=unit_id,
+            period=period,
+            indicator_id=indicator_id,
+            activity_name=activity,
+            war_ids=list(war_ids),
+            war_count=len(war_ids),
+            description=description,
+        )
+        for (user_id, indicator_id, activity), (war_ids, description) in cells.items()
+    ]
+
+    stale = IPMTRollup.objects.filter(unit_id=unit_id, period=period)
+    if personnel_ids is not None:
+        stale = stale.filter(personnel_id__in=personnel_ids)
+
+    with transaction.atomic():
+        stale.delete()
+        IPMTRollup.objects.bulk_create(new_rows)
+        # Cached previews of this unit are stale once the new cells are visible
+        transaction.on_commit(partial(bump_version, unit_id))
+
+
+def refresh_war(war_id):
+    """Recompute the cells one WAR feeds (for writes that bypass signals, e.g. update())."""
+    refresh_wars([war_id])
+
+
+def refresh_wars(war_ids):
+    """
+    Recompute the cells a batch of WARs feeds, once per (unit, month) touched,
+    for the union of their personnel.
+    """
+    through = WorkAccomplishmentReport.assigned_personnel.through
+    cells = defaultdict(set)
+    for unit_id, date_started, user_id in through.objects.filter(workaccomplishmentreport_id__in=war_ids).values_list(
+        "workaccomplishmentreport__unit_id", "workaccomplishmentreport__date_started", "user_id"
+    ):
+        cells[(unit_id, month_period(date_started))].add(user_id)
+    for (unit_id, period), personnel_ids in cells.items():
+        refresh_rollup(unit_id, period, personnel_ids)
+
+
+def refresh_unit(unit_id):
+    """Recompute every month of a unit (used when its indicators change)."""
+    periods = {
+        month_period(d)
+        for d in WorkAccomplishmentReport.objects.filter(unit_id=unit_id).dates("date_started", "month")
+    }
+    periods |= set(IPMTRollup.objects.filter(unit_id=unit_id).values_list("period", flat=True).distinct())
+    indicators = indicator_map(unit_id)
+    for period in periods:
+        refresh_rollup(unit_id, period, indicators=indicators)
+
+
+def rebuild_all():
+    """Recompute the whole rollup table. Returns the number of unit-months processed."""
+    cells = set(
+        WorkAccomplishmentReport.objects.annotate(period=TruncMonth("date_started"))
+        .values_list("unit_id", "period")
+        .distinct()
+    )
+    IPMTRollup.objects.all().delete()
+    indicators = {}
+    for unit_id, period in sorted(cells):
+        if unit_id not in indicators:
+            indicators[unit_id] = indicator_map(unit_id)
+        refresh_rollup(unit_id, month_period(period), indicators=indicators[unit_id])
+    return len(cells)
+
+
+# -------------------------------
+# Readers
+# -------------------------------
+def rollup_cells(unit_id, period, personnel_ids):
+    """
+    Return {(personnel_id, indicator_id): IPMTRollup} for matched cells and
+    {personnel_id: [IPMTRollup, ...]} for WARs with no matching indicator.
+    """
+    matched, unmatched = {}, defaultdict(list)
+    rows = IPMTRollup.objects.filter(
+        unit_id=unit_id, period=period, personnel_id__in=personnel_ids
+    ).select_related("indicator").order_by("activity_name", "id")
+    for row in rows:
+        if row.indicator_id:
+            matched[(row.personnel_id, row.indicator_id)] = row
+        else:
+            unmatched[row.personnel_id].append(row)
+    return matched, unmatched
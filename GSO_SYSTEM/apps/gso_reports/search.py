@@ -0,0 +1,286 @@
+# apps/gso_reports/search.py
+import re
+
+from django.db import connection
+from django.db.models import Q, FloatField
+from django.db.models.expressions import RawSQL
+
+from apps.gso_requests.models import ServiceRequest, TaskReport
+from .models import WorkAccomplishmentReport, SearchDocument
+
+WAR = "WorkAccomplishmentReport"
+REQUEST = "ServiceRequest"
+FTS_TABLE = "gso_reports_searchdocument_fts"
+
+
+# -------------------------------
+# Document Builders
+# -------------------------------
+def _person_name(user):
+    if not user:
+        return ""
+    return user.get_full_name() or user.username
+
+
+def _personnel_by_object(model, ids):
+    """Map object id -> [full name, username, ...] of its assigned personnel in one query."""
+    through = model.assigned_personnel.through
+    source_field = model.assigned_personnel.field.m2m_field_name()
+    names = {}
+    rows = through.objects.filter(**{f"{source_field}_id__in": ids}).values_list(
+        f"{source_field}_id", "user__first_name", "user__last_name", "user__username"
+    )
+    for obj_id, first, last, username in rows:
+        names.setdefault(obj_id, []).extend([f"{first} {last}", username])
+    return names
+
+
+def _request_parts(req, reports=None, personnel=None):
+    if reports is None:
+        reports = TaskReport.objects.filter(request_id=req.id).values_list("report_text", flat=True)
+    if personnel is None:
+        personnel = _personnel_by_object(ServiceRequest, [req.id]).get(req.id, [])
+    return [
+        req.description,
+        req.activity_name,
+        req.unit.name if req.unit_id else "",
+        _person_name(req.requestor),
+        req.requestor.username if req.requestor_id else "",
+        req.custom_full_name,
+        req.department.name if req.department_id else "",
+        *personnel,
+        *reports,
+    ]
+
+
+def _war_parts(war, reports=None, personnel=None):
+    """`reports` and `personnel` are per-batch lookups (see index_many()); None queries them."""
+    if personnel is None:
+        personnel = {
+            WAR: _personnel_by_object(WorkAccomplishmentReport, [war.id]),
+            REQUEST: _personnel_by_object(ServiceRequest, [war.request_id] if war.request_id else []),
+        }
+    parts = [
+        war.description, war.activity_name, war.unit.name if war.unit_id else "",
+        *personnel[WAR].get(war.id, []),
+    ]
+    if war.request_id:
+        parts += _request_parts(
+            war.request,
+            None if reports is None else reports.get(war.request_id, []),
+            personnel[REQUEST].get(war.request_id, []),
+        )
+    return parts
+
+
+def _join(parts):
+    return " ".join(p.strip() for p in parts if p and p.strip())
+
+
+# -------------------------------
+# Index Maintenance
+# -------------------------------
+def index_war(war_id):
+    war = WorkAccomplishmentReport.objects.select_related(
+        "unit", "request__unit", "request__requestor", "request__department"
+    ).filter(id=war_id).first()
+    if not war:
+        return remove_document(WAR, war_id)
+    SearchDocument.objects.update_or_create(
+        doc_type=WAR, object_id=war.id, defaults={"body": _join(_war_parts(war))}
+    )
+
+
+def index_request(request_id):
+    req = ServiceRequest.objects.select_related(
+        "unit", "requestor", "department"
+    ).filter(id=request_id).first()
+    if not req:
+        return remove_document(REQUEST, request_id)
+    SearchDocument.objects.update_or_create(
+        doc_type=REQUEST, object_id=req.id, defaults={"body": _join(_request_parts(req))}
+    )
+    # The WAR document embeds its request's text, so refresh it too
+    war_id = WorkAccomplishmentReport.objects.filter(request_id=req.id).values_list("id", flat=True).first()
+    if war_id:
+        index_war(war_id)
+
+
+def index_object(doc_type, object_id):
+    if doc_type == WAR:
+        index_war(object_id)
+    else:
+        index_request(object_id)
+
+
+def _reports_by_request(request_ids):
+    reports = {}
+    rows = TaskReport.objects.filter(request_id__in=request_ids).order_by("id").values_list("request_id", "report_text")
+    for request_id, text in rows:
+        reports.setdefault(request_id, []).append(text)
+    return reports
+
+
+def index_many(doc_type, object_ids, chunk_size=500):
+    """
+    Bulk index_object() for writes that bypass signals (bulk_update, update()).
+    A few queries and one upsert per chunk instead of several queries per object.
+    """
+    object_ids = list(object_ids)
+    for start in range(0, len(object_ids), chunk_size):
+        chunk = object_ids[start:start + chunk_size]
+        if doc_type == WAR:
+            objs = list(WorkAccomplishmentReport.objects.select_related(
+                "unit", "request__unit", "request__requestor", "request__department"
+            ).filter(id__in=chunk))
+            request_ids = {w.request_id for w in objs if w.request_id}
+            reports = _reports_by_request(request_ids)
+            personnel = {
+                WAR: _personnel_by_object(WorkAccomplishmentReport, [w.id for w in objs]),
+                REQUEST: _personnel_by_object(ServiceRequest, request_ids),
+            }
+            bodies = {w.id: _join(_war_parts(w, reports, personnel)) for w in objs}
+        else:
+            objs = list(ServiceRequest.objects.select_related("unit", "requestor", "department").filter(id__in=chunk))
+            reports = _reports_by_request([r.id for r in objs])
+            personnel = _personnel_by_object(ServiceRequest, [r.id for r in objs])
+            bodies = {r.id: _join(_request_parts(r, reports.get(r.id, []), personnel.get(r.id, []))) for r in objs}
+
+        SearchDocument.objects.bulk_create(
+            [SearchDocument(doc_type=doc_type, object_id=pk, body=body) for pk, body in bodies.items()],
+            update_conflicts=True,
+            unique_fields=["doc_type", "object_id"],
+            update_fields=["body", "updated_at"],
+        )
+        SearchDocument.objects.filter(doc_type=doc_type, object_id__in=set(chunk) - set(bodies)).delete()
+
+        if doc_type == REQUEST:
+            # WAR documents embed their request's text
+            war_ids = WorkAccomplishmentReport.objects.filter(request_id__in=chunk).values_list("id", flat=True)
+            index_many(WAR, war_ids, chunk_size)
+
+
+def index_related(user_ids=(), unit_ids=(), department_ids=()):
+    """
+    Re-index every WAR and ServiceRequest whose document embeds one of these
+    users (requestor or assigned personnel), units or departments by name.
+    """
+    request_q, war_q = Q(pk__in=[]), Q(pk__in=[])
+    if user_ids:
+        request_q |= Q(requestor_id__in=user_ids) | Q(assigned_personnel__in=user_ids)
+        war_q |= Q(assigned_personnel__in=user_ids)
+    if unit_ids:
+        request_q |= Q(unit_id__in=unit_ids)
+        war_q |= Q(unit_id__in=unit_ids)
+    if department_ids:
+        request_q |= Q(department_id__in=department_ids)
+
+    # index_many(REQUEST, ...) also refreshes the WARs built from those requests
+    index_many(REQUEST, ServiceRequest.objects.filter(request_q).values_list("id", flat=True).distinct())
+    index_many(WAR, WorkAccomplishmentReport.objects.filter(war_q).values_list("id", flat=True).distinct())
+
+
+def remove_document(doc_type, object_id):
+    SearchDocument.objects.filter(doc_type=doc_type, object_id=object_id).delete()
+
+
+def rebuild_index(chunk_size=500):
+    """Re-index every WAR and ServiceRequest. Returns the number of documents written."""
+    total = 0
+    for doc_type, model in ((REQUEST, ServiceRequest), (WAR, WorkAccomplishmentReport)):
+        SearchDocument.objects.filter(doc_type=doc_type).exclude(
+            object_id__in=model.objects.values("id")
+        ).delete()
+        chunk = []
+        for obj_id in model.objects.values_list("id", flat=True).iterator(chunk_size=chunk_size):
+            chunk.append(obj_id)
+            if len(chunk) == chunk_size:
+                index_many(doc_type, chunk, chunk_size)
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            index_many(doc_type, chunk, chunk_size)
+            total += len(chunk)
+    return total
+
+
+# -------------------------------
+# Query Helpers
+# -------------------------------
+def _terms(query):
+    return re.findall(r"\w+", (query or "").lower())
+
+
+def _postgres_tsquery(terms):
+    # Prefix-match every term: "wir room" -> "wir:* & room:*"
+    return " & ".join(f"{t}:*" for t in terms)
+
+
+def _sqlite_match(terms):
+    return " ".join('"{}"*'.format(t.replace('"', '""')) for t in terms)
+
+
+def _matching_documents(query, doc_type=None):
+    """
+    Return a SearchDocument queryset matching `query` with a `rank` annotation
+    (higher is better), using the engine's full-text index.
+    """
+    terms = _terms(query)
+    docs = SearchDocument.objects.all()
+    if doc_type:
+        docs = docs.filter(doc_type=doc_type)
+    if not terms:
+        return docs.none()
+
+    vendor = connection.vendor
+    if vendor == "postgresql":
+        tsquery = _postgres_tsquery(terms)
+        return docs.annotate(
+            rank=RawSQL(
+                "ts_rank(gso_reports_searchdocument.search_vector, to_tsquery('english', %s))",
+                [tsquery],
+                output_field=FloatField(),
+            )
+        ).filter(
+            id__in=RawSQL(
+                "SELECT id FROM gso_reports_searchdocument WHERE search_vector @@ to_tsquery('english', %s)",
+                [tsquery],
+            )
+        )
+    if vendor == "sqlite":
+        match = _sqlite_match(terms)
+        # bm25() is lower-is-better, so negate it to keep "higher is better"
+        return docs.annotate(
+            rank=RawSQL(
+                f"SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE}.rowid = gso_reports_searchdocument.id AND {FTS_TABLE} MATCH %s",
+                [match],
+                output_field=FloatField(),
+            )
+        ).filter(
+            id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        )
+
+    # Other engines: unindexed fallback so search still works
+    condition = Q()
+    for term in terms:
+        condition &= Q(body__icontains=term)
+    return docs.filter(condition).annotate(rank=RawSQL("1", [], output_field=FloatField()))
+
+
+def matching_ids(query, doc_type):
+    """Subquery of object ids of `doc_type` matching `query` (for `id__in=` filters)."""
+    return _matching_documents(query, doc_type).values("object_id")
+
+
+def search_reports(query, doc_type=None, page=1, page_size=20):
+    """
+    Ranked, paginated search over WARs and ServiceRequests.
+    Returns (hits, has_next) where each hit is {"type", "id", "rank"}.
+    """
+    page = max(1, int(page or 1))
+    offset = (page - 1) * page_size
+    docs = _matching_documents(query, doc_type).order_by("-rank", "-object_id")
+    rows = list(docs.values_list("doc_type", "object_id", "rank")[offset:offset + page_size + 1])
+    hits = [{"type": t, "id": pk, "rank": rank} for t, pk, rank in rows[:page_size]]
+    return hits, len(rows) > page_size
@@ -0,0 +1,241 @@
+# apps/gso_reports/signals.py
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from apps.gso_accounts.models import User, Unit, Department
+from apps.gso_requests.models import ServiceRequest, TaskReport
+from .models import WorkAccomplishmentReport, SuccessIndicator, ActivityName, IPMT
+from . import search, rollup, personnel, preview_cache, activity_matcher, catalog
+
+
+# -------------------------------
+# Search Index Maintenance
+# -------------------------------
+@receiver(post_save, sender=WorkAccomplishmentReport)
+def index_war_on_save(sender, instance, **kwargs):
+    search.index_war(instance.id)
+
+
+@receiver(post_delete, sender=WorkAccomplishmentReport)
+def remove_war_on_delete(sender, instance, **kwargs):
+    search.remove_document(search.WAR, instance.id)
+
+
+@receiver(post_save, sender=ServiceRequest)
+def index_request_on_save(sender, instance, **kwargs):
+    search.index_request(instance.id)
+
+
+@receiver(post_delete, sender=ServiceRequest)
+def remove_request_on_delete(sender, instance, **kwargs):
+    search.remove_document(search.REQUEST, instance.id)
+
+
+@receiver([post_save, post_delete], sender=TaskReport)
+def index_task_report_request(sender, instance, **kwargs):
+    search.index_request(instance.request_id)
+
+
+_PERSONNEL_LINKS = {
+    WorkAccomplishmentReport.assigned_personnel.through: (search.WAR, WorkAccomplishmentReport),
+    ServiceRequest.assigned_personnel.through: (search.REQUEST, ServiceRequest),
+}
+
+
+@receiver(m2m_changed, sender=WorkAccomplishmentReport.assigned_personnel.through)
+@receiver(m2m_changed, sender=ServiceRequest.assigned_personnel.through)
+def index_on_personnel_change(sender, instance, action, reverse, pk_set, **kwargs):
+    doc_type, model = _PERSONNEL_LINKS[sender]
+    if action == "pre_clear":
+        # post_clear has no pk_set, so remember which objects lose this user
+        if reverse:
+            column = model.assigned_personnel.field.m2m_column_name()
+            instance._search_cleared = set(sender.objects.filter(user_id=instance.pk).values_list(column, flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        # instance is the WAR / request
+        search.index_object(doc_type, instance.id)
+    elif action == "post_clear":
+        search.index_many(doc_type, getattr(instance, "_search_cleared", ()))
+    else:
+        # instance is a User, pk_set holds object ids
+        search.index_many(doc_type, pk_set or ())
+
+
+_NAME_FIELDS = {User: ("first_name", "last_name", "username"), Unit: ("name",), Department: ("name",)}
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Unit)
+@receiver(pre_save, sender=Department)
+def remember_indexed_names(sender, instance, **kwargs):
+    fields = _NAME_FIELDS[sender]
+    instance._search_names = None
+    if instance.pk:
+        instance._search_names = sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Unit)
+@receiver(post_save, sender=Department)
+def reindex_on_rename(sender, instance, created, **kwargs):
+    # Documents embed these names; only a rename makes them stale
+    previous = getattr(instance, "_search_names", None)
+    if created or previous is None:
+        return
+    if previous == tuple(getattr(instance, f) for f in _NAME_FIELDS[sender]):
+        return
+    key = {User: "user_ids", Unit: "unit_ids", Department: "department_ids"}[sender]
+    search.index_related(**{key: [instance.pk]})
+
+
+# -------------------------------
+# IPMT Rollup Maintenance
+# -------------------------------
+def _war_personnel_ids(war_id):
+    through = WorkAccomplishmentReport.assigned_personnel.through
+    return set(through.objects.filter(workaccomplishmentreport_id=war_id).values_list("user_id", flat=True))
+
+
+@receiver(pre_save, sender=WorkAccomplishmentReport)
+def remember_war_rollup_key(sender, instance, **kwargs):
+    instance._rollup_previous = None
+    if instance.pk:
+        instance._rollup_previous = (
+            WorkAccomplishmentReport.objects.filter(pk=instance.pk).values_list("unit_id", "date_started").first()
+        )
+
+
+@receiver(post_save, sender=WorkAccomplishmentReport)
+def refresh_rollup_on_war_save(sender, instance, **kwargs):
+    personnel_ids = _war_personnel_ids(instance.id)
+    if not personnel_ids:
+        return
+    current = (instance.unit_id, rollup.month_period(instance.date_started))
+    rollup.refresh_rollup(*current, personnel_ids)
+
+    previous = getattr(instance, "_rollup_previous", None)
+    if previous:
+        previous = (previous[0], rollup.month_period(previous[1]))
+        if previous != current:
+            rollup.refresh_rollup(*previous, personnel_ids)
+
+
+@receiver(pre_delete, sender=WorkAccomplishmentReport)
+def remember_war_personnel(sender, instance, **kwargs):
+    instance._rollup_personnel = _war_personnel_ids(instance.id)
+
+
+@receiver(post_delete, sender=WorkAccomplishmentReport)
+def refresh_rollup_on_war_delete(sender, instance, **kwargs):
+    personnel_ids = getattr(instance, "_rollup_personnel", None)
+    if personnel_ids:
+        rollup.refresh_rollup(instance.unit_id, rollup.month_period(instance.date_started), personnel_ids)
+
+
+@receiver(m2m_changed, sender=WorkAccomplishmentReport.assigned_personnel.through)
+def refresh_rollup_on_personnel_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        # Remember who is about to be removed; post_clear has no pk_set
+        if reverse:
+            instance._rollup_cleared = set(instance.war_personnel.values_list("id", flat=True))
+        else:
+            instance._rollup_cleared = _war_personnel_ids(instance.id)
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    changed = pk_set if action != "post_clear" else getattr(instance, "_rollup_cleared", set())
+    if not changed:
+        return
+
+    if not reverse:
+        # instance is a WAR, changed holds user ids
+        rollup.refresh_rollup(instance.unit_id, rollup.month_period(instance.date_started), changed)
+        return
+
+    # instance is a User, changed holds WAR ids
+    keys = {
+        (unit_id, rollup.month_period(date_started))
+        for unit_id, date_started in WorkAccomplishmentReport.objects.filter(id__in=changed).values_list(
+            "unit_id", "date_started"
+        )
+    }
+    for unit_id, period in keys:
+        rollup.refresh_rollup(unit_id, period, {instance.pk})
+
+
+@receiver(pre_save, sender=SuccessIndicator)
+def remember_indicator_unit(sender, instance, **kwargs):
+    instance._rollup_previous_unit = None
+    if instance.pk:
+        instance._rollup_previous_unit = (
+            SuccessIndicator.objects.filter(pk=instance.pk).values_list("unit_id", flat=True).first()
+        )
+
+
+@receiver([post_save, post_delete], sender=SuccessIndicator)
+def refresh_rollup_on_indicator_change(sender, instance, **kwargs):
+    # An indicator moved to another unit also leaves stale cells in its old unit
+    unit_ids = {instance.unit_id, getattr(instance, "_rollup_previous_unit", None)} - {None}
+    catalog.invalidate_catalog(*unit_ids)
+    preview_cache.bump_version(*unit_ids)
+    for unit_id in unit_ids:
+        rollup.refresh_unit(unit_id)
+
+
+@receiver(post_save, sender=ActivityName)
+def refresh_rollup_on_activity_change(sender, instance, **kwargs):
+    unit_ids = list(
+        SuccessIndicator.objects.filter(activity_name=instance).values_list("unit_id", flat=True).distinct()
+    )
+    catalog.invalidate_catalog(*unit_ids)
+    preview_cache.bump_version(*unit_ids)
+    for unit_id in unit_ids:
+        rollup.refresh_unit(unit_id)
+
+
+@receiver([post_save, post_delete], sender=ActivityName)
+def rebuild_activity_matcher(sender, instance, **kwargs):
+    activity_matcher.invalidate_matcher()
+
+
+@receiver(pre_delete, sender=ActivityName)
+def remember_activity_units(sender, instance, **kwargs):
+    # Deleting an ActivityName unlinks its indicators with a queryset update (no signals)
+    instance._rollup_unit_ids = list(
+        SuccessIndicator.objects.filter(activity_name=instance).values_list("unit_id", flat=True).distinct()
+    )
+
+
+@receiver(post_delete, sender=ActivityName)
+def refresh_rollup_on_activity_delete(sender, instance, **kwargs):
+    # The unlinked indicators now match on their code instead
+    unit_ids = getattr(instance, "_rollup_unit_ids", [])
+    catalog.invalidate_catalog(*unit_ids)
+    preview_cache.bump_version(*unit_ids)
+    for unit_id in unit_ids:
+        rollup.refresh_unit(unit_id)
+
+
+# -------------------------------
+# IPMT Preview Cache
+# -------------------------------
+# WAR writes bump the version through rollup.refresh_rollup(); bulk_save_ipmt() bumps its own
+@receiver([post_save, post_delete], sender=IPMT)
+def bump_preview_version_on_ipmt_change(sender, instance, **kwargs):
+    preview_cache.bump_version(instance.unit_id)
+
+
+# -------------------------------
+# Personnel Name Index
+# -------------------------------
+@receiver([post_save, post_delete], sender=User)
+def invalidate_personnel_names(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which is not part of the index
+    if update_fields and set(update_fields) == {"last_login"}:
+        return
+    personnel.invalidate_name_index()
@@ -1,3 +1,921 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+import zipfile
+from importlib import import_module
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+
+from django.apps import apps as django_apps
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.gso_accounts.models import Unit, User, Department
+from apps.gso_requests.models import ServiceRequest
+from .models import (
+    WorkAccomplishmentReport, ActivityName, SuccessIndicator, IPMT, IPMTRollup, SearchDocument, ReportJob,
+)
+from .rollup import build_war_index, cells_from_index, grouped_war_index, refresh_unit
+from .search import WAR, REQUEST, matching_ids
+from . import search, activity_classifier, activity_matcher as matcher_module, catalog, jobs, personnel, preview_cache, utils, versions, views
+from .activity_matcher import activity_matcher
+from .keyword_matcher import KeywordMatcher
+from .reclassify import reclassify_activities
+from .text_classifier import TfidfCentroidClassifier
+from .utils import (
+    decode_report_cursor, encode_report_cursor, paginate_accomplishment_report, generate_ipmt_excel,
+    map_activity_name, collect_ipmt_reports, normalize_report, normalize_reports, ReportRow, EXPORT_HEADERS,
+    ipmt_export_tasks, iter_ipmt_zip,
+)
+
+
+class FreshProcessCachesMixin:
+    """
+    Rolled-back test data never reaches the signals, so start every test
+    without the matcher, name index and catalogs an earlier test built.
+    """
+
+    def setUp(self):
+        super().setUp()
+        for patcher in (
+            mock.patch.object(matcher_module._matcher, "_value", None),
+            mock.patch.dict(catalog._catalogs, clear=True),
+            mock.patch.object(personnel._name_index, "_value", None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+# -------------------------------
+# Accomplishment Report Keyset Cursor
+# -------------------------------
+class ReportCursorTests(FreshProcessCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.unit = Unit.objects.create(name="Electrical")
+        requestor = User.objects.create_user("requestor", password="x", role="requestor")
+        # Several rows share a date so paging has to break ties on (type, id)
+        for day in (1, 1, 1, 2, 2, 3):
+            WorkAccomplishmentReport.objects.create(
+                unit=cls.unit, date_started=date(2025, 9, day), description=f"war {day}",
+            )
+        for _ in range(3):
+            ServiceRequest.objects.create(
+                requestor=requestor, unit=cls.unit, description="request", status="Completed",
+            )
+        ServiceRequest.objects.create(
+            requestor=requestor, unit=cls.unit, description="still open", status="Pending",
+        )
+
+    def _all_pages(self, page_size):
+        seen, token = [], None
+        while True:
+            reports, token = paginate_accomplishment_report(cursor_token=token, page_size=page_size)
+            seen += [(r.type, r.id) for r in reports]
+            if token is None:
+                return seen
+
+    def test_cursor_round_trip(self):
+        reports, token = paginate_accomplishment_report(page_size=2)
+        sort_date, row_type, row_id = decode_report_cursor(token)
+        self.assertEqual((row_type, row_id), (reports[-1].type, reports[-1].id))
+        self.assertEqual(sort_date, reports[-1].date)
+        row = {"sort_date": sort_date, "type": row_type, "row_id": row_id}
+        self.assertEqual(encode_report_cursor(row), token)
+
+    def test_invalid_cursor_is_ignored(self):
+        for token in (None, "", "not-base64!", "YXxi"):  # "YXxi" decodes to "a|b"
+            self.assertIsNone(decode_report_cursor(token))
+
+    def test_pages_cover_every_row_once(self):
+        single_page = self._all_pages(page_size=100)
+        self.assertEqual(len(single_page), 9)  # 6 WARs + 3 completed requests
+        for page_size in (1, 2, 4):
+            self.assertEqual(self._all_pages(page_size), single_page)
+
+    def test_last_page_has_no_cursor(self):
+        reports, token = paginate_accomplishment_report(page_size=9)
+        self.assertEqual(len(reports), 9)
+        self.assertIsNone(token)
+
+
+# -------------------------------
+# Accomplishment Report Export (CSV / XLSX)
+# -------------------------------
+class AccomplishmentExportTests(FreshProcessCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.gso = User.objects.create_user("gso", password="x", role="gso")
+        electrical = Unit.objects.create(name="Electrical")
+        worker = User.objects.create_user(
+            "worker", password="x", role="personnel", first_name="Ana", last_name="Cruz", unit=electrical,
+        )
+        war = WorkAccomplishmentReport.objects.create(
+            unit=electrical, date_started=date(2025, 9, 2), activity_name="Wiring", description="Rewired hall",
+        )
+        war.assigned_personnel.add(worker)
+        WorkAccomplishmentReport.objects.create(
+            unit=electrical, date_started=date(2025, 9, 1), activity_name="Lighting", description="Replaced bulbs",
+        )
+        WorkAccomplishmentReport.objects.create(
+            unit=Unit.objects.create(name="Grounds"), date_started=date(2025, 9, 3), activity_name="Mowing",
+        )
+
+    def _export(self, **params):
+        self.client.force_login(self.gso)
+        return self.client.get(reverse("gso_reports:export_accomplishment_report"), params)
+
+    def test_csv_is_streamed(self):
+        response = self._export(format="csv", unit="Electrical")
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn(".csv", response["Content-Disposition"])
+
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], EXPORT_HEADERS)
+        self.assertEqual(rows[1], [
+            "2025-09-02", "WAR", "Electrical", "Wiring", "Rewired hall", "", "Ana Cruz", "Completed", "Migrated",
+        ])
+        self.assertEqual([row[3] for row in rows[1:]], ["Wiring", "Lighting"])
+        self.assertEqual(rows[2][6], "Unassigned")
+
+    def test_xlsx_matches_csv(self):
+        response = self._export(format="xlsx")
+        self.assertIn(".xlsx", response["Content-Disposition"])
+        sheet = openpyxl.load_workbook(io.BytesIO(b"".join(response.streaming_content))).active
+        rows = [list(row) for row in sheet.iter_rows(values_only=True)]
+
+        self.assertEqual(rows[0], EXPORT_HEADERS)
+        self.assertEqual([row[3] for row in rows[1:]], ["Mowing", "Wiring", "Lighting"])
+        self.assertEqual(rows[2][6], "Ana Cruz")
+
+    def test_unknown_format_is_rejected(self):
+        self.assertEqual(self._export(format="pdf").status_code, 400)
+
+
+# -------------------------------
+# Normalize Reports
+# -------------------------------
+class NormalizeReportsTests(FreshProcessCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.unit = Unit.objects.create(name="Masonry")
+        cls.department = Department.objects.create(name="Library")
+        requestor = User.objects.create_user("req", password="x", role="requestor")
+        cls.workers = [
+            User.objects.create_user("ana", password="x", role="personnel", first_name="Ana", last_name="Reyes"),
+            User.objects.create_user("bong", password="x", role="personnel"),
+        ]
+        cls.request = ServiceRequest.objects.create(
+            requestor=requestor, unit=cls.unit, department=cls.department,
+            description="Patch wall", status="Completed",
+        )
+        cls.request.assigned_personnel.add(*cls.workers)
+        cls.live_war = WorkAccomplishmentReport.objects.create(
+            request=cls.request, unit=cls.unit, date_started=date(2025, 9, 1),
+            activity_name="Plastering", description="Patched wall",
+        )
+        cls.live_war.assigned_personnel.add(cls.workers[0])
+        for day in range(2, 6):
+            WorkAccomplishmentReport.objects.create(unit=cls.unit, date_started=date(2025, 9, day))
+
+    def test_rows_hold_plain_values(self):
+        report = normalize_report(self.live_war)
+        self.assertIsInstance(report, ReportRow)
+        self.assertEqual(
+            (report.id, report.type, report.source, report.requesting_office, report.unit, report.activity),
+            (self.live_war.id, "WorkAccomplishmentReport", "Live", "Library", "Masonry", "Plastering"),
+        )
+        self.assertEqual(report.personnel, ["Ana Reyes"])
+        self.assertEqual(report.date.date(), date(2025, 9, 1))
+
+        migrated = normalize_reports(WorkAccomplishmentReport.objects.filter(request__isnull=True))[0]
+        self.assertEqual((migrated.source, migrated.requesting_office, migrated.personnel), ("Migrated", "", ["Unassigned"]))
+
+    def test_service_request_rows(self):
+        report = normalize_report(self.request)
+        self.assertEqual((report.type, report.description, report.status), ("ServiceRequest", "Patch wall", "Completed"))
+        # Users without a full name fall back to their username
+        self.assertEqual(sorted(report.personnel), ["Ana Reyes", "bong"])
+
+    def test_query_count_is_constant(self):
+        with self.assertNumQueries(2):
+            reports = normalize_reports(WorkAccomplishmentReport.objects.all())
+        self.assertEqual(len(reports), 5)
+        with self.assertNumQueries(2):
+            normalize_reports(WorkAccomplishmentReport.objects.filter(pk=self.live_war.pk))
+
+    def test_missing_object_returns_none(self):
+        self.assertIsNone(normalize_report(WorkAccomplishmentReport(pk=10**6, unit=self.unit)))
+
+
+# -------------------------------
+# Search Index
+# -------------------------------
+class SearchIndexTests(FreshProcessCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.unit = Unit.objects.create(name="Plumbing")
+        cls.department = Department.objects.create(name="Registrar")
+        cls.requestor = User.objects.create_user("req", password="x", role="requestor")
+        cls.worker = User.objects.create_user(
+            "jdoe", password="x", role="personnel", first_name="Juan", last_name="Delacruz",
+        )
+        cls.request = ServiceRequest.objects.create(
+            requestor=cls.requestor, unit=cls.unit, department=cls.department,
+            description="Leaking faucet", status="Completed",
+        )
+        cls.war = WorkAccomplishmentReport.objects.create(
+            request=cls.request, unit=cls.unit, date_started=date(2025, 9, 1), description="Replaced washer",
+        )
+
+    def _hits(self, query, doc_type):
+        return set(matching_ids(query, doc_type).values_list("object_id", flat=True))
+
+    def test_assigned_personnel_are_searchable(self):
+        self.assertEqual(self._hits("delacruz", WAR), set())
+        self.war.assigned_personnel.add(self.worker)
+        self.request.assigned_personnel.add(self.worker)
+        self.assertEqual(self._hits("delacruz", WAR), {self.war.id})
+        self.assertEqual(self._hits("jdoe", REQUEST), {self.request.id})
+
+        self.worker.war_personnel.clear()
+        self.worker.assigned_requests.remove(self.request)
+        self.assertEqual(self._hits("delacruz", REQUEST), set())
+        # The WAR still embeds its request's text, but no longer its own personnel
+        self.assertEqual(self._hits("delacruz", WAR), set())
+
+    def test_renames_reindex_documents(self):
+        self.war.assigned_personnel.add(self.worker)
+        self.worker.last_name = "Santos"
+        self.worker.save()
+        self.assertEqual(self._hits("santos", WAR), {self.war.id})
+        self.assertEqual(self._hits("delacruz", WAR), set())
+
+        self.unit.name = "Waterworks"
+        self.unit.save()
+        self.assertEqual(self._hits("waterworks", WAR), {self.war.id})
+        self.assertEqual(self._hits("waterworks", REQUEST), {self.request.id})
+
+        self.department.name = "Accounting"
+        self.department.save()
+        self.assertEqual(self._hits("accounting", WAR), {self.war.id})
+
+    def test_rebuild_index_in_chunks(self):
+        other = WorkAccomplishmentReport.objects.create(
+            unit=self.unit, date_started=date(2025, 9, 2), description="Unclogged drain",
+        )
+        SearchDocument.objects.all().delete()
+        SearchDocument.objects.create(doc_type=WAR, object_id=999999, body="orphan")
+        with mock.patch("apps.gso_reports.search.index_many", wraps=search.index_many) as index_many:
+            self.assertEqual(search.rebuild_index(chunk_size=1), 3)
+        for doc_type, pk in ((REQUEST, self.request.id), (WAR, self.war.id), (WAR, other.id)):
+            index_many.assert_any_call(doc_type, [pk], 1)
+        self.assertEqual(self._hits("drain", WAR), {other.id})
+        self.assertEqual(self._hits("faucet", REQUEST), {self.request.id})
+        self.assertFalse(SearchDocument.objects.filter(object_id=999999).exists())
+
+    def test_migration_backfills_existing_rows(self):
+        backfill = import_module("apps.gso_reports.migrations.0008_backfill_search_index").backfill
+        SearchDocument.objects.all().delete()
+        backfill(django_apps, None)
+        self.assertEqual(self._hits("washer", WAR), {self.war.id})
+
+
+# -------------------------------
+# IPMT Rollup
+# -------------------------------
+class RollupTests(FreshProcessCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.unit = Unit.objects.create(name="Paint Shop")
+        cls.other_unit = Unit.objects.create(name="Grounds")
+        cls.worker = User.objects.create_user("painter", password="x", role="personnel", unit=cls.unit)
+        cls.activity = ActivityName.objects.create(name="Wall Painting")
+
+    def _war(self, activity, day=1):
+        war = WorkAccomplishmentReport.objects.create(
+            unit=self.unit, date_started=date(2025, 9, day), activity_name=activity,
+            description=activity or "",
+        )
+        war.assigned_personnel.add(self.worker)
+        return war
+
+    def _cells(self):
+        return {
+            (row.indicator_id, row.activity_name): sorted(row.war_ids)
+            for row in IPMTRollup.objects.filter(unit=self.unit, personnel=self.worker)
+        }
+
+    def test_migration_backfills_existing_wars(self):
+        war = self._war("Wall Painting")
+        IPMTRollup.objects.all().delete()
+        backfill = import_module("apps.gso_reports.migrations.0009_backfill_ipmt_rollup").backfill
+        backfill(django_apps, None)
+        self.assertEqual(self._cells(), {(None, "Wall Painting"): [war.id]})
+
+    def test_build_war_index_ignores_case(self):
+        index = build_war_index([
+            (1, 10, "wall painting", "a"), (1, 11, "Wall Painting", "b"), (1, 12, None, ""), (1, 13, "", "c"),
+        ])
+        self.assertEqual(index, {(1, "Wall Painting"): ([10, 11], "a b"), (1, ""): ([12, 13], "c")})
+        cells = cells_from_index(index, {"wall painting": [7]})
+        self.assertEqual(set(cells), {(1, 7, ""), (1, None, "")})
+
+    def test_grouped_index_merges_missing_activities(self):
+        blank, null = self._war(""), self._war(None, day=2)
+        links = WorkAccomplishmentReport.assigned_personnel.through.objects.filter(user=self.worker)
+        self.assertEqual(grouped_war_index(links), {(self.worker.id, ""): ([blank.id, null.id], "")})
+
+    def test_activity_matches_indicator_case_insensitively(self):
+        indicator = SuccessIndicator.objects.create(
+            unit=self.unit, code="CF1", description="Walls painted", activity_name=self.activity,
+        )
+        first, second = self._war("wall painting"), self._war("WALL PAINTING", day=2)
+        self.assertEqual(self._cells(), {(indicator.id, ""): sorted([first.id, second.id])})
+
+    def test_refresh_sees_invalidated_catalog(self):
+        indicator = SuccessIndicator.objects.create(unit=self.unit, code="CF1", description="Walls painted")
+        war = self._war("Wall Painting")
+        self.assertEqual(self._cells(), {(None, "Wall Painting"): [war.id]})
+        # update() sends no signals; invalidating the catalog is enough for the next refresh
+        SuccessIndicator.objects.filter(id=indicator.id).update(activity_name=self.activity)
+        catalog.invalidate_catalog(self.unit.id)
+        refresh_unit(self.unit.id)
+        self.assertEqual(self._cells(), {(indicator.id, ""): [war.id]})
+
+    def test_deleting_activity_refreshes_unit(self):
+        indicator = SuccessIndicator.objects.create(
+            unit=self.unit, code="CF1", description="Walls painted", activity_name=self.activity,
+        )
+        war = self._war("Wall Painting")
+        self.activity.delete()
+        # The indicator now matches on its code, so the WAR is unmatched
+        self.assertEqual(self._cells(), {(None, "Wall Painting"): [war.id]})
+        self.assertFalse(IPMTRollup.objects.filter(indicator=indicator).exists())
+
+    def test_excel_keeps_personnel_with_only_unmatched_wars(self):
+        SuccessIndicator.objects.create(
+            unit=self.unit, code="CF1", description="Walls painted", activity_name=self.activity,
+        )
+        self._war("Sign Lettering")
+        idle = User.objects.create_user("idle", password="x", role="personnel", unit=self.unit)
+        workbook = openpyxl.load_workbook(generate_ipmt_excel("2025-09", self.unit.name, output=io.BytesIO()))
+        self.assertEqual(workbook.sheetnames, [self.worker.username])
+        self.assertNotIn(idle.username, workbook.sheetnames)
+
+    def test_moving_indicator_refreshes_old_unit(self):
+        indicator = SuccessIndicator.objects.create(
+            unit=self.unit, code="CF1", description="Walls painted", activity_name=self.activity,
+        )
+        war = self._war("Wall Painting")
+        indicator.unit = self.other_unit
+        indicator.save()
+        self.assertEqual(self._cells(), {(None, "Wall Painting"): [war.id]})
+
+
+# -------------------------------
+# Indicator Catalog
+# -------------------------------
+class IndicatorCatalogTests(FreshProcessCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.unit = Unit.objects.create(name="Carpentry")
+        cls.gso = User.objects.create_user("gso", password="x", role="gso")
+        for n in range(30):
+            SuccessIndicator.objects.create(unit=cls.unit, code=f"CF{n}", description=f"Indicator {n}")
+
+    def _generate(self, rows):
+        payload = {"month": "2025-09", "unit": "Carpentry", "personnel": "", "rows": rows}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("gso_reports:generate_ipmt"), json.dumps(payload), content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+        return [q["sql"] for q in queries.captured_queries]
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.client.force_login(self.gso)
+        row = lambda n: {"indicator": f"cf{n}", "description": "Done", "remarks": "Complied"}
+        first = self._generate([row(0)])
+        few = self._generate([row(n) for n in range(2)])
+        many = self._generate([row(n) for n in range(30)])
+        self.assertEqual(len(few), len(many))
+        # The catalog is built by the first request only, in one query
+        indicator_queries = [sum("gso_reports_successindicator" in sql for sql in q) for q in (first, few, many)]
+        self.assertEqual(indicator_queries, [1, 0, 0])
+
+    def test_rebuilt_after_indicator_change(self):
+        self.assertIsNone(catalog.indicator_catalog(self.unit.id).by_code("NEW1"))
+        SuccessIndicator.objects.create(unit=self.unit, code="NEW1", description="New")
+        self.assertIsNotNone(catalog.indicator_catalog(self.unit.id).by_code("new1"))
+
+
+# -------------------------------
+# Save IPMT
+# -------------------------------
+class SaveIPMTTests(FreshProcessCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.unit = Unit.objects.create(name="Carpentry")
+        cls.gso = User.objects.create_user("gso", password="x", role="gso")
+        cls.worker = User.objects.create_user("worker", password="x", role="personnel", unit=cls.unit)
+        cls.indicator = SuccessIndicator.objects.create(unit=cls.unit, code="CF1", description="Doors fixed")
+        cls.wars = []
+        for day in (1, 2):
+            war = WorkAccomplishmentReport.objects.create(unit=cls.unit, date_started=date(2025, 9, day))
+            war.assigned_personnel.add(cls.worker)
+            cls.wars.append(war)
+        cls.foreign_war = WorkAccomplishmentReport.objects.create(
+            unit=Unit.objects.create(name="Grounds"), date_started=date(2025, 9, 1),
+        )
+
+    def _save(self, rows):
+        self.client.force_login(self.gso)
+        payload = {"month": "2025-09", "unit": "Carpentry", "personnel": "worker", "rows": rows}
+        return self.client.post(reverse("gso_reports:save_ipmt"), json.dumps(payload), content_type="application/json")
+
+    def test_upsert_replaces_row_and_links(self):
+        first, second = self.wars
+        response = self._save([{"indicator": "CF1", "description": "Hung door", "war_ids": [first.id]}])
+        self.assertEqual(response.json()["saved"], 1)
+        response = self._save([{
+            "indicator": "CF1", "description": "Hung two doors", "war_ids": [str(second.id), self.foreign_war.id],
+        }])
+        self.assertEqual(response.json()["saved"], 1)
+
+        row = IPMT.objects.get()
+        self.assertEqual((row.month, row.accomplishment, row.remarks), ("September 2025",) + ("Hung two doors",) * 2)
+        # Links are replaced, and a WAR of another unit is never linked
+        self.assertEqual(list(row.reports.values_list("id", flat=True)), [second.id])
+
+    def test_new_indicator_is_created(self):
+        self._save([{"indicator": "CF9", "description": "Other work"}])
+        self.assertTrue(IPMT.objects.filter(indicator__code="CF9", indicator__unit=self.unit).exists())
+
+    def test_malformed_rows_are_rejected(self):
+        for rows in (
+            [{"indicator": "CF1", "war_ids": ["x"]}],
+            [{"indicator": "CF1", "war_ids": [1.5]}],
+            [{"indicator": "CF1", "war_ids": "1"}],
+            [{"indicator": 5}],
+            ["CF1"],
+        ):
+            response = self._save(rows)
+            self.assertEqual(response.status_code, 400, rows)
+            self.assertIn("error", response.json())
+        self.assertFalse(IPMT.objects.exists())
+
+    def test_migration_merges_old_month_spellings(self):
+        first, second = self.wars
+        old = IPMT.objects.create(
+            personnel=self.worker, unit=self.unit, month="2025-09", indicator=self.indicator, accomplishment="Old",
+        )
+        old.reports.add(first)
+        new = IPMT.objects.create(
+            personnel=self.worker, unit=self.unit, month="September 2025", indicator=self.indicator,
+            accomplishment="New",
+        )
+        new.reports.add(second)
+        other = IPMT.objects.create(personnel=self.worker, unit=self.unit, month="oct 2025", indicator=self.indicator)
+
+        normalize = import_module("apps.gso_reports.migrations.0010_normalize_ipmt_month").normalize_months
+        normalize(django_apps, None)
+
+        self.assertEqual(
+            sorted(IPMT.objects.values_list("id", "month")), [(new.id, "September 2025"), (other.id, "October 2025")],
+        )
+        self.assertEqual(sorted(new.reports.values_list("id", flat=True)), [first.id, second.id])
+
+
+# -------------------------------
+# IPMT Template Snapshot
+# -------------------------------
+class TemplateSnapshotTests(SimpleTestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = os.path.join(tmpdir.name, "template.xlsx")
+        self._write_template("v1", mtime=1_000_000_000)
+        for patcher in (
+            mock.patch.object(utils, "IPMT_TEMPLATE_PATH", self.path),
+            mock.patch.dict(utils._template_cache, {"mtime": None, "snapshot": None}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _write_template(self, value, mtime):
+        wb = openpyxl.Workbook()
+        wb.active["A1"] = value
+        wb.save(self.path)
+        os.utime(self.path, ns=(mtime, mtime))
+
+    def test_template_is_parsed_once(self):
+        with mock.patch.object(utils.openpyxl, "load_workbook", wraps=openpyxl.load_workbook) as load:
+            first = utils.load_ipmt_template()
+            first.active["A1"] = "edited"
+            second = utils.load_ipmt_template()
+        self.assertEqual(load.call_count, 1)
+        # Every caller gets its own copy
+        self.assertEqual(second.active["A1"].value, "v1")
+
+    def test_template_reloads_when_file_changes(self):
+        self.assertEqual(utils.load_ipmt_template().active["A1"].value, "v1")
+        self._write_template("v2", mtime=2_000_000_000)
+        self.assertEqual(utils.load_ipmt_template().active["A1"].value, "v2")
+
+
+# -------------------------------
+# IPMT Zip Export
+# -------------------------------
+class IPMTZipExportTests(FreshProcessCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.gso = User.objects.create_user("gso", password="x", role="gso")
+        cls.unit = Unit.objects.create(name="Electrical")
+        cls.ana = User.objects.create_user(
+            "ana", password="x", role="personnel", first_name="Ana", last_name="Cruz", unit=cls.unit,
+        )
+        # Same display name: the zip entry has to be made unique
+        User.objects.create_user("ana2", password="x", role="personnel", first_name="Ana", last_name="Cruz", unit=cls.unit)
+        indicator = SuccessIndicator.objects.create(unit=cls.unit, code="EL1", description="Lights fixed")
+        IPMT.objects.create(
+            personnel=cls.ana, unit=cls.unit, month="September 2025", indicator=indicator,
+            accomplishment="Replaced 12 lamps", remarks="Complied",
+        )
+        grounds = Unit.objects.create(name="Grounds")
+        User.objects.create_user("ben", password="x", role="personnel", first_name="Ben", last_name="Lim", unit=grounds)
+        Unit.objects.create(name="Empty")
+
+    def _read_zip(self, chunks):
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+        return {name: openpyxl.load_workbook(io.BytesIO(archive.read(name))).active for name in archive.namelist()}
+
+    def test_one_workbook_per_personnel(self):
+        tasks = ipmt_export_tasks(date(2025, 9, 1), "electrical")
+        progress = mock.Mock()
+        chunks = list(iter_ipmt_zip(tasks, workers=1, progress=progress))
+        self.assertGreater(len([c for c in chunks if c]), 1)  # streamed, not built in one piece
+        self.assertEqual(progress.call_args_list, [mock.call(1, 2), mock.call(2, 2)])
+
+        sheets = self._read_zip(chunks)
+        self.assertEqual(sorted(sheets), ["Electrical/IPMT_Ana Cruz_2025-09 (2).xlsx", "Electrical/IPMT_Ana Cruz_2025-09.xlsx"])
+        sheet = sheets["Electrical/IPMT_Ana Cruz_2025-09.xlsx"]
+        self.assertEqual((sheet["B8"].value, sheet["B11"].value), ("Ana Cruz", "September 2025"))
+        self.assertEqual((sheet["B13"].value, sheet["C13"].value), ("Replaced 12 lamps", "Complied"))
+
+    def test_process_pool_matches_single_process(self):
+        tasks = ipmt_export_tasks(date(2025, 9, 1))
+        serial = self._read_zip(iter_ipmt_zip(tasks, workers=1))
+        pooled = self._read_zip(iter_ipmt_zip(tasks, workers=2))
+        self.assertEqual(sorted(pooled), sorted(serial))
+        self.assertIn("Grounds/IPMT_Ben Lim_2025-09.xlsx", pooled)
+        for name, sheet in serial.items():
+            self.assertEqual(pooled[name]["B13"].value, sheet["B13"].value)
+
+    def test_export_view(self):
+        self.client.force_login(self.gso)
+        url = reverse("gso_reports:export_ipmt_zip")
+        with mock.patch.object(views, "iter_ipmt_zip", lambda tasks: iter_ipmt_zip(tasks, workers=1)):
+            response = self.client.get(url, {"month": "2025-09", "unit": "Grounds"})
+        self.assertEqual(response["Content-Type"], "application/zip")
+        self.assertIn("IPMT_Grounds_2025-09.zip", response["Content-Disposition"])
+        self.assertEqual(list(self._read_zip(response.streaming_content)), ["Grounds/IPMT_Ben Lim_2025-09.xlsx"])
+
+        self.assertEqual(self.client.get(url, {"month": "September"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"month": "2025-09", "unit": "Empty"}).status_code, 404)
+
+
+# -------------------------------
+# Background Report Jobs
+# -------------------------------
+class ReportJobTests(FreshProcessCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.gso = User.objects.create_user("gso", password="x", role="gso")
+        unit = Unit.objects.create(name="Electrical")
+        WorkAccomplishmentReport.objects.create(unit=unit, date_started=date(2025, 9, 1), activity_name="Wiring")
+        Unit.objects.create(name="Empty")
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = self.settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        # Run jobs inline; the test transaction must not be closed underneath the test
+        for patcher in (
+            mock.patch.object(jobs, "_executor", mock.Mock(submit=lambda fn, *args: fn(*args))),
+            mock.patch.object(jobs, "close_old_connections"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client.force_login(self.gso)
+
+    def _start(self, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("gso_reports:start_report_job"), data)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status"], "Queued")
+        return self.client.get(response.json()["status_url"]).json()
+
+    def test_job_runs_and_downloads(self):
+        status = self._start(kind="accomplishment_csv", unit="Electrical")
+        self.assertEqual((status["status"], status["rows_done"], status["rows_total"]), ("Done", 1, 1))
+        self.assertEqual(status["percent"], 100)
+
+        response = self.client.get(status["download_url"])
+        self.assertIn("Accomplishment_Report_", response["Content-Disposition"])
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], EXPORT_HEADERS)
+        self.assertEqual([row[3] for row in rows[1:]], ["Wiring"])
+
+    def test_failed_job_is_logged(self):
+        with self.assertLogs(jobs.logger, "ERROR") as logs:
+            status = self._start(kind="ipmt_zip", unit="Empty", month="2025-09")
+        self.assertIn("(ipmt_zip) failed", logs.output[0])
+        self.assertEqual((status["status"], status["error"]), ("Failed", "No personnel found for this unit."))
+        self.assertIsNone(status["download_url"])
+
+        job = ReportJob.objects.get()
+        self.assertIsNotNone(job.finished_at)
+        download = reverse("gso_reports:download_report_job", args=[job.id])
+        self.assertEqual(self.client.get(download).status_code, 404)
+
+    def test_bad_requests_are_rejected(self):
+        url = reverse("gso_reports:start_report_job")
+        self.assertEqual(self.client.post(url, {"kind": "pdf"}).status_code, 400)
+        self.assertEqual(self.client.post(url, {"kind": "ipmt_excel", "month": "Sept"}).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertFalse(ReportJob.objects.exists())
+
+    def test_jobs_are_private_to_their_creator(self):
+        job = ReportJob.objects.create(kind="accomplishment_csv", created_by=self.gso)
+        self.client.force_login(User.objects.create_user("other", password="x", role="gso"))
+        self.assertEqual(self.client.get(reverse("gso_reports:report_job_status", args=[job.id])).status_code, 404)
+
+
+# -------------------------------
+# Data Versions / Personnel Name Index
+# -------------------------------
+class VersionTests(FreshProcessCachesMixin, TestCase):
+    def test_bump_creates_then_increments(self):
+        self.assertEqual(versions.current("test"), 0)
+        versions.bump("test")
+        versions.bump("test", "other")
+        self.assertEqual((versions.current("test"), versions.current("other")), (2, 1))
+
+    def test_versioned_value_rebuilds_only_on_bump(self):
+        build = mock.Mock(side_effect=["first", "second"])
+        value = versions.VersionedValue("test", build)
+        self.assertEqual((value.get(), value.get()), ("first", "first"))
+        versions.bump("test")
+        self.assertEqual(value.get(), "second")
+        self.assertEqual(build.call_count, 2)
+
+    def test_versioned_value_checks_at_most_once_per_window(self):
+        build = mock.Mock(side_effect=["first", "second"])
+        value = versions.VersionedValue("test", build, check_every=60)
+        with mock.patch.object(versions.time, "monotonic", return_value=1000.0) as clock:
+            value.get()
+            versions.bump("test")  # by another worker
+            with self.assertNumQueries(0):
+                self.assertEqual(value.get(), "first")
+            clock.return_value = 1060.0
+            self.assertEqual(value.get(), "second")
+
+
+class PreviewCacheTests(FreshProcessCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        preview_cache._cache().clear()
+        patcher = mock.patch.object(preview_cache, "_lru", preview_cache.OrderedDict())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_preview_is_rebuilt_after_a_bump(self):
+        build = mock.Mock(side_effect=[["v1"], ["v2"]])
+        period = date(2025, 9, 1)
+        self.assertEqual(preview_cache.cached_preview(1, period, [5, 6], build), ["v1"])
+        self.assertEqual(preview_cache.cached_preview(1, period, [5, 6], build), ["v1"])
+        preview_cache.bump_version(2)
+        self.assertEqual(preview_cache.cached_preview(1, period, [5, 6], build), ["v1"])
+        preview_cache.bump_version(1)
+        self.assertEqual(preview_cache.cached_preview(1, period, [5, 6], build), ["v2"])
+        self.assertEqual(build.call_count, 2)
+
+    def test_personnel_order_does_not_matter(self):
+        build = mock.Mock(return_value=["rows"])
+        period = date(2025, 9, 1)
+        preview_cache.cached_preview(1, period, [5, 6], build)
+        preview_cache.cached_preview(1, period, [6, 5, 5], build)
+        self.assertEqual(build.call_count, 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        period = date(2025, 9, 1)
+        keys = [preview_cache._entry_key(1, period, [n], 0) for n in range(3)]
+        with mock.patch.object(preview_cache, "PREVIEW_CACHE_SIZE", 2):
+            preview_cache.cached_preview(1, period, [0], lambda: ["a"])
+            preview_cache.cached_preview(1, period, [1], lambda: ["b"])
+            preview_cache.cached_preview(1, period, [0], lambda: self.fail("still cached"))
+            preview_cache.cached_preview(1, period, [2], lambda: ["c"])  # evicts [1], used least recently
+
+        cached = preview_cache._cache().get_many(keys)
+        self.assertEqual(sorted(cached), sorted([keys[0], keys[2]]))
+        self.assertEqual(list(preview_cache._lru), [keys[0], keys[2]])
+
+
+class PersonnelResolutionTests(FreshProcessCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.juan = User.objects.create_user("jdc", password="x", first_name="Juan", last_name="Dela Cruz")
+        cls.maria = User.objects.create_user("msantos", password="x", first_name="Maria", last_name="Santos")
+        User.objects.create_user("psantos", password="x", first_name="Pedro", last_name="Santos")
+
+    def test_resolves_each_tier(self):
+        result = personnel.resolve_personnel(["JDC", "maria  santos", "Santos", "Nobody", "jdc"])
+        self.assertEqual(result.users, [self.juan, self.maria])
+        self.assertEqual(result.unresolved, ["Nobody"])
+        self.assertEqual(set(result.ambiguous), {"Santos"})
+
+    def test_saving_a_user_refreshes_the_index(self):
+        personnel.name_index()
+        self.juan.last_name = "Reyes"
+        self.juan.save()
+        self.assertEqual(personnel.resolve_personnel(["Juan Reyes"]).users, [self.juan])
+        self.assertEqual(personnel.resolve_personnel(["Juan Dela Cruz"]).unresolved, ["Juan Dela Cruz"])
+
+    def test_collect_ipmt_reports_keeps_people_sharing_a_first_name(self):
+        unit = Unit.objects.create(name="Carpentry")
+        reyes = User.objects.create_user(
+            "jreyes", password="x", role="personnel", unit=unit, first_name="Juan", last_name="Reyes",
+        )
+        User.objects.filter(id=self.juan.id).update(unit=unit, role="personnel")
+        collected = collect_ipmt_reports(2025, 9, "Carpentry", ["Juan Reyes"])
+        self.assertEqual([entry["personnel"] for entry in collected], [personnel.display_name(reyes)])
+        collected = collect_ipmt_reports(2025, 9, "Carpentry", ["jdc", "jreyes"])
+        self.assertEqual([entry["personnel"] for entry in collected], ["Juan Dela Cruz", "Juan Reyes"])
+
+
+# -------------------------------
+# Keyword Matcher
+# -------------------------------
+class KeywordMatcherTests(SimpleTestCase):
+    def test_best_ranked_entry_wins_at_the_same_position(self):
+        matcher = KeywordMatcher([("Electrical", ["wall"]), ("Painting", ["wall paint"])])
+        self.assertEqual(matcher.match("need wall paint in lobby"), "Electrical")
+        matcher = KeywordMatcher([("Painting", ["wall paint"]), ("Electrical", ["wall"])])
+        self.assertEqual(matcher.match("need wall paint in lobby"), "Painting")
+
+    def test_best_ranked_entry_wins_anywhere_in_the_text(self):
+        matcher = KeywordMatcher([("Plumbing", ["faucet"]), ("Electrical", ["outlet", "wiring"])])
+        self.assertEqual(matcher.match("fix the outlet near the faucet"), "Plumbing")
+        self.assertEqual(matcher.match("REWIRING  the outlet"), "Electrical")
+        self.assertIsNone(matcher.match("mow the lawn"))
+
+    def test_boundaries(self):
+        entries = [("Electrical", ["wir"])]
+        self.assertEqual(KeywordMatcher(entries, boundary="substring").match("rewiring"), "Electrical")
+        self.assertIsNone(KeywordMatcher(entries, boundary="prefix").match("rewiring"))
+        self.assertEqual(KeywordMatcher(entries, boundary="prefix").match("wiring"), "Electrical")
+        self.assertIsNone(KeywordMatcher(entries, boundary="word").match("wiring"))
+
+    def test_classify_tries_texts_in_order_then_falls_back(self):
+        matcher = KeywordMatcher([("Plumbing", ["leak"]), ("Carpentry", ["door"])], fallback="Miscellaneous")
+        self.assertEqual(matcher.classify("door hinge", "leak"), "Carpentry")
+        self.assertEqual(matcher.classify("", None, "leak"), "Plumbing")
+        self.assertEqual(matcher.classify("mow the lawn"), "Miscellaneous")
+
+
+class ActivityMatcherTests(FreshProcessCachesMixin, TestCase):
+    def test_rebuilt_after_activity_change(self):
+        activity = ActivityName.objects.create(name="Plumbing", keywords="leak, faucet")
+        self.assertEqual(activity_matcher().match("leaking pipe"), activity)
+        activity.keywords = "faucet"
+        activity.save()
+        self.assertIsNone(activity_matcher().match("leaking pipe"))
+
+    def test_repeated_classification_runs_no_queries(self):
+        plumbing = ActivityName.objects.create(name="Plumbing", keywords="leak, faucet")
+        map_activity_name("warm up")
+        with self.assertNumQueries(0):
+            for text in ("leaking pipe", "new faucet", "leak under sink", "broken faucet", "leak"):
+                self.assertEqual(map_activity_name(text), plumbing)
+
+
+# -------------------------------
+# Bulk Reclassification
+# -------------------------------
+class ReclassifyTests(FreshProcessCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.unit = Unit.objects.create(name="Facilities")
+        ActivityName.objects.create(name="Miscellaneous")
+        ActivityName.objects.create(name="Plumbing", keywords="leak, faucet")
+        ActivityName.objects.create(name="Grounds", keywords="")
+
+    def _war(self, activity, description):
+        return WorkAccomplishmentReport.objects.create(
+            unit=self.unit, date_started=date(2025, 9, 1), activity_name=activity, description=description,
+        ).id
+
+    def _activities(self):
+        return dict(WorkAccomplishmentReport.objects.values_list("id", "activity_name"))
+
+    def _reclassify(self, classifier=None, **kwargs):
+        with mock.patch.object(activity_classifier, "activity_classifier", return_value=classifier):
+            return reclassify_activities(**kwargs)
+
+    def test_unmatched_rows_keep_their_activity(self):
+        leak = self._war("Miscellaneous", "Fixed a leak under the sink")
+        lawn = self._war("Grounds", "Mowed the lawn")
+        blank = self._war("Grounds", "")
+        result = self._reclassify()
+        self.assertEqual(result["changed"]["WorkAccomplishmentReport"], 1)
+        self.assertEqual(self._activities(), {leak: "Plumbing", lawn: "Grounds", blank: "Grounds"})
+
+    def test_dry_run_writes_nothing(self):
+        leak = self._war("", "Dripping faucet")
+        result = self._reclassify(dry_run=True, workers=2)
+        self.assertEqual(result["moves"][("WorkAccomplishmentReport", "(none)", "Plumbing")], 1)
+        self.assertEqual(self._activities(), {leak: ""})
+
+    def test_classifier_labels_only_rows_without_an_activity(self):
+        classifier = TfidfCentroidClassifier.fit(
+            ["mowed the lawn", "trimmed lawn hedges", "unclogged the drain", "drain pipe cleared"],
+            ["Grounds", "Grounds", "Plumbing", "Plumbing"],
+        )
+        misc = self._war("Miscellaneous", "Mowed the front lawn")
+        labelled = self._war("Plumbing", "Mowed the back lawn")
+        self._reclassify(classifier)
+        self.assertEqual(self._activities(), {misc: "Grounds", labelled: "Plumbing"})
+
+
+# -------------------------------
+# Activity Classifier
+# -------------------------------
+class TextClassifierTests(SimpleTestCase):
+    TEXTS = [
+        "replaced broken light switch", "rewired ceiling light", "installed new outlet wiring",
+        "unclogged sink drain", "fixed leaking pipe joint", "replaced drain pipe under sink",
+    ]
+    LABELS = ["Electrical"] * 3 + ["Plumbing"] * 3
+
+    def test_predicts_nearest_centroid(self):
+        model = TfidfCentroidClassifier.fit(self.TEXTS, self.LABELS)
+        (label, confidence), (unknown, zero) = model.predict(["light switch sparks", "painted the hallway"])
+        self.assertEqual(label, "Electrical")
+        self.assertTrue(0 < confidence <= 1)
+        self.assertEqual((unknown, zero), (None, 0.0))
+        self.assertEqual(model.predict_one("pipe under the sink")[0], "Plumbing")
+
+    def test_save_and_load_round_trip(self):
+        model = TfidfCentroidClassifier.fit(self.TEXTS, self.LABELS, meta={"accuracy": 0.9})
+        buffer = io.BytesIO()
+        model.save(buffer)
+        buffer.seek(0)
+        loaded = TfidfCentroidClassifier.load(buffer)
+        self.assertEqual(loaded.meta, model.meta)
+        self.assertEqual(loaded.meta["accuracy"], 0.9)
+        texts = ["rewired the outlet", "leaking sink"]
+        self.assertEqual(loaded.predict(texts), model.predict(texts))
+
+
+class ClassifyActivityTests(FreshProcessCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.misc = ActivityName.objects.create(name="Miscellaneous")
+        cls.electrical = ActivityName.objects.create(name="Electrical", keywords="outlet")
+        cls.plumbing = ActivityName.objects.create(name="Plumbing", keywords="faucet")
+        cls.model = TfidfCentroidClassifier.fit(TextClassifierTests.TEXTS, TextClassifierTests.LABELS)
+
+    def _classify(self, *texts):
+        with mock.patch.object(activity_classifier, "activity_classifier", return_value=self.model):
+            return activity_classifier.classify_activity(*texts)
+
+    def test_keyword_then_model_then_fallback(self):
+        self.assertEqual(self._classify("", "replace faucet"), (self.plumbing, 1.0, "keyword"))
+        activity, confidence, source = self._classify("rewired ceiling light")
+        self.assertEqual((activity, source), (self.electrical, "model"))
+        self.assertGreaterEqual(confidence, activity_classifier.MIN_CONFIDENCE)
+        self.assertEqual(self._classify("painted the hallway"), (self.misc, 0.0, "fallback"))
+
+    def test_inactive_activities_are_never_predicted(self):
+        self.electrical.is_active = False
+        self.electrical.save()
+        self.assertEqual(self._classify("rewired ceiling light").source, "fallback")
+
+    def test_unreadable_model_file_is_logged(self):
+        with tempfile.NamedTemporaryFile(suffix=".npz") as f, \
+                mock.patch.object(activity_classifier, "CLASSIFIER_PATH", f.name), \
+                self.assertLogs(activity_classifier.logger, "ERROR"):
+            f.write(b"not a model")
+            f.flush()
+            self.assertIsNone(activity_classifier.activity_classifier())
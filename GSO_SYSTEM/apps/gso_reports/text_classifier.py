@@ -0,0 +1,161 @@
+# apps/gso_reports/text_classifier.py
+"""
+TF-IDF + nearest-centroid text classifier, computed with NumPy.
+
+No Django imports: the model is fitted from plain (text, label) pairs and
+saved as a .npz file (no pickle), so it can be trained and used anywhere.
+"""
+import json
+import re
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has in is it of on or the to was were with".split()
+)
+MAX_FEATURES = 20000
+
+
+def tokenize(text):
+    """Lower-cased words (2+ characters, no stop words) followed by their bigrams."""
+    words = [w for w in TOKEN_RE.findall((text or "").lower()) if len(w) > 1 and w not in STOP_WORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class TfidfCentroidClassifier:
+    """
+    Each label is the L2-normalized mean of its training documents' TF-IDF
+    vectors; a text gets the label of the most similar centroid, and the
+    cosine similarity to that centroid is its confidence (0..1).
+    """
+
+    def __init__(self, vocabulary, idf, centroids, labels, meta=None):
+        self.vocabulary = vocabulary            # {term: column}
+        self.idf = idf                          # (V,) float32
+        self.centroids = centroids              # (K, V) float32, rows L2-normalized
+        self.labels = list(labels)              # K label strings
+        self.meta = meta or {}
+        self._centroids_t = np.ascontiguousarray(centroids.T)  # (V, K) for row gathers
+
+    # -------------------------------
+    # Features
+    # -------------------------------
+    @staticmethod
+    def _counts(texts, vocabulary):
+        """Sparse term counts as parallel (row, column, count) arrays."""
+        rows, cols, counts = [], [], []
+        for row, text in enumerate(texts):
+            seen = {}
+            for term in tokenize(text):
+                col = vocabulary.get(term)
+                if col is not None:
+                    seen[col] = seen.get(col, 0) + 1
+            rows.extend([row] * len(seen))
+            cols.extend(seen)
+            counts.extend(seen.values())
+        return (
+            np.asarray(rows, dtype=np.int64),
+            np.asarray(cols, dtype=np.int64),
+            np.asarray(counts, dtype=np.float32),
+        )
+
+    @staticmethod
+    def _weights(rows, cols, counts, idf, n_rows):
+        """Sublinear TF-IDF weights, L2-normalized per row."""
+        weights = (1.0 + np.log(counts)) * idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=n_rows))
+        return weights / np.where(norms > 0, norms, 1.0)[rows]
+
+    # -------------------------------
+    # Training
+    # -------------------------------
+    @classmethod
+    def fit(cls, texts, labels, min_df=2, max_features=MAX_FEATURES, meta=None):
+        texts = list(texts)
+        labels = list(labels)
+        if not texts:
+            raise ValueError("No training samples.")
+
+        # Document frequency of every term, keeping the most frequent ones
+        df = {}
+        for text in texts:
+            for term in set(tokenize(text)):
+                df[term] = df.get(term, 0) + 1
+        terms = sorted((t for t, n in df.items() if n >= min_df), key=lambda t: (-df[t], t))[:max_features]
+        if not terms:
+            raise ValueError("No term occurs in enough samples; lower min_df or add data.")
+        vocabulary = {term: col for col, term in enumerate(terms)}
+        idf = (np.log((1 + len(texts)) / (1 + np.array([df[t] for t in terms], dtype=np.float32))) + 1).astype(np.float32)
+
+        names = sorted(set(labels))
+        lookup = {name: k for k, name in enumerate(names)}
+        label_index = np.array([lookup[label] for label in labels])
+
+        rows, cols, counts = cls._counts(texts, vocabulary)
+        weights = cls._weights(rows, cols, counts, idf, len(texts))
+
+        centroids = np.zeros((len(names), len(terms)), dtype=np.float32)
+        np.add.at(centroids, (label_index[rows], cols), weights)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids /= np.where(norms > 0, norms, 1.0)
+
+        meta = dict(meta or {}, samples=len(texts), features=len(terms))
+        return cls(vocabulary, idf, centroids, names, meta)
+
+    # -------------------------------
+    # Prediction
+    # -------------------------------
+    def scores(self, texts):
+        """(n, K) cosine similarity of every text to every label centroid."""
+        texts = list(texts)
+        scores = np.zeros((len(texts), len(self.labels)), dtype=np.float32)
+        rows, cols, counts = self._counts(texts, self.vocabulary)
+        if len(rows):
+            weights = self._weights(rows, cols, counts, self.idf, len(texts))
+            # rows come out sorted, so each text's terms are one contiguous run
+            present, starts = np.unique(rows, return_index=True)
+            scores[present] = np.add.reduceat(self._centroids_t[cols] * weights[:, None], starts, axis=0)
+        return scores
+
+    def predict(self, texts):
+        """[(label, confidence), ...]; (None, 0.0) for texts with no known term."""
+        scores = self.scores(texts)
+        if not len(scores):
+            return []
+        best = scores.argmax(axis=1)
+        confidence = scores[np.arange(len(scores)), best]
+        return [
+            (self.labels[k], float(c)) if c > 0 else (None, 0.0)
+            for k, c in zip(best, confidence)
+        ]
+
+    def predict_one(self, text):
+        return self.predict([text])[0]
+
+    # -------------------------------
+    # Persistence
+    # -------------------------------
+    def save(self, file_obj):
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        np.savez_compressed(
+            file_obj,
+            terms=np.array(terms),
+            idf=self.idf,
+            centroids=self.centroids,
+            labels=np.array(self.labels),
+            meta=np.array(json.dumps(self.meta)),
+        )
+
+    @classmethod
+    def load(cls, file_obj):
+        with np.load(file_obj, allow_pickle=False) as data:
+            vocabulary = {str(term): col for col, term in enumerate(data["terms"])}
+            return cls(
+                vocabulary,
+                data["idf"].astype(np.float32),
+                data["centroids"].astype(np.float32),
+                [str(label) for label in data["labels"]],
+                json.loads(str(data["meta"])),
+            )
+
@@ -5,9 +5,16 @@ app_name = "gso_reports"
 
 urlpatterns = [
     path('accomplishment/', views.accomplishment_report, name='accomplishment_report'),
+    path('accomplishment/export/', views.export_accomplishment_report, name='export_accomplishment_report'),
+    path('search/', views.search_reports_view, name='search_reports'),
     path("ipmt/save/", views.save_ipmt, name="save_ipmt"),  # save edited IPMT rows
     path('ipmt/generate/', views.generate_ipmt, name='generate_ipmt'),
     path("ipmt/preview/", views.preview_ipmt, name="preview_ipmt"),
+    path("ipmt/export-zip/", views.export_ipmt_zip, name="export_ipmt_zip"),
+    path("jobs/start/", views.start_report_job, name="start_report_job"),
+    path("jobs/<int:job_id>/", views.report_job_status, name="report_job_status"),
+    path("jobs/<int:job_id>/download/", views.download_report_job, name="download_report_job"),
     path('war-description/<int:war_id>/', views.get_war_description, name='get_war_description'),
+    path('request-description/<int:request_id>/', views.get_request_description, name='get_request_description'),
 
 ]
@@ -1,96 +1,363 @@
 # apps/gso_reports/utils.py
+from django.conf import settings
 from django.utils import timezone
-from datetime import datetime
+from django.utils.dateparse import parse_datetime
+from datetime import date
 from apps.gso_accounts.models import Unit, User
 from apps.gso_requests.models import ServiceRequest
-from .models import WorkAccomplishmentReport, ActivityName, SuccessIndicator, IPMT
-import io
+from .models import WorkAccomplishmentReport, SuccessIndicator, IPMT
+from .search import matching_ids
+from .rollup import rollup_cells, refresh_unit
+from .catalog import indicator_catalog, invalidate_catalog
+from .ipmt_sheet import init_render_worker, render_ipmt_workbook
+from .preview_cache import bump_version
+from .activity_classifier import classify_activity
+from .personnel import resolve_personnel, display_name
+import os
+import re
+import tempfile
+import csv
+import pickle
+import threading
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import base64
 import calendar
 import pandas as pd
+import openpyxl
+from openpyxl import Workbook
 
 
 from django.apps import apps
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q, F, Value, DateTimeField, CharField, BooleanField
+from django.db.models.functions import Cast, Coalesce
 
 
 # -------------------------------
 # Normalize Reports (for Accomplishment Report)
 # -------------------------------
+class ReportRow:
+    """
+    Compact, read-only-ish row for the accomplishment report and its exports.
+    Holds plain values only (no model instances), so thousands of rows stay cheap.
+    """
+    __slots__ = (
+        "id", "type", "source", "requesting_office", "description", "activity",
+        "unit", "date", "personnel", "status", "rating", "pending",
+    )
+
+    def __init__(self, id, type, source, requesting_office, description, activity,
+                 unit, date, personnel, status, rating=None, pending=False):
+        self.id = id
+        self.type = type
+        self.source = source
+        self.requesting_office = requesting_office
+        self.description = description
+        self.activity = activity
+        self.unit = unit
+        self.date = date
+        self.personnel = personnel
+        self.status = status
+        self.rating = rating
+        self.pending = pending
+
+    def __repr__(self):
+        return f"<ReportRow {self.type} #{self.id}>"
+
+
+def normalize_reports(queryset):
+    """
+    Normalize a WorkAccomplishmentReport or ServiceRequest queryset in bulk.
+    Always runs two queries (one values() row query + one personnel query),
+    however many rows are returned.
+    """
+    annotate = _war_report_rows if queryset.model is WorkAccomplishmentReport else _request_report_rows
+    return _rows_to_reports(list(annotate(queryset).values(*REPORT_COLUMNS)))
+
+
 def normalize_report(obj):
-    if isinstance(obj, ServiceRequest):
-        assigned = obj.assigned_personnel.all()
-        personnel_list = [p.get_full_name() or p.username for p in assigned] if assigned.exists() else ["Unassigned"]
-
-        return {
-            "type": "ServiceRequest",
-            "source": "Live",
-            "requesting_office": obj.department.name if obj.department else "",
-            "description": obj.description,
-            "unit": obj.unit.name if obj.unit else "",
-            "date": obj.created_at,
-            "personnel": personnel_list,
-            "status": obj.status,
-            "rating": getattr(obj, "rating", None),
-            "request": obj,  # ✅ Added for template check {% if report.request %}
-        }
+    """Single-object convenience wrapper around normalize_reports()."""
+    rows = normalize_reports(type(obj).objects.filter(pk=obj.pk))
+    return rows[0] if rows else None
 
-    elif isinstance(obj, WorkAccomplishmentReport):
-        date_value = obj.date_started
-        if isinstance(date_value, datetime) and timezone.is_naive(date_value):
-            date_value = timezone.make_aware(date_value)
-        elif not isinstance(date_value, datetime):
-            date_value = timezone.make_aware(datetime.combine(date_value, datetime.min.time()))
-
-        assigned = obj.assigned_personnel.all()
-        personnel_list = [p.get_full_name() or p.username for p in assigned] if assigned.exists() else ["Unassigned"]
-
-        return {
-            "type": "WorkAccomplishmentReport",
-            "source": "Live" if obj.request else "Migrated",
-            "requesting_office": obj.request.department.name if obj.request and obj.request.department else getattr(obj, "requesting_office", ""),
-            "description": obj.description,
-            "unit": obj.request.unit.name if obj.request and obj.request.unit else (obj.unit.name if obj.unit else ""),
-            "date": date_value,
-            "personnel": personnel_list,
-            "status": obj.status or "Completed",
-            "rating": getattr(obj, "rating", None),
-            "request": obj.request,  # ✅ Added for template check
-        }
+
+# -------------------------------
+# Accomplishment Report Query (WARs + Completed Requests)
+# -------------------------------
+REPORT_PAGE_SIZE = 50
+
+# Column order must be identical on both sides of the UNION.
+REPORT_COLUMNS = (
+    "type", "row_id", "sort_date", "unit_name", "description",
+    "requesting_office", "activity", "status", "is_live",
+)
+
+
+def _war_report_rows(queryset=None):
+    if queryset is None:
+        queryset = WorkAccomplishmentReport.objects.all()
+    return queryset.annotate(
+        type=Value("WorkAccomplishmentReport", output_field=CharField()),
+        row_id=F("id"),
+        sort_date=Cast("date_started", output_field=DateTimeField()),
+        unit_name=Coalesce("request__unit__name", "unit__name"),
+        requesting_office=Coalesce("request__department__name", Value(""), output_field=CharField()),
+        activity=Coalesce("activity_name", Value(""), output_field=CharField()),
+        is_live=Q(request__isnull=False),
+    )
+
+
+def _request_report_rows(queryset=None):
+    if queryset is None:
+        queryset = ServiceRequest.objects.filter(status="Completed", war__isnull=True)
+    return queryset.annotate(
+        type=Value("ServiceRequest", output_field=CharField()),
+        row_id=F("id"),
+        sort_date=Cast("created_at", output_field=DateTimeField()),
+        unit_name=F("unit__name"),
+        requesting_office=Coalesce("department__name", Value(""), output_field=CharField()),
+        activity=Coalesce("activity_name", Value(""), output_field=CharField()),
+        is_live=Value(True, output_field=BooleanField()),
+    )
+
+
+def _filter_report_rows(qs, row_type, search_query=None, unit_filter=None):
+    if unit_filter:
+        qs = qs.filter(unit_name__iexact=unit_filter)
+    if search_query:
+        qs = qs.filter(id__in=matching_ids(search_query, row_type))
+    return qs
+
+
+def _after_cursor(qs, row_type, cursor):
+    """
+    Keep only rows that sort after the cursor for ordering
+    (-sort_date, -type, -row_id). `row_type` is constant within one branch,
+    so the tuple comparison collapses to a simple date/id filter.
+    """
+    cursor_date, cursor_type, cursor_id = cursor
+    # Cast the bound value the same way as the column so SQLite compares like with like
+    cursor_date = Cast(Value(cursor_date, output_field=DateTimeField()), output_field=DateTimeField())
+    if row_type < cursor_type:
+        return qs.filter(sort_date__lte=cursor_date)
+    if row_type > cursor_type:
+        return qs.filter(sort_date__lt=cursor_date)
+    return qs.filter(Q(sort_date__lt=cursor_date) | Q(sort_date=cursor_date, row_id__lt=cursor_id))
+
+
+def encode_report_cursor(row):
+    raw = f"{row['sort_date'].isoformat()}|{row['type']}|{row['row_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_report_cursor(token):
+    """Return (sort_date, type, row_id) or None if the token is missing/invalid."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token.encode()).decode()
+        date_str, row_type, row_id = raw.split("|")
+        sort_date = parse_datetime(date_str)
+        if sort_date is None:
+            return None
+        return sort_date, row_type, int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def accomplishment_report_queryset(search_query=None, unit_filter=None, cursor=None):
+    """
+    Build one UNION ALL queryset of WARs and completed requests that have no WAR yet,
+    filtered and ordered by the database (newest first).
+    Rows are plain dicts keyed by REPORT_COLUMNS.
+    """
+    branches = []
+    for row_type, qs in (
+        ("WorkAccomplishmentReport", _war_report_rows()),
+        ("ServiceRequest", _request_report_rows()),
+    ):
+        qs = _filter_report_rows(qs, row_type, search_query, unit_filter)
+        if cursor:
+            qs = _after_cursor(qs, row_type, cursor)
+        branches.append(qs.values(*REPORT_COLUMNS))
+
+    war_rows, request_rows = branches
+    return war_rows.union(request_rows, all=True).order_by("-sort_date", "-type", "-row_id")
+
+
+def _personnel_names_for(model, ids):
+    """Map object id -> list of assigned personnel names in a single query."""
+    through = model.assigned_personnel.through
+    source_field = model.assigned_personnel.field.m2m_field_name()
+    names = {}
+    rows = through.objects.filter(**{f"{source_field}_id__in": ids}).values_list(
+        f"{source_field}_id", "user__first_name", "user__last_name", "user__username"
+    )
+    for obj_id, first, last, username in rows:
+        names.setdefault(obj_id, []).append(f"{first} {last}".strip() or username)
+    return names
+
+
+def _rows_to_reports(rows):
+    """Convert raw report rows into ReportRow objects, loading personnel for the batch."""
+    war_ids = [r["row_id"] for r in rows if r["type"] == "WorkAccomplishmentReport"]
+    request_ids = [r["row_id"] for r in rows if r["type"] == "ServiceRequest"]
+    personnel = {
+        "WorkAccomplishmentReport": _personnel_names_for(WorkAccomplishmentReport, war_ids) if war_ids else {},
+        "ServiceRequest": _personnel_names_for(ServiceRequest, request_ids) if request_ids else {},
+    }
+
+    return [
+        ReportRow(
+            id=r["row_id"],
+            type=r["type"],
+            source="Live" if r["is_live"] else "Migrated",
+            requesting_office=r["requesting_office"],
+            description=r["description"],
+            activity=r["activity"],
+            unit=r["unit_name"] or "",
+            date=r["sort_date"],
+            personnel=personnel[r["type"]].get(r["row_id"]) or ["Unassigned"],
+            status=r["status"] or "Completed",
+        )
+        for r in rows
+    ]
+
+
+def paginate_accomplishment_report(search_query=None, unit_filter=None, cursor_token=None, page_size=REPORT_PAGE_SIZE):
+    """
+    Keyset-paginate the accomplishment report.
+    Returns (reports, next_cursor); only one page of rows is ever loaded.
+    """
+    cursor = decode_report_cursor(cursor_token)
+    qs = accomplishment_report_queryset(search_query, unit_filter, cursor)
+    rows = list(qs[:page_size + 1])
+
+    next_cursor = encode_report_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return _rows_to_reports(rows[:page_size]), next_cursor
+
+
+def iter_accomplishment_report(search_query=None, unit_filter=None, chunk_size=2000):
+    """
+    Yield every ReportRow in date order, reading from a server-side cursor
+    (PostgreSQL) in chunks so memory stays constant regardless of table size.
+    """
+    qs = accomplishment_report_queryset(search_query, unit_filter)
+    batch = []
+    for row in qs.iterator(chunk_size=chunk_size):
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            yield from _rows_to_reports(batch)
+            batch = []
+    if batch:
+        yield from _rows_to_reports(batch)
 
 
 # -------------------------------
-# Activity Name Mapper
+# Accomplishment Report Export (CSV / XLSX)
 # -------------------------------
-def map_activity_name(description: str):
-    if not description:
-        return ActivityName.objects.filter(name="Miscellaneous").first()
+EXPORT_HEADERS = [
+    "Date", "Type", "Unit", "Activity", "Description",
+    "Requesting Office", "Assigned Personnel", "Status", "Source",
+]
+
+
+def _export_values(report):
+    return [
+        timezone.localtime(report.date).date() if report.date else None,
+        "WAR" if report.type == "WorkAccomplishmentReport" else "Service Request",
+        report.unit,
+        report.activity,
+        report.description,
+        report.requesting_office,
+        ", ".join(report.personnel),
+        report.status,
+        report.source,
+    ]
+
+
+def stream_accomplishment_csv(search_query=None, unit_filter=None):
+    """Yield CSV lines (header first) for use with StreamingHttpResponse."""
+    class Echo:
+        def write(self, value):
+            return value
+
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_HEADERS)
+    for report in iter_accomplishment_report(search_query, unit_filter):
+        yield writer.writerow(_export_values(report))
+
+
+def _iter_with_progress(search_query, unit_filter, progress):
+    """iter_accomplishment_report() that reports (rows done, total) to `progress`."""
+    if not progress:
+        yield from iter_accomplishment_report(search_query, unit_filter)
+        return
+    total = accomplishment_report_queryset(search_query, unit_filter).count()
+    done = 0
+    for report in iter_accomplishment_report(search_query, unit_filter):
+        yield report
+        done += 1
+        progress(done, total)
+
+
+def write_accomplishment_csv(file_obj, search_query=None, unit_filter=None, progress=None):
+    """Write the full report as CSV into a text-mode `file_obj`."""
+    writer = csv.writer(file_obj)
+    writer.writerow(EXPORT_HEADERS)
+    for report in _iter_with_progress(search_query, unit_filter, progress):
+        writer.writerow(_export_values(report))
+
 
-    description = description.lower()
+def write_accomplishment_xlsx(file_obj, search_query=None, unit_filter=None, progress=None):
+    """
+    Write the full report into `file_obj` with a write-only workbook.
+    Rows are flushed to disk as they are appended, so memory stays flat.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Accomplishment Report")
+    ws.append(EXPORT_HEADERS)
+    for report in _iter_with_progress(search_query, unit_filter, progress):
+        ws.append(_export_values(report))
+    wb.save(file_obj)
 
-    for activity in ActivityName.objects.all():
-        if any(kw in description for kw in activity.keyword_list()):
-            return activity
 
-    return ActivityName.objects.filter(name="Miscellaneous").first()
+# -------------------------------
+# Activity Name Mapper
+# -------------------------------
+def map_activity_name(description: str, with_confidence=False):
+    """
+    ActivityName whose keywords occur in `description`; when none does, the
+    trained classifier's guess, else "Miscellaneous". No database query is run
+    between the matcher's version checks (see activity_matcher.MATCHER_CHECK_EVERY).
+    with_confidence=True returns an ActivityMatch (activity, confidence, source).
+    """
+    match = classify_activity(description)
+    return match if with_confidence else match.activity
 
 
-def map_activity_name_from_reports(service_request):
+def map_activity_name_from_reports(service_request, with_confidence=False):
+    """Match the task reports first, then the request description."""
     task_reports_text = " ".join([t.report_text for t in service_request.reports.all()])
-    return map_activity_name(task_reports_text) or map_activity_name(service_request.description)
+    match = classify_activity(task_reports_text, service_request.description)
+    return match if with_confidence else match.activity
 
 
 # -------------------------------
 # Collect IPMT Reports (Indicator → Accomplishment → Remarks)
 # -------------------------------
 def collect_ipmt_reports(year: int, month_num: int, unit_name: str = None, personnel_names: list = None):
-    from apps.ai_service.tasks import generate_ipmt_summary
     """
-    Collect IPMT preview rows using activity_name → SuccessIndicator mapping per personnel.
+    Collect IPMT preview rows per personnel from the monthly IPMTRollup table.
+    Multi-WAR cells are summarized by the AI in one batch after all rows are built.
 
     Returns a list of dicts per personnel:
     [
         {
             "personnel": str,
+            "has_wars": bool,    # any WAR this month, matched to an indicator or not
             "rows": [
                 {
                     "indicator": str,
@@ -102,6 +369,7 @@ def collect_ipmt_reports(year: int, month_num: int, unit_name: str = None, perso
         }
     ]
     """
+    from apps.ai_service.utils import generate_ipmt_summaries
 
     result = []
 
@@ -111,46 +379,44 @@ def collect_ipmt_reports(year: int, month_num: int, unit_name: str = None, perso
     except Unit.DoesNotExist:
         return []
 
-    # 2. Filter personnel
+    # 2. Filter personnel (usernames / full names / last names, resolved in one pass)
     if personnel_names and "all" not in [p.lower() for p in personnel_names]:
-        users = User.objects.filter(
-            first_name__in=[p.split()[0].capitalize() for p in personnel_names],
-            unit=unit
-        )
+        users = [u for u in resolve_personnel(personnel_names).users if u.unit_id == unit.id]
     else:
-        users = User.objects.filter(unit=unit, role="personnel")
+        users = list(User.objects.filter(unit=unit, role="personnel"))
+
+    # 3. Get active SuccessIndicators for the unit
+    indicators = indicator_catalog(unit.id).active
 
-    # 3. Filter WARs for this unit/month
-    wars = WorkAccomplishmentReport.objects.filter(
-        unit=unit,
-        date_started__year=year,
-        date_started__month=month_num
-    ).prefetch_related("assigned_personnel").select_related("activity_name")
+    # 4. Pre-aggregated cells for this unit/month
+    matched, unmatched = rollup_cells(unit.id, date(year, month_num, 1), [u.id for u in users])
+    with_wars = {personnel_id for personnel_id, _ in matched} | set(unmatched)
 
-    # 4. Get active SuccessIndicators for the unit
-    indicators = SuccessIndicator.objects.filter(unit=unit, is_active=True)
+    # Descriptions of multi-WAR cells, loaded once for the AI summaries
+    multi_war_ids = {wid for cell in matched.values() if cell.war_count > 1 for wid in cell.war_ids}
+    war_descriptions = dict(
+        WorkAccomplishmentReport.objects.filter(id__in=multi_war_ids).values_list("id", "description")
+    ) if multi_war_ids else {}
+
+    summary_rows, summary_items = [], []
 
     for user in users:
         personnel_rows = []
 
         for indicator in indicators:
-            # Filter WARs assigned to this user and matching the indicator
-            matched_wars = [
-                w for w in wars
-                if user in w.assigned_personnel.all()
-                and w.activity_name and w.activity_name.name == indicator.name
-            ]
+            cell = matched.get((user.id, indicator.id))
 
-            if not matched_wars:
+            if not cell:
                 description = ""
                 war_ids = []
-            elif len(matched_wars) == 1:
-                description = matched_wars[0].description
-                war_ids = [matched_wars[0].id]
+            elif cell.war_count == 1:
+                description = cell.description
+                war_ids = list(cell.war_ids)
             else:
-                war_descriptions = [w.description for w in matched_wars if w.description]
-                description = generate_ipmt_summary(indicator.name, war_descriptions)
-                war_ids = [w.id for w in matched_wars]
+                descriptions = [war_descriptions[w] for w in cell.war_ids if war_descriptions.get(w)]
+                summary_items.append((indicator.code, descriptions))
+                description = ""  # filled from the batch below
+                war_ids = list(cell.war_ids)
 
             personnel_rows.append({
                 "indicator": indicator.code,
@@ -158,88 +424,441 @@ def collect_ipmt_reports(year: int, month_num: int, unit_name: str = None, perso
                 "remarks": description,  # auto-fill remarks
                 "war_ids": war_ids
             })
+            if cell and cell.war_count > 1:
+                summary_rows.append(personnel_rows[-1])
 
         result.append({
-            "personnel": user.get_full_name() or user.username,
+            "personnel": display_name(user),
+            "has_wars": user.id in with_wars,
             "rows": personnel_rows
         })
 
+    for row, summary in zip(summary_rows, generate_ipmt_summaries(summary_items)):
+        row["description"] = row["remarks"] = summary
+
     return result
 
 # -------------------------------
-# Generate IPMT Excel
+# Save IPMT (bulk upsert)
 # -------------------------------
-def generate_ipmt_excel(month_filter: str, unit_name: str = None, personnel_names: list = None):
+def ipmt_month_label(period):
+    """IPMT.month is stored as e.g. 'September 2025'."""
+    return f"{calendar.month_name[period.month]} {period.year}"
+
+
+def _posted_war_id(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    raise ValueError(f"Invalid WAR id: {value!r}")
+
+
+def clean_ipmt_rows(rows):
     """
-    Generate an Excel file for IPMT reports.
-    - One sheet per personnel
-    - Columns: Indicator, Accomplishment, Remarks
+    Validate rows posted to save_ipmt: each a dict with a text "indicator" and
+    optional "war_ids" of whole numbers (converted to ints in place). Rows
+    without an indicator are dropped. Raises ValueError on malformed input.
     """
-    try:
-        year, month_num = map(int, month_filter.split("-"))  # expects "YYYY-MM"
-    except ValueError:
-        raise ValueError("Month filter must be in 'YYYY-MM' format.")
-
-    if not personnel_names or "all" in [p.lower() for p in personnel_names]:
-        # Get all unique personnel with WARs this month
-        personnel_names = set()
-        wars = WorkAccomplishmentReport.objects.filter(
-            date_started__year=year,
-            date_started__month=month_num,
+    if not isinstance(rows, list):
+        raise ValueError("rows must be a list")
+    cleaned = []
+    for row in rows:
+        if not isinstance(row, dict) or not all(
+            isinstance(row.get(field) or "", str) for field in ("indicator", "description", "remarks")
+        ):
+            raise ValueError("indicator, description and remarks must be text")
+        war_ids = row.get("war_ids") or []
+        if not isinstance(war_ids, list):
+            raise ValueError("war_ids must be a list")
+        row["war_ids"] = [_posted_war_id(w) for w in war_ids]
+        if row.get("indicator", "").strip():
+            cleaned.append(row)
+    return cleaned
+
+
+@transaction.atomic
+def bulk_save_ipmt(unit, period, users, rows):
+    """
+    Upsert the edited IPMT rows for every user in one transaction.
+    Runs a fixed number of queries regardless of how many users/rows are saved:
+    indicators are resolved (and missing ones created) in bulk, IPMT rows are
+    upserted with bulk_create(update_conflicts=True), and WAR links are written
+    as bulk through-table inserts. Returns the number of IPMT rows saved.
+    Raises ValueError for malformed rows (see clean_ipmt_rows()) before writing.
+    """
+    rows = clean_ipmt_rows(rows)
+    if not users or not rows:
+        return 0
+
+    month = ipmt_month_label(period)
+    user_ids = [u.id for u in users]
+
+    # 1. Resolve indicators in one query, create any missing ones in one insert
+    codes = {r["indicator"].strip() for r in rows}
+    indicators = {si.code: si for si in SuccessIndicator.objects.filter(unit=unit, code__in=codes)}
+    missing = [
+        SuccessIndicator(unit=unit, code=code, description=code, is_active=True)
+        for code in codes if code not in indicators
+    ]
+    if missing:
+        SuccessIndicator.objects.bulk_create(missing)
+        indicators.update(
+            (si.code, si) for si in SuccessIndicator.objects.filter(unit=unit, code__in=[m.code for m in missing])
         )
-        if unit_name and unit_name.lower() != "all":
-            wars = wars.filter(unit__name__iexact=unit_name)
-        for war in wars:
-            for p in war.assigned_personnel.all():
-                personnel_names.add(p.get_full_name() or p.username)
-        personnel_names = list(personnel_names)
-
-    buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
-        for person in personnel_names:
-            reports = collect_ipmt_reports(year, month_num, unit_name, [person])
-            df = pd.DataFrame(reports)
-
-            if df.empty:
-                df = pd.DataFrame([{"indicator": "N/A", "description": "No reports", "remarks": ""}])
-
-            # Match your sample format: Indicator → Accomplishment → Remarks
-            df = df.rename(columns={
-                "indicator": "Success Indicator",
-                "description": "Accomplishment",
-                "remarks": "Remarks"
+        # bulk_create skips post_save, so refresh the unit's catalog and rollup for the new indicators
+        invalidate_catalog(unit.id)
+        refresh_unit(unit.id)
+
+    # 2. WARs each user may link: assigned to them, same unit (one query)
+    war_through = WorkAccomplishmentReport.assigned_personnel.through
+    requested_war_ids = {w for r in rows for w in r["war_ids"]}
+    allowed = set(
+        war_through.objects.filter(
+            user_id__in=user_ids,
+            workaccomplishmentreport_id__in=requested_war_ids,
+            workaccomplishmentreport__unit=unit,
+        ).values_list("user_id", "workaccomplishmentreport_id")
+    ) if requested_war_ids else set()
+
+    # Rows posted without war_ids fall back to the month's rollup cell
+    rollup, _ = rollup_cells(unit.id, period, user_ids)
+
+    # 3. Build one IPMT per (user, indicator); later rows win, like update_or_create did
+    entries = {}
+    for user in users:
+        for row in rows:
+            indicator = indicators[row["indicator"].strip()]
+            accomplishment = (row.get("description") or "").strip()
+            remarks = (row.get("remarks") or "").strip() or accomplishment
+
+            war_ids = [w for w in row["war_ids"] if (user.id, w) in allowed]
+            if not row["war_ids"]:
+                cell = rollup.get((user.id, indicator.id))
+                war_ids = list(cell.war_ids) if cell else []
+
+            entries[(user.id, indicator.id)] = (
+                IPMT(
+                    personnel=user,
+                    unit=unit,
+                    month=month,
+                    indicator=indicator,
+                    accomplishment=accomplishment,
+                    remarks=remarks,
+                ),
+                war_ids,
+            )
+
+    objs = IPMT.objects.bulk_create(
+        [obj for obj, _ in entries.values()],
+        update_conflicts=True,
+        unique_fields=["personnel", "unit", "month", "indicator"],
+        update_fields=["accomplishment", "remarks", "updated_at"],
+    )
+
+    # 4. Replace WAR links with bulk through-table writes
+    link_through = IPMT.reports.through
+    ipmt_ids = [obj.pk for obj in objs]
+    # bulk_create skips post_save, so invalidate the unit's cached previews on commit
+    transaction.on_commit(lambda: bump_version(unit.id))
+
+    link_through.objects.filter(ipmt_id__in=ipmt_ids).delete()
+    link_through.objects.bulk_create(
+        [
+            link_through(ipmt_id=obj.pk, workaccomplishmentreport_id=war_id)
+            for obj, war_ids in entries.values()
+            for war_id in set(war_ids)
+        ],
+        ignore_conflicts=True,
+    )
+
+    return len(objs)
+
+
+# -------------------------------
+# IPMT Rows per Personnel (single-person workbook)
+# -------------------------------
+def ipmt_rows_by_personnel(unit, period, users):
+    """
+    Rows for each user's IPMT workbook as {user_id: [{"indicator", "description", "remarks"}]}.
+    Saved IPMT rows win; otherwise the month's rollup cells plus completed requests.
+    Runs a fixed number of queries however many users are passed.
+    """
+    user_ids = [u.id for u in users]
+    catalog = indicator_catalog(unit.id)
+
+    saved_rows = {}
+    for row in IPMT.objects.filter(
+        personnel_id__in=user_ids, unit=unit, month=ipmt_month_label(period)
+    ).order_by("id"):
+        saved_rows.setdefault(row.personnel_id, []).append(row)
+
+    matched, unmatched = rollup_cells(unit.id, period, user_ids)
+    matched_by_user = {}
+    for (user_id, indicator_id), cell in sorted(matched.items()):
+        matched_by_user.setdefault(user_id, []).append(cell)
+
+    completed_requests = {}
+    request_links = ServiceRequest.assigned_personnel.through.objects.filter(
+        user_id__in=user_ids,
+        servicerequest__unit=unit,
+        servicerequest__status="Completed",
+        servicerequest__created_at__year=period.year,
+        servicerequest__created_at__month=period.month,
+    ).values_list("user_id", "servicerequest__description")
+    for user_id, description in request_links:
+        completed_requests.setdefault(user_id, []).append(description)
+
+    result = {}
+    for user_id in user_ids:
+        rows = result[user_id] = []
+
+        # --- Saved IPMT rows first ---
+        if user_id in saved_rows:
+            for row in saved_rows[user_id]:
+                indicator = catalog.get(row.indicator_id)
+                rows.append({
+                    "indicator": catalog.label(indicator) if indicator else "",
+                    "description": row.accomplishment or "",
+                    "remarks": row.remarks or "",
+                })
+            continue
+
+        # --- Fallback: WARs (from the monthly rollup) ---
+        for cell in matched_by_user.get(user_id, []):
+            indicator = catalog.get(cell.indicator_id)
+            rows.append({
+                "indicator": catalog.label(indicator) if indicator else "",
+                "description": cell.description,
+                "remarks": "Complied" if cell.description else "",
+            })
+        for cell in unmatched.get(user_id, []):
+            rows.append({
+                "indicator": cell.activity_name or unit.name,
+                "description": cell.description,
+                "remarks": "Complied" if cell.description else "",
             })
 
-            sheet_title = (person[:30] if len(person) > 30 else person) or "Unassigned"
-            df.to_excel(writer, index=False, sheet_name=sheet_title)
+        # --- Fallback: Completed ServiceRequests ---
+        for description in completed_requests.get(user_id, []):
+            rows.append({
+                "indicator": unit.name,
+                "description": description,
+                "remarks": "Complied" if description else "",
+            })
+    return result
+
+
+# -------------------------------
+# IPMT Excel Template (parsed once per process)
+# -------------------------------
+IPMT_TEMPLATE_PATH = os.path.join(settings.BASE_DIR, "static", "excel_file", "sampleipmt.xlsx")
+
+_template_cache = {"mtime": None, "snapshot": None}
+_template_lock = threading.Lock()
+
 
-            worksheet = writer.sheets[sheet_title]
-            worksheet.write(0, 4, f"Month: {calendar.month_name[month_num]} {year}")
-            worksheet.write(1, 4, f"Personnel: {person}")
-            if unit_name:
-                worksheet.write(2, 4, f"Unit: {unit_name}")
+def ipmt_template_snapshot():
+    """
+    The IPMT template workbook as pickled bytes.
+    The .xlsx is parsed once and re-parsed only when the file's modification time changes.
+    """
+    mtime = os.stat(IPMT_TEMPLATE_PATH).st_mtime_ns
+    with _template_lock:
+        if _template_cache["mtime"] != mtime:
+            wb = openpyxl.load_workbook(IPMT_TEMPLATE_PATH)
+            _template_cache["snapshot"] = pickle.dumps(wb, protocol=pickle.HIGHEST_PROTOCOL)
+            _template_cache["mtime"] = mtime
+        return _template_cache["snapshot"]
+
+
+def load_ipmt_template():
+    """
+    Return a fresh, writable copy of the IPMT template workbook.
+    Unpickling a copy of the snapshot is several times cheaper than openpyxl.load_workbook().
+    """
+    return pickle.loads(ipmt_template_snapshot())
 
-    buffer.seek(0)
 
-    from openpyxl import load_workbook
-    wb = load_workbook(buffer)
+# -------------------------------
+# Generate IPMT Excel
+# -------------------------------
+def _sheet_title(name, used):
+    """Excel sheet names: max 31 chars, no []:*?/\\ and unique within the workbook."""
+    base = re.sub(r"[\[\]:*?/\\]", "", name or "").strip()[:31] or "Unassigned"
+    title, n = base, 1
+    while title.lower() in used:
+        n += 1
+        suffix = f" ({n})"
+        title = base[:31 - len(suffix)] + suffix
+    used.add(title.lower())
+    return title
+
+
+def generate_ipmt_excel(month_filter: str, unit_name: str = None, personnel_names: list = None, output=None,
+                        progress=None):
+    """
+    Generate an Excel file for IPMT reports in a single pass.
+    - One sheet per personnel
+    - Columns: Indicator, Accomplishment, Remarks
 
-    return wb
+    Rows are written with a write-only workbook straight into `output`
+    (an HttpResponse or any writable file object). When `output` is None a
+    temporary file is used and returned, rewound to the start.
+    `progress(units done, total units)` is called after each unit.
+    """
+    try:
+        year, month_num = map(int, month_filter.split("-"))  # expects "YYYY-MM"
+    except ValueError:
+        raise ValueError("Month filter must be in 'YYYY-MM' format.")
 
+    explicit = personnel_names and "all" not in [p.lower() for p in personnel_names]
 
+    if unit_name and unit_name.lower() != "all":
+        unit_names = [unit_name]
+    else:
+        # Every unit with WARs this month
+        unit_names = list(
+            Unit.objects.filter(
+                workaccomplishmentreport__date_started__year=year,
+                workaccomplishmentreport__date_started__month=month_num,
+            ).distinct().order_by("name").values_list("name", flat=True)
+        )
 
+    month_label = f"{calendar.month_name[month_num]} {year}"
+    wb = Workbook(write_only=True)
+    used_titles = set()
+
+    for done, name in enumerate(unit_names, start=1):
+        # One batched collection call per unit for all of its personnel
+        collected = collect_ipmt_reports(year, month_num, name, personnel_names if explicit else None)
+
+        for entry in collected:
+            rows = entry["rows"]
+            # Without an explicit selection, only include personnel with WARs this month
+            # (including WARs whose activity has no indicator)
+            if not explicit and not entry["has_wars"]:
+                continue
+            if not rows:
+                rows = [{"indicator": "N/A", "description": "No reports", "remarks": ""}]
+
+            ws = wb.create_sheet(_sheet_title(entry["personnel"], used_titles))
+            info = [f"Month: {month_label}", f"Personnel: {entry['personnel']}", f"Unit: {name}"]
+            table = [["Success Indicator", "Accomplishment", "Remarks"]] + [
+                [r["indicator"], r["description"], r["remarks"]] for r in rows
+            ]
+            # Info block sits in column E of the first rows, as in the sample format
+            for i in range(max(len(table), len(info))):
+                line = table[i] if i < len(table) else [None, None, None]
+                ws.append(line + [None, info[i]] if i < len(info) else line)
 
+        if progress:
+            progress(done, len(unit_names))
 
+    if not used_titles:
+        wb.create_sheet("No reports").append(["No IPMT reports found for this month."])
 
+    target = output if output is not None else tempfile.TemporaryFile()
+    wb.save(target)
+    if output is None:
+        target.seek(0)
+    return target
 
 
 
+# -------------------------------
+# Unit-wide IPMT Export (zip of per-personnel workbooks)
+# -------------------------------
+IPMT_EXPORT_WORKERS = min(4, os.cpu_count() or 1)
 
 
+def _safe_filename(value):
+    return re.sub(r'[\\/:*?"<>|]', "", value or "").strip() or "Unassigned"
 
 
+def _zip_entry_name(unit_name, personnel, period, used):
+    base = f"{_safe_filename(unit_name)}/IPMT_{_safe_filename(personnel)}_{period:%Y-%m}"
+    name, n = base, 1
+    while name.lower() in used:
+        n += 1
+        name = f"{base} ({n})"
+    used.add(name.lower())
+    return f"{name}.xlsx"
 
 
+def ipmt_export_tasks(period, unit_name=None):
+    """
+    One render task per personnel of the unit (or of every unit when unit_name is
+    None/'all'): (zip entry name, personnel name, month label, rows).
+    All database work happens here, a fixed number of queries per unit.
+    """
+    units = Unit.objects.order_by("name")
+    if unit_name and unit_name.lower() != "all":
+        units = units.filter(name__iexact=unit_name)
+
+    month_label = ipmt_month_label(period)
+    tasks, used = [], set()
+    for unit in units:
+        users = list(User.objects.filter(unit=unit, role="personnel").order_by("last_name", "first_name", "id"))
+        if not users:
+            continue
+        rows_by_user = ipmt_rows_by_personnel(unit, period, users)
+        for user in users:
+            name = user.get_full_name() or user.username
+            tasks.append((_zip_entry_name(unit.name, name, period, used), name, month_label, rows_by_user[user.id]))
+    return tasks
+
+
+class _ZipStream:
+    """Write-only file object that hands back whatever zipfile has written so far."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _render_workbooks(tasks, workers):
+    snapshot = ipmt_template_snapshot()
+    if workers <= 1 or len(tasks) <= 1:
+        init_render_worker(snapshot)
+        yield from map(render_ipmt_workbook, tasks)
+        return
+
+    # spawn: workers never inherit this process's DB connections or threads
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_render_worker,
+        initargs=(snapshot,),
+    ) as pool:
+        yield from pool.map(render_ipmt_workbook, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+
+
+def iter_ipmt_zip(tasks, workers=IPMT_EXPORT_WORKERS, progress=None):
+    """
+    Render the tasks from ipmt_export_tasks() in a process pool and yield the zip
+    archive in chunks as each workbook finishes (for StreamingHttpResponse or a file).
+    """
+    stream = _ZipStream()
+    # .xlsx files are already deflated, so store them as-is
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_STORED) as archive:
+        for done, (filename, data) in enumerate(_render_workbooks(tasks, workers), start=1):
+            archive.writestr(filename, data)
+            if progress:
+                progress(done, len(tasks))
+            yield stream.drain()
+    yield stream.drain()
 
 
 def process_migration(file_path, target_model):
@@ -0,0 +1,65 @@
+# apps/gso_reports/versions.py
+import threading
+import time
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import DataVersion
+
+
+# -------------------------------
+# Shared Data Versions
+# -------------------------------
+def current(name):
+    """Current version of `name` (0 until it is first bumped). One indexed query."""
+    return DataVersion.objects.filter(name=name).values_list("version", flat=True).first() or 0
+
+
+def bump(*names):
+    """Mark the data behind each name as changed, for every worker process."""
+    for name in names:
+        if DataVersion.objects.filter(name=name).update(version=F("version") + 1):
+            continue
+        try:
+            with transaction.atomic():
+                DataVersion.objects.create(name=name, version=1)
+        except IntegrityError:
+            # Created concurrently by another worker
+            DataVersion.objects.filter(name=name).update(version=F("version") + 1)
+
+
+class VersionedValue:
+    """
+    A value built in this process and rebuilt whenever current(name) moves on.
+    The version is read at most once every `check_every` seconds (0: on every
+    get()), so between checks get() runs no query at all; a change made by
+    another worker is picked up within that window.
+    """
+
+    def __init__(self, name, build, check_every=0):
+        self.name = name
+        self.check_every = check_every
+        self._build = build
+        self._lock = threading.Lock()
+        self._value = None  # (version, value)
+        self._checked_at = None
+
+    def get(self):
+        cached = self._value
+        if cached is not None and self._checked_at is not None \
+                and time.monotonic() - self._checked_at < self.check_every:
+            return cached[1]
+
+        version = current(self.name)
+        if cached is None or cached[0] != version:
+            with self._lock:
+                cached = self._value
+                if cached is None or cached[0] != version:
+                    cached = self._value = (version, self._build())
+        self._checked_at = time.monotonic()
+        return cached[1]
+
+    def expire(self):
+        """Read the version again on the next get() (after a change made by this process)."""
+        self._checked_at = None
@@ -1,22 +1,31 @@
 # apps/gso_reports/views.py
-import os
 import json
 import calendar
-import openpyxl
-from datetime import datetime
-from django.conf import settings
-from django.http import HttpResponse
-from django.db.models import Q
+import tempfile
+from datetime import date, datetime
 
 from django.shortcuts import render
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, FileResponse
 
 from apps.gso_requests.models import ServiceRequest
 from apps.gso_accounts.models import User, Unit
-from .models import WorkAccomplishmentReport, SuccessIndicator, IPMT, ActivityName
-from .utils import normalize_report, generate_ipmt_excel, collect_ipmt_reports
-from apps.ai_service.utils import generate_war_description, generate_ipmt_summary
+from .models import WorkAccomplishmentReport, ReportJob
+from .search import search_reports
+from .rollup import rollup_cells, parse_month
+from .personnel import resolve_personnel, display_name, ambiguous_names
+from .catalog import indicator_catalog
+from .preview_cache import cached_preview
+from .utils import (
+    generate_ipmt_excel, collect_ipmt_reports, paginate_accomplishment_report,
+    stream_accomplishment_csv, write_accomplishment_xlsx, bulk_save_ipmt, load_ipmt_template,
+    ipmt_rows_by_personnel, ipmt_export_tasks, iter_ipmt_zip,
+)
+from .ipmt_sheet import fill_ipmt_sheet
+from .jobs import RUNNERS, submit_job, result_filename
+from apps.ai_service.utils import generate_ipmt_summary
+from apps.ai_service.backfill import enqueue, is_pending
 
 
 # -------------------------------
@@ -32,68 +41,25 @@ def is_gso_or_director(user):
 @login_required
 @user_passes_test(is_gso_or_director)
 def accomplishment_report(request):
-    # Fetch completed requests
-    completed_requests = ServiceRequest.objects.filter(status="Completed").order_by("-created_at")
-    # Fetch all WARs
-    all_wars = WorkAccomplishmentReport.objects.select_related("request", "unit").prefetch_related("assigned_personnel").all().order_by("-date_started")
-
-    reports = []
-
-    # Track which requests already have a WAR
-    war_request_ids = set(war.request_id for war in all_wars if war.request_id)
-
-    # Process completed requests that **don't yet have a WAR**
-    for r in completed_requests:
-        if r.id in war_request_ids:
-            continue
-        norm = normalize_report(r)
-        norm["id"] = r.id
-
-        if not norm.get("description") or norm["description"].strip() == "":
-            try:
-                desc = generate_war_description(
-                    activity_name=getattr(r, "activity_name", getattr(r, "title", "Task")),
-                    unit=getattr(r.unit, "name", None),
-                    personnel_names=[p.get_full_name() for p in r.assigned_personnel.all()] if hasattr(r, "assigned_personnel") else None
-                )
-                r.description = desc or "No description generated."
-                r.save(update_fields=["description"])
-                norm["description"] = r.description
-            except Exception as e:
-                norm["description"] = f"Error generating description: {e}"
-
-        reports.append(norm)
-
-    # Process all WARs
-    for war in all_wars:
-        norm = normalize_report(war)
-        norm["id"] = war.id
-
-        if not norm.get("description") or norm["description"].strip() == "":
-            try:
-                desc = generate_war_description(
-                    activity_name=getattr(war, "activity_name", getattr(war, "title", "Task")),
-                    unit=getattr(war.unit, "name", None),
-                    personnel_names=[p.get_full_name() for p in war.assigned_personnel.all()] if hasattr(war, "assigned_personnel") else None
-                )
-                war.description = desc or "No description generated."
-                war.save(update_fields=["description"])
-                norm["description"] = war.description
-            except Exception as e:
-                norm["description"] = f"Error generating description: {e}"
-
-        reports.append(norm)
-
-    # Apply search and unit filters
     search_query = request.GET.get("q")
-    if search_query:
-        reports = [r for r in reports if search_query.lower() in str(r).lower()]
-
     unit_filter = request.GET.get("unit")
-    if unit_filter:
-        reports = [r for r in reports if r["unit"].lower() == unit_filter.lower()]
 
-    reports.sort(key=lambda r: r["date"], reverse=True)
+    # Merge, filter and order in the database; only one page is loaded
+    reports, next_cursor = paginate_accomplishment_report(
+        search_query=search_query,
+        unit_filter=unit_filter,
+        cursor_token=request.GET.get("cursor"),
+    )
+
+    # Missing descriptions are streamed in by the page (ai_service:stream_generation);
+    # the background queue fills any the page leaves unfinished
+    missing = []
+    for report in reports:
+        report.pending = not (report.description or "").strip()
+        if report.pending:
+            missing.append((report.type, report.id))
+    if missing:
+        enqueue(missing)
 
     # Load all active personnel for IPMT modal
     personnel_qs = User.objects.filter(role="personnel", account_status="active") \
@@ -113,23 +79,67 @@ def accomplishment_report(request):
         "gso_office/accomplishment_report/accomplishment_report.html",
         {
             "reports": reports,
+            "next_cursor": next_cursor,
             "personnel_list": personnel_list,
         },
     )
 
+# -------------------------------
+# Accomplishment Report Export (CSV / XLSX)
+# -------------------------------
+@login_required
+@user_passes_test(is_gso_or_director)
+def export_accomplishment_report(request):
+    search_query = request.GET.get("q")
+    unit_filter = request.GET.get("unit")
+    export_format = request.GET.get("format", "csv").lower()
+    stamp = datetime.now().strftime("%Y%m%d")
+
+    if export_format == "csv":
+        response = StreamingHttpResponse(
+            stream_accomplishment_csv(search_query, unit_filter),
+            content_type="text/csv",
+        )
+        response["Content-Disposition"] = f'attachment; filename="Accomplishment_Report_{stamp}.csv"'
+        return response
+
+    if export_format == "xlsx":
+        # Spooled to a temp file; deleted automatically once the response is closed
+        tmp = tempfile.TemporaryFile()
+        write_accomplishment_xlsx(tmp, search_query, unit_filter)
+        tmp.seek(0)
+        return FileResponse(
+            tmp,
+            as_attachment=True,
+            filename=f"Accomplishment_Report_{stamp}.xlsx",
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+
+    return HttpResponse("Unsupported format. Use csv or xlsx.", status=400)
+
+
+# -------------------------------
+# Report Search (AJAX)
+# -------------------------------
+@login_required
+@user_passes_test(is_gso_or_director)
+def search_reports_view(request):
+    query = request.GET.get("q", "")
+    doc_type = request.GET.get("type") or None
+    try:
+        page = int(request.GET.get("page", 1))
+    except ValueError:
+        page = 1
+
+    hits, has_next = search_reports(query, doc_type=doc_type, page=page)
+    return JsonResponse({"results": hits, "page": page, "has_next": has_next})
+
 # -------------------------------
 # Generate IPMT Excel
 # -------------------------------
 @login_required
 @user_passes_test(is_gso_or_director)
 def generate_ipmt(request):
-    import json
-    import calendar
-    import os
-    import openpyxl
-    from django.http import HttpResponse
-    from django.conf import settings
-
     reports = []
     personnel_list = []
 
@@ -156,15 +166,17 @@ def generate_ipmt(request):
 
         # ✅ Convert personnel list
         personnel_list = [p.strip() for p in personnel_param.split(",") if p.strip()]
+        resolution = resolve_personnel(personnel_list)
 
-        # Update indicator to include code + description from SuccessIndicator
+        # Update indicator to include code + description from the unit's catalog
+        unit = Unit.objects.filter(name__iexact=unit_filter).first()
+        catalog = indicator_catalog(unit.id) if unit else None
         for r in reports:
-            if not r.get("indicator"):
+            if not r.get("indicator") or not catalog:
                 continue
-            code_only = r["indicator"].split(" - ")[0].strip()
-            si = SuccessIndicator.objects.filter(code__iexact=code_only).first()
+            si = catalog.by_code(r["indicator"])
             if si:
-                r["indicator"] = f"{si.code} - {si.description}"
+                r["indicator"] = catalog.label(si)
 
     # --- Handle GET fallback (for debugging / direct access) ---
     else:
@@ -177,124 +189,36 @@ def generate_ipmt(request):
 
         year, month_num = map(int, month_filter.split("-"))
         month_name = f"{calendar.month_name[month_num]} {year}"
-        personnel_list = [p.strip() for p in personnel_param.split(",")]
-
-        for identifier in personnel_list:
-            user = get_user_by_identifier(identifier)
-            if not user:
-                continue
-
-            # --- Fetch saved IPMT rows first ---
-            ipmt_rows = IPMT.objects.filter(
-                personnel=user,
-                unit__name__iexact=unit_filter,
-                month=f"{calendar.month_name[month_num]} {year}"
-            )
-
-            if ipmt_rows.exists():
-                for row in ipmt_rows:
-                    reports.append({
-                        "indicator": f"{row.indicator.code} - {row.indicator.description}",
-                        "description": row.accomplishment or "",
-                        "remarks": row.remarks or "",
-                    })
-            else:
-                # --- Fallback: WARs ---
-                wars = WorkAccomplishmentReport.objects.filter(
-                    assigned_personnel=user,
-                    unit__name__iexact=unit_filter,
-                    date_started__year=year,
-                    date_started__month=month_num
-                )
-
-                for war in wars:
-                    activity_obj = None
-                    if war.activity_name:
-                        activity_obj = ActivityName.objects.filter(name__iexact=war.activity_name).first()
-
-                    sis = SuccessIndicator.objects.filter(
-                        unit=war.unit,
-                        activity_name=activity_obj
-                    )
-
-                    if sis.exists():
-                        for si in sis:
-                            reports.append({
-                                "indicator": f"{si.code} - {si.description}",
-                                "description": war.description,
-                                "remarks": "Complied" if war.description else "",
-                            })
-                    else:
-                        reports.append({
-                            "indicator": war.activity_name or war.unit.name,
-                            "description": war.description,
-                            "remarks": "Complied" if war.description else "",
-                        })
-
-                # --- Fallback: Completed ServiceRequests ---
-                completed_requests = ServiceRequest.objects.filter(
-                    assigned_personnel=user,
-                    unit__name__iexact=unit_filter,
-                    status="Completed",
-                    created_at__year=year,
-                    created_at__month=month_num
-                )
-
-                for req in completed_requests:
-                    reports.append({
-                        "indicator": req.unit.name,
-                        "description": req.description,
-                        "remarks": "Complied" if req.description else "",
-                    })
-
-    # --- Load Excel template ---
-    template_path = os.path.join(settings.BASE_DIR, "static", "excel_file", "sampleipmt.xlsx")
-    wb = openpyxl.load_workbook(template_path)
+        personnel_list = [p.strip() for p in personnel_param.split(",") if p.strip()]
+        resolution = resolve_personnel(personnel_list)
+        unit = Unit.objects.filter(name__iexact=unit_filter).first()
+        if not unit:
+            return HttpResponse("Unit not found.", status=404)
+
+        # Saved rows, rollup cells and requests for all personnel in a few queries
+        rows_by_user = ipmt_rows_by_personnel(unit, date(year, month_num, 1), resolution.users)
+        for user in resolution.users:
+            reports.extend(rows_by_user[user.id])
+
+    # --- Load Excel template (cached per process) ---
+    wb = load_ipmt_template()
     ws = wb.active
 
     # --- Build personnel full names ---
     personnel_fullnames = []
     for identifier in personnel_list:
-        user_obj = get_user_by_identifier(identifier)
-        if user_obj:
-            full_name = (user_obj.get_full_name() or "").strip()
-            if full_name:
-                personnel_fullnames.append(full_name)
-            elif user_obj.first_name or user_obj.last_name:
-                personnel_fullnames.append(f"{user_obj.first_name} {user_obj.last_name}".strip())
-            else:
-                personnel_fullnames.append(user_obj.username)
-        else:
-            personnel_fullnames.append(identifier)
-
-    # --- Debug log ---
-    print("=== IPMT Personnel Fullnames ===")
-    print(personnel_fullnames)
-
-    # --- Write to Excel ---
-    try:
-        ws["B8"] = ", ".join(personnel_fullnames) if personnel_fullnames else "No personnel found"
-    except Exception as e:
-        print(f"Error writing to Excel B8: {e}")
-        ws.cell(row=8, column=2, value=", ".join(personnel_fullnames))
+        user_obj = resolution.matches.get(identifier)
+        personnel_fullnames.append(display_name(user_obj) if user_obj else identifier)
 
     # --- Write month ---
-    try:
-        if "-" in month_filter:
-            year, month_num = map(int, month_filter.split("-"))
-            month_name = f"{calendar.month_name[month_num]} {year}"
-        else:
-            month_name = month_filter
-        ws["B11"] = month_name
-    except Exception as e:
-        print(f"Error writing to Excel B11: {e}")
+    if "-" in month_filter:
+        year, month_num = map(int, month_filter.split("-"))
+        month_name = f"{calendar.month_name[month_num]} {year}"
+    else:
+        month_name = month_filter
 
-    # --- Write reports ---
-    start_row = 13
-    for i, r in enumerate(reports, start=start_row):
-        ws.cell(row=i, column=1).value = r.get("indicator", "")
-        ws.cell(row=i, column=2).value = r.get("description", "")
-        ws.cell(row=i, column=3).value = r.get("remarks", "")
+    # --- Write name, month and reports ---
+    fill_ipmt_sheet(ws, ", ".join(personnel_fullnames), month_name, reports)
 
     # --- Return Excel ---
     response = HttpResponse(
@@ -305,6 +229,85 @@ def generate_ipmt(request):
     wb.save(response)
     return response
 
+# -------------------------------
+# Unit-wide IPMT Export (zip)
+# -------------------------------
+@login_required
+@user_passes_test(is_gso_or_director)
+def export_ipmt_zip(request):
+    """One IPMT workbook per personnel of a unit (or all units), streamed as a zip."""
+    period = parse_month(request.GET.get("month"))
+    if not period:
+        return HttpResponse("Month is required in 'YYYY-MM' format.", status=400)
+    unit_filter = request.GET.get("unit") or "all"
+
+    tasks = ipmt_export_tasks(period, unit_filter)
+    if not tasks:
+        return HttpResponse("No personnel found for this unit.", status=404)
+
+    response = StreamingHttpResponse(iter_ipmt_zip(tasks), content_type="application/zip")
+    filename = f"IPMT_{unit_filter.title().replace(' ', '_')}_{period:%Y-%m}.zip"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+# -------------------------------
+# Background Report Jobs
+# -------------------------------
+@login_required
+@user_passes_test(is_gso_or_director)
+def start_report_job(request):
+    """Queue an export/AI job; the browser then polls report_job_status."""
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=400)
+
+    kind = request.POST.get("kind", "")
+    params = {
+        "q": request.POST.get("q", ""),
+        "unit": request.POST.get("unit", ""),
+        "month": request.POST.get("month", ""),
+        "personnel": request.POST.getlist("personnel[]"),
+    }
+    if kind not in RUNNERS:
+        return JsonResponse({"error": "Unknown job type"}, status=400)
+    if kind.startswith("ipmt_") and not parse_month(params["month"]):
+        return JsonResponse({"error": "Month is required in 'YYYY-MM' format."}, status=400)
+
+    job = submit_job(kind, params, request.user)
+    return JsonResponse(_job_payload(job), status=202)
+
+
+@login_required
+@user_passes_test(is_gso_or_director)
+def report_job_status(request, job_id):
+    job = ReportJob.objects.filter(id=job_id, created_by=request.user).first()
+    if not job:
+        return JsonResponse({"error": "Job not found"}, status=404)
+    return JsonResponse(_job_payload(job))
+
+
+@login_required
+@user_passes_test(is_gso_or_director)
+def download_report_job(request, job_id):
+    job = ReportJob.objects.filter(id=job_id, created_by=request.user, status="Done").first()
+    if not job or not job.result:
+        return HttpResponse("Report not ready.", status=404)
+    return FileResponse(job.result.open("rb"), as_attachment=True, filename=result_filename(job))
+
+
+def _job_payload(job):
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "rows_done": job.rows_done,
+        "rows_total": job.rows_total,
+        "percent": job.percent,
+        "message": job.message,
+        "error": job.error,
+        "status_url": reverse("gso_reports:report_job_status", args=[job.id]),
+        "download_url": reverse("gso_reports:download_report_job", args=[job.id]) if job.result else None,
+    }
+
 # -------------------------------
 # Get WAR Description (AJAX)
 # -------------------------------
@@ -313,9 +316,28 @@ def generate_ipmt(request):
 def get_war_description(request, war_id):
     try:
         war = WorkAccomplishmentReport.objects.get(id=war_id)
-        return JsonResponse({'description': war.description or ""})
+        return JsonResponse({
+            'description': war.description or "",
+            'pending': is_pending("WorkAccomplishmentReport", war.id),
+        })
     except WorkAccomplishmentReport.DoesNotExist:
         return JsonResponse({'error': 'WAR not found'}, status=404)
+
+
+# -------------------------------
+# Get Request Description (AJAX)
+# -------------------------------
+@login_required
+@user_passes_test(is_gso_or_director)
+def get_request_description(request, request_id):
+    try:
+        service_request = ServiceRequest.objects.get(id=request_id)
+        return JsonResponse({
+            'description': service_request.description or "",
+            'pending': is_pending("ServiceRequest", service_request.id),
+        })
+    except ServiceRequest.DoesNotExist:
+        return JsonResponse({'error': 'Request not found'}, status=404)
 # -------------------------------
 # Preview IPMT (Web)
 # -------------------------------
@@ -324,7 +346,8 @@ def get_war_description(request, war_id):
 def preview_ipmt(request):
     """
     Preview IPMT rows for the selected unit, personnel, and month.
-    Fetches WorkAccomplishmentReports matching each SuccessIndicator's activity_name.
+    Reads the pre-aggregated IPMTRollup cells (WARs grouped by SuccessIndicator),
+    cached per unit data version (see preview_cache.py).
     """
     month_filter = request.GET.get("month")
     unit_filter = request.GET.get("unit", "all")
@@ -338,55 +361,43 @@ def preview_ipmt(request):
     except ValueError:
         return HttpResponse("Invalid month format. Use YYYY-MM.", status=400)
 
-    from apps.gso_accounts.models import User, Unit
-    from .models import SuccessIndicator, WorkAccomplishmentReport
-
     unit = Unit.objects.filter(name__iexact=unit_filter).first()
     if not unit:
         return HttpResponse("Unit not found.", status=404)
 
-    reports = []
+    resolution = resolve_personnel(personnel_names)
+    user_ids = [u.id for u in resolution.users]
+    period = date(year, month_num, 1)
+
+    def build_rows():
+        indicators = indicator_catalog(unit.id).active
+        # Every (personnel, indicator) cell for the month comes from the rollup table
+        matched, _ = rollup_cells(unit.id, period, user_ids)
+
+        rows = []
+        for user_id in user_ids:
+            for indicator in indicators:
+                cell = matched.get((user_id, indicator.id))
+                description = cell.description if cell else ""
 
-    for person_name in personnel_names:
-        # Lookup by full name (adjust as needed)
-        user = get_user_by_identifier(person_name)
-        if not user:
-            continue
-
-        # Get all active success indicators for this unit
-        indicators = SuccessIndicator.objects.filter(unit=unit, is_active=True)
-
-        for indicator in indicators:
-            # Determine which activity_name to match against WARs
-            activity_name_to_match = (
-                indicator.activity_name.name if indicator.activity_name else indicator.code
-            )
-
-            # Fetch related WARs for this user and activity_name
-            wars = WorkAccomplishmentReport.objects.filter(
-                unit=unit,
-                assigned_personnel=user,
-                activity_name=activity_name_to_match
-            )
-
-            # Combine descriptions from all relevant WARs
-            description = " ".join([w.description for w in wars if w.description]) or ""
-
-            # Collect WAR IDs to keep track
-            war_ids = [w.id for w in wars]
-
-            reports.append({
-                "indicator": indicator.code,
-                "description": description,
-                "remarks": "COMPLIED" if description else "",
-                "war_ids": war_ids,
-            })
+                rows.append({
+                    "indicator": indicator.code,
+                    "description": description,
+                    "remarks": "COMPLIED" if description else "",
+                    "war_ids": cell.war_ids if cell else [],
+                })
+        return rows
+
+    # Reused until a WAR, IPMT or indicator write bumps the unit's data version
+    reports = cached_preview(unit.id, period, user_ids, build_rows)
 
     context = {
         "reports": reports,
         "month_filter": month_filter,
         "unit_filter": unit_filter,
         "personnel_names": personnel_names,
+        "unresolved_personnel": resolution.unresolved,
+        "ambiguous_personnel": ambiguous_names(resolution),
     }
 
     return render(request, "gso_office/ipmt/ipmt_preview.html", context)
@@ -413,81 +424,31 @@ def save_ipmt(request):
     if not unit:
         return JsonResponse({"error": "Unit not found"}, status=404)
 
-    for person_name in personnel_names:
-        user = get_user_by_identifier(person_name)
-        if not user:
-            continue
-
-        for row in rows:
-            indicator = SuccessIndicator.objects.filter(unit=unit, code=row.get("indicator")).first()
-            if not indicator:
-                # Optionally create indicator if missing
-                indicator = SuccessIndicator.objects.create(
-                    unit=unit,
-                    code=row.get("indicator"),
-                    name=row.get("indicator"),
-                    is_active=True
-                )
-
-            # Fetch WARs for this indicator
-            war_ids = row.get("war_ids", [])
-            wars = WorkAccomplishmentReport.objects.filter(
-                assigned_personnel=user,
-                unit=unit,
-                activity_name=indicator.code
-            )
-            if war_ids:
-                wars = wars.filter(id__in=war_ids)
-
-            # Determine accomplishment
-            accomplishment = row.get("description", "").strip()
-            remarks = row.get("remarks", "").strip() or accomplishment
-
-            # Save or update IPMT
-            ipmt_obj, created = IPMT.objects.update_or_create(
-                personnel=user,
-                unit=unit,
-                month=month,
-                indicator=indicator,
-                defaults={
-                    "accomplishment": accomplishment,
-                    "remarks": remarks
-                }
-            )
-            # Link WARs
-            ipmt_obj.reports.set(wars)
-
-    return JsonResponse({"status": "success"})
+    period = parse_month(month)
+    if not period:
+        return JsonResponse({"error": "Invalid month. Use YYYY-MM."}, status=400)
+
+    # The preview page posts personnel as one comma-separated string
+    if isinstance(personnel_names, str):
+        personnel_names = personnel_names.split(",")
+    resolution = resolve_personnel(personnel_names)
+
+    try:
+        saved = bulk_save_ipmt(unit, period, resolution.users, rows)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse({
+        "status": "success",
+        "saved": saved,
+        "unresolved": resolution.unresolved,
+        "ambiguous": ambiguous_names(resolution),
+    })
 
 
 
 
 # --- Helper ---
 def get_user_by_identifier(identifier):
-    """Find user by username, full name, or partial name (case-insensitive)."""
-    identifier = identifier.strip()
-    if not identifier:
-        return None
-
-    # Try exact username
-    user = User.objects.filter(username__iexact=identifier).first()
-    if user:
-        return user
-
-    # Try full name match
-    parts = identifier.split()
-    if len(parts) >= 2:
-        first, last = parts[0], parts[-1]
-        user = User.objects.filter(
-            Q(first_name__iexact=first) & Q(last_name__iexact=last)
-        ).first()
-        if user:
-            return user
-
-    # Try partial match
-    return (
-        User.objects.filter(
-            Q(first_name__icontains=identifier) |
-            Q(last_name__icontains=identifier)
-        ).first()
-    )
\ No newline at end of file
+    """Find a single user by username, full name, or last name (case-insensitive)."""
+    return resolve_personnel([identifier]).matches.get((identifier or "").strip())
@@ -3,7 +3,8 @@ from django.db.models import Q
 from apps.gso_requests.models import ServiceRequest
 from apps.gso_inventory.models import InventoryItem
 from apps.gso_reports.models import WorkAccomplishmentReport
-from apps.gso_reports.utils import map_activity_name
+from apps.gso_reports.utils import map_activity_name_from_reports
+from apps.gso_reports.search import matching_ids
 from apps.ai_service.utils import generate_war_description  # AI util
 from django.utils import timezone
 import threading
@@ -14,13 +15,8 @@ import threading
 # -------------------------------
 def filter_requests(queryset, search_query=None, unit_filter=None, status_filter=None):
     if search_query:
-        queryset = queryset.filter(
-            Q(requestor__username__icontains=search_query) |
-            Q(requestor__first_name__icontains=search_query) |
-            Q(requestor__last_name__icontains=search_query) |
-            Q(unit__name__icontains=search_query) |
-            Q(requestor__department__name__icontains=search_query)
-        )
+        # Full-text index over description, task reports, requestor, unit and department
+        queryset = queryset.filter(id__in=matching_ids(search_query, "ServiceRequest"))
     if unit_filter:
         try:
             queryset = queryset.filter(unit_id=int(unit_filter))
@@ -53,9 +49,8 @@ def create_war_from_request(request):
     Auto-generate a Work Accomplishment Report (WAR) when a request is completed.
     Generates AI description in a background thread to avoid blocking the request.
     """
-    # Try to map activity name from reports/description
-    task_reports_text = " ".join([t.report_text for t in request.reports.all()])
-    activity = map_activity_name(task_reports_text) or map_activity_name(request.description)
+    # Try to map activity name from reports, then the description
+    activity = map_activity_name_from_reports(request)
 
     war, created = WorkAccomplishmentReport.objects.get_or_create(
         request=request,
@@ -0,0 +1,54 @@
+// Streamed AI generation (ai_service:stream_generation)
+// Reads the server-sent events of a POST and hands each token over as it arrives.
+// Resolves with the final text; rejects with an Error carrying `fallback` when
+// generation failed, or an AbortError when `signal` was aborted (Stop button).
+async function streamGeneration(url, csrfToken, fields, { onToken, signal } = {}) {
+    const body = new FormData();
+    Object.entries(fields).forEach(([name, value]) => body.append(name, value));
+
+    const response = await fetch(url, {
+        method: "POST",
+        headers: { "X-CSRFToken": csrfToken },
+        body,
+        signal,
+    });
+    if (!response.ok) {
+        const data = await response.json().catch(() => ({}));
+        throw new Error(data.error || `Generation failed (${response.status})`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let end;
+        while ((end = buffer.indexOf("\n\n")) !== -1) {
+            const block = buffer.slice(0, end);
+            buffer = buffer.slice(end + 2);
+
+            let event = "message";
+            const data = [];
+            block.split("\n").forEach(line => {
+                if (line.startsWith("event:")) event = line.slice(6).trim();
+                else if (line.startsWith("data:")) data.push(line.slice(5).trimStart());
+            });
+            if (!data.length) continue;
+            const payload = JSON.parse(data.join("\n"));
+
+            if (event === "done") return payload.result;
+            if (event === "error") {
+                const error = new Error(payload.error || "Generation failed");
+                error.fallback = payload.fallback;
+                throw error;
+            }
+            if (onToken) onToken(payload.token || "");
+        }
+    }
+    throw new Error("Generation ended early");
+}